@@ -23,14 +23,29 @@
 import os
 import csv
 import time
+import asyncio
 import threading
+import concurrent.futures
 from datetime import datetime
 import tkinter as tk
 from tkinter import messagebox, Toplevel
 import sys
 import json
 import itertools
+import math
+import random
 import queue
+import subprocess
+import atexit
+import cProfile
+import pstats
+import re
+import logging
+import logging.handlers
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, unquote
+from collections import deque, namedtuple
+import numpy as np
 import matplotlib
 
 matplotlib.use("TkAgg")
@@ -40,6 +55,10 @@ from matplotlib.figure import Figure
 from Phidget22.Phidget import *
 from Phidget22.Devices.VoltageRatioInput import *
 
+from syringe_stream import StreamPublisher
+from syringe_resample import resample_file
+from syringe_datafile import FORCE_CALIBRATION_FACTOR, DEFAULT_FORCE_COEFFICIENTS
+
 # Audio for countdown - try multiple methods
 AUDIO_METHOD = None
 try:
@@ -74,6 +93,14 @@ except ImportError:
 
     USE_CUSTOM_TK = False
 
+# SciPy is optional; it only speeds up block filtering of buffered samples
+try:
+    from scipy.signal import sosfilt
+
+    USE_SCIPY = True
+except ImportError:
+    USE_SCIPY = False
+
 # --- Add Phidget DLL path (Windows only) ---
 if os.name == 'nt':  # Windows
     dll_path = r"C:\Program Files\Phidgets\Phidget22"
@@ -83,6 +110,27 @@ if os.name == 'nt':  # Windows
 CALIBRATION_FILE = "phidget_calibration.csv"
 CONFIG_FILE = "viscosity_config.json"
 
+# Default voltage ratio to force conversion (FORCE_CALIBRATION_FACTOR, DEFAULT_FORCE_COEFFICIENTS) lives in
+# syringe_datafile so the analysis tools use the same value
+
+# Column layout of the participant data files
+DATA_COLUMNS = ['Trial', 'Viscosity', 'Channel', 'Gain', 'Timestamp', 'Raw_Reading', 'Calibrated_Reading',
+                'Force_N', 'Filtered_Reading', 'Active']
+
+# One stored sample; immutable so finished trials can be handed between threads
+Sample = namedtuple('Sample', ['timestamp', 'trial', 'viscosity', 'channel', 'gain', 'raw', 'calibrated',
+                               'filtered', 'active'])
+
+# A finished trial as handed from the acquisition thread to the saver and the GUI.
+# metadata maps a name to a dict written as a '# Trial N <name>:' row in the data file.
+TrialBlock = namedtuple('TrialBlock', ['trial', 'viscosity', 'channel', 'samples', 'summary', 'metadata',
+                                       'window'])
+
+# A recorded trial fed back through the acquisition pipeline by syringe_replay.py.
+# timestamps/raw/gains are NumPy arrays; speed is the replay rate (1 = original timing, 0 = as fast as possible).
+ReplayTrial = namedtuple('ReplayTrial', ['trial', 'viscosity', 'channel', 'timestamps', 'raw', 'gains', 'offset',
+                                         'speed'])
+
 # OUTPUT_DIR will be set after loading config
 OUTPUT_DIR = None
 
@@ -103,10 +151,252 @@ DEFAULT_CONFIG = {
         "initial_scale": 0.0001,
         "scale_padding": 1.2
     },
+    "ui": {
+        "tick_ms": 50  # How often queued GUI updates from worker threads are applied
+    },
+    "profiling": {
+        "enabled": False,  # Also switched on with the --profile command-line option
+        "mode": "auto",  # "cprofile" (deterministic, .prof), "sampling" (stack samples, .folded) or "auto"
+        "sample_interval_ms": 5  # Stack sampling period in sampling mode
+    },
+    "logging": {
+        "level": "INFO",
+        "file": "syringe_session.log",  # Rotating session log, written in the output directory
+        "max_bytes": 5000000,
+        "backup_count": 5,
+        "rate_limit_s": 5.0  # Repeats of the same message within this window are suppressed and counted
+    },
+    "features": {
+        "plateau_fraction": 0.8  # Samples at or above this fraction of the peak count as plateau
+    },
+    "filter": {
+        "enabled": False,  # Off by default: plots, features and onset detection use the unfiltered reading
+        "lowpass_hz": 10.0,  # Biquad low-pass cutoff; 0 disables the stage
+        "lowpass_q": 0.7071,
+        "notch_hz": 0.0,  # Mains frequency (50 or 60); 0 disables the stage
+        "notch_q": 30.0
+    },
+    "onset": {
+        "enabled": True,
+        "on_threshold_sd": 6.0,  # Onset when |signal| exceeds this many calibration noise SDs
+        "off_threshold_sd": 3.0,  # Offset when it falls back below this many SDs (hysteresis)
+        "min_threshold": 5e-6,  # Floor for the onset threshold (V/V) when noise is tiny or unknown
+        "trim_idle": False,  # Drop idle lead-in/tail samples from the saved data
+        "trim_margin_s": 0.25,  # Samples kept on either side of the active window when trimming
+        "auto_stop_s": 0  # Stop the trial after this many seconds below threshold (0 = off)
+    },
+    "health": {
+        "saturation_fraction": 0.98,  # Flag raw readings beyond this fraction of full scale (1/gain V/V)
+        "stuck_s": 1.0,  # Flag identical raw readings repeated for this long
+        "gap_factor": 5.0,  # Flag sample gaps longer than this many sampling intervals
+        "error_burst": 5,  # Flag this many read errors ...
+        "error_window_s": 1.0,  # ... within this window
+        "warning_interval_s": 5.0  # Minimum time between repeated UI warnings of the same kind
+    },
+    "rezero": {
+        "enabled": True,
+        "duration_s": 0.3,  # Unloaded reading taken between trials
+        "max_sd_factor": 3.0,  # Reject the reading if its SD exceeds this many calibration noise SDs (sensor touched)
+        "max_step": 5e-5,  # Reject offsets that moved further than this (V/V) from the prediction
+        "model_points": 5  # Recent re-zero points used for the linear drift fit
+    },
+    "pretrigger": {
+        "enabled": False,  # Sample continuously between trials and keep the lead-in before Start
+        "seconds": 1.0,  # Lead-in committed to each trial (negative timestamps in the data file)
+        "countdown": True  # Play the countdown before recording; False starts recording on Start
+    },
+    "force_calibration": {
+        "file": "phidget_force_calibration.json",  # Force polynomials per device serial, channel and bridge gain
+        "degree": 1,  # 1 = gain and offset; 2-3 for a non-linear load cell
+        "point_duration_s": 1.0  # Averaging time for each known-weight reading
+    },
+    "counterbalancing": {
+        "mode": "permutation"  # "permutation" (all n! orders in turn) or "latin_square" (balanced Williams design)
+    },
+    "schedule": {
+        "design": "blocked",  # "blocked", "interleaved" or "random"
+        "seed": None,  # Random design seed; None uses the participant number
+        "max_run_length": 2  # Random design: at most this many consecutive trials of one condition
+    },
+    "stream": {
+        "enabled": False,  # Publish every sample live over UDP (wire format in syringe_stream.py)
+        "host": "127.0.0.1",
+        "port": 8765,
+        "batch_ms": 20,  # Samples are sent in one frame per batch interval
+        "max_samples_per_frame": 256,
+        "queue_size": 10000  # Samples held for a slow sender before the oldest are dropped
+    },
+    "control": {
+        "enabled": False,  # Local HTTP/JSON control API (start, stop, pause, viscosity, recalibrate, status)
+        "host": "127.0.0.1",  # Keep on localhost; the API has no authentication
+        "port": 8766,  # With rigs, each rig gets port + its index unless it sets "control_port"
+        "timeout_s": 5.0  # How long a request waits for the GUI thread
+    },
+    "resample": {
+        "enabled": False,  # Write a uniform-grid copy of the data file at exit (see syringe_resample.py)
+        "gap_factor": 2.0  # Grid points inside sample gaps longer than this many sampling intervals are left empty
+    },
+    "rigs": {},  # name -> {"serial": PhidgetBridge serial, "channels": [bridge channel per viscosity label],
+                 #          optional "control_port"}
+    "calibration_cache": {
+        "enabled": True,
+        "file": "phidget_calibration_cache.json",  # Offsets per device serial, channel and bridge gain
+        "max_age_hours": 12.0,  # Cached offsets older than this are not reused
+        "probe_duration_s": 0.5,  # Quick unloaded reading that confirms the cached offsets still hold
+        "probe_tolerance_sd": 6.0,  # Allowed probe deviation, in cached noise SDs ...
+        "probe_min_tolerance": 2e-6  # ... but never less than this (V/V)
+    },
     "viscosity_labels": ["A", "B", "C"]
 }
 
 
+# ============================================================
+# === Audio Tone Cache =======================================
+# ============================================================
+
+# Synthesized countdown tones keyed by (frequency, duration_ms, sample_rate)
+_TONE_CACHE = {}
+
+
+def get_tone(frequency, duration_ms):
+    """
+    Return a cached pygame Sound for the given tone, synthesizing it on first use.
+
+    The sample rate and channel count come from the running mixer so the tone
+    plays at the requested pitch and length regardless of how pygame was initialized.
+    """
+    sample_rate, _, mixer_channels = pygame.mixer.get_init()
+    key = (frequency, int(duration_ms), sample_rate)
+
+    sound = _TONE_CACHE.get(key)
+    if sound is None:
+        samples = int(sample_rate * duration_ms / 1000.0)
+        wave = np.sin(2 * np.pi * frequency * np.arange(samples) / sample_rate)
+        wave = (wave * 32767).astype(np.int16)
+        if mixer_channels > 1:
+            wave = np.ascontiguousarray(np.repeat(wave[:, None], mixer_channels, axis=1))
+        sound = pygame.sndarray.make_sound(wave)
+        _TONE_CACHE[key] = sound
+    return sound
+
+
+def build_tone_cache(config=None):
+    """
+    (Re)build the tone cache for the configured countdown tone.
+    Call at startup and whenever the audio or countdown settings change.
+    """
+    if AUDIO_METHOD != 'pygame':
+        return
+    if config is None:
+        config = CONFIG
+
+    _TONE_CACHE.clear()
+    try:
+        get_tone(config['audio']['frequency'], int(config['countdown_duration'] * 1000))
+        print(f"✅ Countdown tone cached ({len(_TONE_CACHE)} buffer)")
+    except Exception as e:
+        print(f"⚠️ Could not pre-build countdown tone: {e}")
+
+
+# ============================================================
+# === Timing Telemetry =======================================
+# ============================================================
+
+class LatencyHistogram:
+    """
+    Duration histogram with power-of-two nanosecond buckets.
+    record() is O(1) and allocation-free, so it is safe to call in the sampling loop.
+    """
+
+    NUM_BUCKETS = 40  # Bucket b holds durations in [2^(b-1), 2^b) ns; the last one is open-ended
+
+    def __init__(self):
+        self.buckets = [0] * self.NUM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def record(self, ns):
+        ns = max(0, int(ns))
+        self.buckets[min(ns.bit_length(), self.NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        """Upper bound (ns) of the bucket containing the q-th percentile"""
+        if not self.count:
+            return 0
+        target = q / 100.0 * self.count
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self):
+        """Summary in microseconds"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_us': self.total_ns / self.count / 1000.0,
+            'min_us': self.min_ns / 1000.0,
+            'p50_us': self.percentile(50) / 1000.0,
+            'p90_us': self.percentile(90) / 1000.0,
+            'p99_us': self.percentile(99) / 1000.0,
+            'max_us': self.max_ns / 1000.0,
+            'buckets': {f'<{1 << b}ns': n for b, n in enumerate(self.buckets) if n}
+        }
+
+
+class Telemetry:
+    """Named duration histograms and gauges for the hot paths"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+
+    def record(self, name, ns):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, LatencyHistogram())
+        histogram.record(ns)
+
+    def gauge(self, name, value):
+        """Track the current and highest value of a level such as a queue depth"""
+        current = self.gauges.get(name)
+        peak = value if current is None else max(current['max'], value)
+        self.gauges[name] = {'value': value, 'max': peak}
+
+    def snapshot(self):
+        return {
+            'histograms': {name: h.snapshot() for name, h in list(self.histograms.items())},
+            'gauges': {name: dict(g) for name, g in list(self.gauges.items())}
+        }
+
+    def report_lines(self):
+        """Short human readable lines for the diagnostics panel"""
+        lines = []
+        for name, h in sorted(list(self.histograms.items())):
+            if h.count:
+                lines.append(f"{name:<26} n={h.count:<8} mean={h.total_ns / h.count / 1000.0:9.1f}µs "
+                             f"p50={h.percentile(50) / 1000.0:9.1f}µs p99={h.percentile(99) / 1000.0:9.1f}µs "
+                             f"max={h.max_ns / 1000.0:9.1f}µs")
+        for name, g in sorted(list(self.gauges.items())):
+            lines.append(f"{name:<26} now={g['value']:<8g} max={g['max']:g}")
+        return lines
+
+
+# Shared by the calibration screen and the main GUI
+TELEMETRY = Telemetry()
+
+
 # ============================================================
 # === Helper Functions =======================================
 # ============================================================
@@ -278,31 +568,460 @@ except Exception as e:
     print(f"✅ Using current directory: {os.path.abspath(OUTPUT_DIR)}\n")
 
 
+# ============================================================
+# === Rigs ===================================================
+# ============================================================
+
+# Rig driven by this process (--rig); None for the single-bridge setup
+RIG = None
+
+
+def select_rig(name):
+    """
+    Make this process drive one rig from CONFIG['rigs'] and return its settings.
+    Session files and the session log get the rig name as a suffix, so several
+    rig processes can share one output directory; call it before setup_logging().
+    """
+    global RIG
+    rigs = CONFIG['rigs']
+    if name not in rigs:
+        raise ValueError(f"Unknown rig '{name}' (configured: {', '.join(rigs) or 'none'})")
+    RIG = name
+    print(f"✅ Rig {name}: bridge {rigs[name].get('serial') or 'any'}, channels {rig_channel_numbers()}")
+    return rigs[name]
+
+
+def rig_file_name(filename):
+    """filename with _<rig> inserted before the extension when a rig is selected"""
+    if RIG is None:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{RIG}{ext}"
+
+
+def session_tag(participant_id):
+    """Participant part of the session file names: '<participant>' or '<participant>_<rig>'"""
+    return f"{participant_id}_{RIG}" if RIG is not None else f"{participant_id}"
+
+
+def rig_label():
+    return f" — Rig {RIG}" if RIG is not None else ""
+
+
+def rig_channel_numbers():
+    """Bridge channels of the selected rig in viscosity label order (0..num_channels-1 by default)"""
+    if RIG is not None and CONFIG['rigs'][RIG].get('channels'):
+        return [int(ch) for ch in CONFIG['rigs'][RIG]['channels']]
+    return list(range(CONFIG['num_channels']))
+
+
+def check_rig_channels(name=None):
+    """
+    Raise ValueError unless the rig (or the single-bridge setup for None) has a bridge
+    channel for every viscosity label. Labels are paired with channels in order, so a
+    short channel list would silently leave conditions without a sensor.
+    """
+    labels = CONFIG['viscosity_labels']
+    channels = CONFIG['rigs'].get(name, {}).get('channels') if name is not None else None
+    if channels:
+        if len(channels) != len(labels):
+            raise ValueError(f"Rig '{name}' lists {len(channels)} channel(s) {channels} for {len(labels)} "
+                             f"viscosity labels {labels}; give one bridge channel per label")
+    elif CONFIG['num_channels'] < len(labels):
+        raise ValueError(f"num_channels is {CONFIG['num_channels']} but there are {len(labels)} viscosity labels "
+                         f"{labels}; each label needs its own bridge channel")
+
+
+def rig_control_port():
+    """Control API port for this process: the rig's control_port, else control.port + the rig's index"""
+    port = CONFIG['control']['port']
+    if RIG is None:
+        return port
+    return int(CONFIG['rigs'][RIG].get('control_port', port + list(CONFIG['rigs']).index(RIG)))
+
+
+def launch_rigs(names, extra_args=()):
+    """
+    Start one copy of this program per rig and wait for all of them.
+    Separate processes give every bridge its own sampling loop, Tk window and
+    interpreter, so rigs do not compete for one GIL. Returns the number of rigs that failed.
+    """
+    processes = []
+    for name in names:
+        command = [sys.executable, os.path.abspath(__file__), '--rig', name, *extra_args]
+        print(f"🚀 Starting rig {name} (bridge {CONFIG['rigs'][name].get('serial') or 'any'})")
+        processes.append((name, subprocess.Popen(command)))
+
+    failed = 0
+    for name, process in processes:
+        code = process.wait()
+        if code:
+            failed += 1
+            print(f"⚠️ Rig {name} exited with code {code}")
+        else:
+            print(f"✅ Rig {name} finished")
+    return failed
+
+
+# ============================================================
+# === Logging ================================================
+# ============================================================
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets each message key through at most once per interval_s.
+
+    Suppressed records are only counted. The next record that passes for the
+    same key carries "(suppressed N similar messages)". The key is the record's
+    'key' extra if given, otherwise the unformatted message template, so
+    repeats that differ only in their arguments count as similar.
+
+    Per-event audit lines (one per command, re-zero or trial) pass
+    extra={'rate_limit': False} and are never suppressed or tracked. Keys idle
+    for a whole interval with nothing suppressed are pruned, so the state stays
+    bounded in long sessions.
+    """
+
+    def __init__(self, interval_s=5.0):
+        super().__init__()
+        self.interval_s = interval_s
+        self._state = {}  # key -> [last emitted (monotonic s), suppressed count, message template]
+        self._lock = threading.Lock()
+        self._pruned = time.monotonic()
+
+    def filter(self, record):
+        if not getattr(record, 'rate_limit', True):
+            return True
+        key = getattr(record, 'key', None) or (record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned >= self.interval_s:
+                self._prune(now)
+            state = self._state.get(key)
+            if state is not None and now - state[0] < self.interval_s:
+                state[1] += 1
+                return False
+            suppressed = state[1] if state is not None else 0
+            self._state[key] = [now, 0, record.msg]
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} (suppressed {suppressed} similar messages)"
+            record.args = None
+        return True
+
+    def _prune(self, now):
+        """Forget keys that would pass again anyway and have no suppressed count to report (lock held)"""
+        self._state = {key: state for key, state in self._state.items()
+                       if state[1] or now - state[0] < self.interval_s}
+        self._pruned = now
+
+    def pending_summaries(self):
+        """(message template, count) for messages suppressed since they were last emitted; resets the counts"""
+        with self._lock:
+            pending = [(state[2], state[1]) for state in self._state.values() if state[1]]
+            for state in self._state.values():
+                state[1] = 0
+        return pending
+
+
+logger = logging.getLogger("syringe")
+_log_listener = None
+_log_handler = None
+_log_rate_limit = None
+
+
+def setup_logging(config=None):
+    """
+    Route the 'syringe' logger through a QueueHandler so the calling thread never
+    waits on console or disk I/O. A QueueListener thread writes to the console
+    and to a rotating session log in OUTPUT_DIR.
+
+    Importing the module starts nothing: the program (and the benchmark, soak
+    and replay scripts) call this once OUTPUT_DIR and the rig are set. Until
+    then, warnings go to stderr through the logging module's last resort handler.
+    """
+    global _log_listener, _log_handler, _log_rate_limit
+    if _log_listener is not None:
+        return
+    if config is None:
+        config = CONFIG
+    log_config = config['logging']
+
+    formatter = logging.Formatter("%(asctime)s %(levelname)-7s [%(threadName)s] %(message)s")
+    handlers = []
+
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    handlers.append(console)
+
+    try:
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(OUTPUT_DIR, rig_file_name(log_config['file'])),
+            maxBytes=log_config['max_bytes'],
+            backupCount=log_config['backup_count'],
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except Exception as e:
+        print(f"⚠️ Could not open session log file: {e}")
+
+    _log_rate_limit = RateLimitFilter(log_config['rate_limit_s'])
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(_log_rate_limit)
+
+    logger.setLevel(log_config['level'])
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    _log_handler = queue_handler
+
+    _log_listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+
+def shutdown_logging():
+    """Report any still-suppressed messages, then flush and stop the log listener and close the log file"""
+    global _log_listener, _log_handler
+    if _log_listener is None:
+        return
+    for template, count in _log_rate_limit.pending_summaries():
+        logger.warning("Suppressed %d similar messages: %s", count, template, extra={'key': ('summary', template)})
+    _log_listener.stop()
+    for handler in _log_listener.handlers:
+        handler.close()
+    logger.removeHandler(_log_handler)
+    logger.propagate = True
+    _log_listener = None
+    _log_handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+# ============================================================
+# === Profiling ==============================================
+# ============================================================
+
+class SessionProfiler:
+    """
+    Optional per-thread profiling of the session threads: the Tk loop, the
+    orchestrator loop, the countdown and acquisition executor calls, the
+    background saver and the calibration thread.
+
+    In cprofile mode each wrapped function runs under its own cProfile.Profile;
+    profiles of the same role are merged into <prefix>_<role>.prof (pstats /
+    snakeviz). In sampling mode a sampler thread reads every thread's stack from
+    sys._current_frames() each sample_interval_ms and writes collapsed stacks,
+    one "outer;...;inner count" line each, to <prefix>_<thread>.folded for
+    flame graph tools.
+
+    When profiling is off, wrap() returns the function itself, so the
+    threads run exactly as they do without the profiler.
+    """
+
+    MODES = ('auto', 'cprofile', 'sampling')
+
+    def __init__(self):
+        self.enabled = False
+        self.mode = self.default_mode()
+        self.interval_s = 0.005
+        self._lock = threading.Lock()
+        self._profiles = {}  # role -> [cProfile.Profile]
+        self._stacks = {}  # thread/role name -> {collapsed stack: samples}
+        self._roles = {}  # thread ident -> role while a wrapped function runs
+        self._sampler = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def default_mode():
+        """'auto' mode: sampling on Python 3.12+, which runs only one cProfile at a time; cprofile before"""
+        return 'sampling' if sys.version_info >= (3, 12) else 'cprofile'
+
+    def configure(self, profiling_config, mode=None):
+        """Apply the 'profiling' config section; a mode given on the command line also enables profiling"""
+        self.enabled = bool(profiling_config.get('enabled', False)) or mode is not None
+        self.mode = mode or profiling_config.get('mode', 'auto')
+        if self.mode not in self.MODES:
+            print(f"⚠️ Unknown profiling mode '{self.mode}', using sampling")
+            self.mode = 'sampling'
+        elif self.mode == 'auto':
+            self.mode = self.default_mode()
+        elif self.enabled and self.mode == 'cprofile' and sys.version_info >= (3, 12):
+            print("⚠️ Python 3.12+ runs only one cProfile at a time, so only the first session thread is "
+                  "profiled; use sampling mode to profile all of them")
+        self.interval_s = max(0.001, profiling_config.get('sample_interval_ms', 5) / 1000.0)
+
+        if self.enabled:
+            print(f"📊 Profiling enabled ({self.mode})")
+            if self.mode == 'sampling' and self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+                self._sampler.start()
+
+    def wrap(self, role, fn):
+        """fn itself when profiling is off, otherwise a wrapper that profiles each call under role"""
+        if not self.enabled:
+            return fn
+
+        def profiled(*args, **kwargs):
+            return self.run(role, fn, *args, **kwargs)
+
+        return profiled
+
+    def run(self, role, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) on the current thread, profiled under role when enabled"""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        ident = threading.get_ident()
+        self._roles[ident] = role
+        profile = None
+        try:
+            if self.mode == 'cprofile':
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError as e:
+                    # Python 3.12+ allows only one active cProfile at a time
+                    logger.warning("Cannot profile %s with cProfile (%s); use --profile sampling", role, e,
+                                   extra={'key': ('profile', role)})
+                    profile = None
+            return fn(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    self._profiles.setdefault(role, []).append(profile)
+            self._roles.pop(ident, None)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    name = self._roles.get(ident) or names.get(ident, str(ident))
+                    counts = self._stacks.setdefault(name, {})
+                    key = ';'.join(reversed(stack))
+                    counts[key] = counts.get(key, 0) + 1
+            del frames
+
+    def dump(self, directory, prefix):
+        """Stop sampling and write everything collected so far; returns the files written"""
+        if not self.enabled:
+            return []
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+
+        with self._lock:
+            profiles, self._profiles = self._profiles, {}
+            stacks, self._stacks = self._stacks, {}
+
+        written = []
+        for role, items in profiles.items():
+            try:
+                path = os.path.join(directory, f"{prefix}_{re.sub(r'[^A-Za-z0-9_-]+', '_', role)}.prof")
+                stats = pstats.Stats(items[0])
+                for profile in items[1:]:
+                    stats.add(profile)
+                stats.dump_stats(path)
+                written.append(path)
+            except Exception as e:
+                print(f"⚠️ Could not write profile for {role}: {e}")
+
+        for name, counts in stacks.items():
+            path = os.path.join(directory, f"{prefix}_{re.sub(r'[^A-Za-z0-9_-]+', '_', name)}.folded")
+
+            def write_stacks(f, counts=counts):
+                for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+                    f.write(f"{stack} {count}\n")
+
+            success, error = safe_file_write(path, write_stacks)
+            if success:
+                written.append(path)
+            else:
+                print(f"⚠️ Could not write stack samples for {name}: {error}")
+
+        for path in written:
+            print(f"📊 Profile written: {path}")
+        return written
+
+
+# Configured from CONFIG['profiling'] / --profile in __main__; does nothing until then
+PROFILER = SessionProfiler()
+
+
 # =======================================================
 # ============Permutation================================
 # =======================================================
 
-def get_counterbalanced_order(participant_id, conditions=None):
+def kth_permutation(items, k):
+    """
+    The k-th permutation of items in itertools.permutations order, computed directly
+    from the Lehmer code (factorial number system) of k in O(n²) without listing the others.
+    """
+    remaining = list(items)
+    k %= math.factorial(len(remaining))
+    order = []
+    for position in range(len(remaining) - 1, -1, -1):
+        index, k = divmod(k, math.factorial(position))
+        order.append(remaining.pop(index))
+    return order
+
+
+def latin_square_row(items, row):
+    """
+    Row of a balanced (Williams) Latin square over items, in O(n). Each condition appears
+    once in every position and follows every other condition equally often. Even n needs
+    n rows; odd n needs 2n, the second n being the first n reversed.
+    """
+    n = len(items)
+    if n == 0:
+        return []
+    rows = n if n % 2 == 0 else 2 * n
+    row %= rows
+    first = [(j + 1) // 2 if j % 2 else (n - j // 2) % n for j in range(n)]
+    order = [items[(x + row) % n] for x in first]
+    return order[::-1] if row >= n else order
+
+
+def participant_number(participant_id):
+    """Digits of a participant ID as a positive number (1 if there are none)"""
+    try:
+        p_num = int(''.join(filter(str.isdigit, str(participant_id))))
+        return p_num if p_num > 0 else 1
+    except ValueError:
+        return 1
+
+
+def get_counterbalanced_order(participant_id, conditions=None, mode=None):
     """
     Returns a counterbalanced order for viscosities based on participant ID.
-    Cycles through all 6 permutations of conditions.
+    "permutation" mode cycles through all n! orders of the conditions;
+    "latin_square" mode cycles through the rows of a balanced Latin square.
     """
     if conditions is None:
         conditions = CONFIG['viscosity_labels']
+    if mode is None:
+        mode = CONFIG['counterbalancing']['mode']
 
     try:
-        permutations = list(itertools.permutations(conditions))
+        p_num = participant_number(participant_id)
 
-        # Try to extract a numeric participant number from ID
-        try:
-            p_num = int(''.join(filter(str.isdigit, str(participant_id))))
-            if p_num <= 0:
-                p_num = 1
-        except:
-            p_num = 1
-
-        index = (p_num - 1) % len(permutations)
-        return list(permutations[index])
+        if mode == 'latin_square':
+            return latin_square_row(list(conditions), p_num - 1)
+        if mode != 'permutation':
+            print(f"⚠️ Unknown counterbalancing mode '{mode}', using permutation")
+        return kth_permutation(conditions, p_num - 1)
 
     except Exception as e:
         print(f"⚠️ Error calculating counterbalanced order: {e}")
@@ -310,13 +1029,133 @@ def get_counterbalanced_order(participant_id, conditions=None):
         return conditions if conditions else ['A', 'B', 'C']
 
 
+# ============================================================
+# === Trial Schedule =========================================
+# ============================================================
+
+SCHEDULE_DESIGNS = ('blocked', 'interleaved', 'random')
+
+
+def build_trial_schedule(order, trials_per_condition, design='blocked', seed=None, max_run_length=2):
+    """
+    Expand a design into the full list of trial conditions for a session.
+
+    blocked:     all trials of each condition together, in counterbalanced order
+    interleaved: one trial of each condition in turn, repeated
+    random:      seeded shuffle with no more than max_run_length identical conditions in a row
+    """
+    order = list(order)
+    if design == 'blocked':
+        return [label for label in order for _ in range(trials_per_condition)]
+    if design == 'interleaved':
+        return order * trials_per_condition
+    if design != 'random':
+        raise ValueError(f"Unknown schedule design '{design}'")
+
+    rng = random.Random(seed)
+    max_run_length = max(1, int(max_run_length))
+    for _ in range(1000):
+        remaining = {label: trials_per_condition for label in order}
+        schedule = []
+        while len(schedule) < trials_per_condition * len(order):
+            # A condition that just filled a whole run cannot be drawn again
+            run_label = None
+            if len(schedule) >= max_run_length and len(set(schedule[-max_run_length:])) == 1:
+                run_label = schedule[-1]
+            choices = [label for label in order if remaining[label] and label != run_label]
+            if not choices:
+                break
+            label = rng.choices(choices, weights=[remaining[c] for c in choices])[0]
+            remaining[label] -= 1
+            schedule.append(label)
+        else:
+            return schedule
+    raise ValueError(f"No random schedule with runs of at most {max_run_length} was found")
+
+
+class TrialSchedule:
+    """
+    Precomputed trial table for a session: the condition of every trial plus the
+    number of trials per condition. advance() is an O(1) cursor step.
+    """
+
+    def __init__(self, conditions, design, seed=None, max_run_length=None):
+        self.conditions = tuple(conditions)
+        self.design = design
+        self.seed = seed
+        self.max_run_length = max_run_length
+        self.totals = {}
+        for label in self.conditions:
+            self.totals[label] = self.totals.get(label, 0) + 1
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.conditions)
+
+    @property
+    def finished(self):
+        return self.cursor >= len(self.conditions)
+
+    @property
+    def current(self):
+        """Condition of the trial at the cursor (None once the schedule is finished)"""
+        return None if self.finished else self.conditions[self.cursor]
+
+    def advance(self):
+        """Move to the next scheduled trial; False when the schedule is used up"""
+        if self.cursor < len(self.conditions):
+            self.cursor += 1
+        return not self.finished
+
+    def remaining(self, label):
+        """Scheduled trials of a condition from the cursor on (the cursor does not move)"""
+        return self.conditions[self.cursor:].count(label)
+
+    def header_rows(self):
+        """'#' rows describing the design and the full table, for the data file header"""
+        settings = [f'design={self.design}']
+        if self.design == 'random':
+            settings += [f'seed={self.seed}', f'max_run_length={self.max_run_length}']
+        return [['# Schedule:'] + settings,
+                ['# Schedule Trials:'] + list(self.conditions)]
+
+
+def create_trial_schedule(participant_id, order, trials_per_condition, schedule_config=None):
+    """TrialSchedule for a participant from the 'schedule' config section"""
+    if schedule_config is None:
+        schedule_config = CONFIG['schedule']
+    design = schedule_config['design']
+    if design not in SCHEDULE_DESIGNS:
+        print(f"⚠️ Unknown schedule design '{design}', using blocked")
+        design = 'blocked'
+    seed = schedule_config.get('seed')
+    if seed is None:
+        seed = participant_number(participant_id)
+    max_run_length = schedule_config.get('max_run_length', 2)
+
+    try:
+        conditions = build_trial_schedule(order, trials_per_condition, design, seed, max_run_length)
+    except ValueError as e:
+        print(f"⚠️ {e}; using interleaved schedule")
+        design = 'interleaved'
+        conditions = build_trial_schedule(order, trials_per_condition, design)
+    return TrialSchedule(conditions, design, seed, max_run_length)
+
+
 # ============================================================
 # === Calibration ============================================
 # ============================================================
 
-def load_calibration(filename=CALIBRATION_FILE):
-    """Load calibration offsets from CSV file with error handling"""
+def load_calibration(filename=None, include_noise=False):
+    """
+    Load calibration offsets from CSV file with error handling.
+    With include_noise=True returns (offsets, noise_sd) dicts; noise is empty
+    for files written before noise was recorded.
+    """
+    if filename is None:
+        filename = rig_file_name(CALIBRATION_FILE)
     calibration = {}
+    noise = {}
     try:
         with open(filename, newline='') as f:
             reader = csv.DictReader(f)
@@ -325,6 +1164,8 @@ def load_calibration(filename=CALIBRATION_FILE):
                     channel = int(row["Channel"])
                     offset = float(row["Offset (VoltageRatio)"])
                     calibration[channel] = offset
+                    if row.get("Noise_SD (VoltageRatio)"):
+                        noise[channel] = float(row["Noise_SD (VoltageRatio)"])
                 except (ValueError, KeyError) as e:
                     print(f"⚠️ Skipping invalid calibration row: {e}")
 
@@ -333,23 +1174,31 @@ def load_calibration(filename=CALIBRATION_FILE):
         print("⚠️ No calibration file found — using zero offsets.")
     except Exception as e:
         print(f"⚠️ Error loading calibration: {e}")
+    if include_noise:
+        return calibration, noise
     return calibration
 
 
-def save_calibration(calibration, participant_id=None, filename=None):
-    """Save calibration offsets to CSV file with error handling"""
+def save_calibration(calibration, participant_id=None, filename=None, noise=None):
+    """Save calibration offsets (and optional per-channel noise SD) to CSV file with error handling"""
     if filename is None:
         if participant_id:
-            filename = f"phidget_calibration_{participant_id}.csv"
+            filename = f"phidget_calibration_{session_tag(participant_id)}.csv"
         else:
-            filename = CALIBRATION_FILE
+            filename = rig_file_name(CALIBRATION_FILE)
 
     try:
         def write_calibration(f):
-            w = csv.DictWriter(f, fieldnames=["Channel", "Offset (VoltageRatio)"])
+            fieldnames = ["Channel", "Offset (VoltageRatio)"]
+            if noise:
+                fieldnames.append("Noise_SD (VoltageRatio)")
+            w = csv.DictWriter(f, fieldnames=fieldnames)
             w.writeheader()
             for ch, off in calibration.items():
-                w.writerow({"Channel": ch, "Offset (VoltageRatio)": off})
+                row = {"Channel": ch, "Offset (VoltageRatio)": off}
+                if noise:
+                    row["Noise_SD (VoltageRatio)"] = noise.get(ch, 0.0)
+                w.writerow(row)
 
         success, error = safe_file_write(filename, write_calibration)
         if success:
@@ -367,72 +1216,1287 @@ def save_calibration(calibration, participant_id=None, filename=None):
         print(f"⚠️ Unexpected error saving calibration: {e}")
 
 
+def bridge_gain_value(vi, default=None):
+    """Bridge gain of a channel as a number (1-128), or default if it cannot be read"""
+    try:
+        from Phidget22.BridgeGain import BridgeGain
+        gain_enum = vi.getBridgeGain()
+        for value in (1, 2, 4, 8, 16, 32, 64, 128):
+            if gain_enum == getattr(BridgeGain, f"BRIDGE_GAIN_{value}"):
+                return value
+    except Exception:
+        pass
+    return default
+
+
+def calibration_cache_key(vi):
+    """'serial:channel:gain' identifying one physical bridge input, or None if it cannot be read"""
+    try:
+        return f"{vi.getDeviceSerialNumber()}:{vi.getChannel()}:{bridge_gain_value(vi, CONFIG['bridge_gain'])}"
+    except Exception as e:
+        print(f"⚠️ Could not identify channel for the calibration cache: {e}")
+        return None
+
+
+def load_calibration_cache(filename=None):
+    """Cached calibrations keyed by calibration_cache_key(); empty if the cache is missing or unreadable"""
+    filename = filename or CONFIG['calibration_cache']['file']
+    try:
+        with open(filename, 'r') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ Error reading calibration cache: {e}")
+        return {}
+
+
+def update_calibration_cache(channels, offsets, noise, participant_id=None, filename=None):
+    """Store fresh offsets and noise for each connected channel under its serial/channel/gain key"""
+    filename = filename or CONFIG['calibration_cache']['file']
+    cache = load_calibration_cache(filename)
+    timestamp = datetime.now().isoformat(timespec='seconds')
+    for vi in channels:
+        key = calibration_cache_key(vi)
+        channel = vi.getChannel()
+        if key is None or channel not in offsets:
+            continue
+        cache[key] = {
+            'offset': offsets[channel],
+            'noise_sd': noise.get(channel, 0.0),
+            'timestamp': timestamp,
+            'participant_id': participant_id
+        }
+
+    success, error = safe_file_write(filename, lambda f: json.dump(cache, f, indent=2))
+    if success:
+        print(f"💾 Updated calibration cache {filename}")
+    else:
+        print(f"⚠️ Could not update calibration cache: {error}")
+    return success
+
+
+def lookup_cached_calibration(channels, max_age_hours=None, filename=None):
+    """
+    Cached offsets for every connected channel, if all of them are present and recent.
+    Returns (offsets, noise, oldest age in hours) or (None, None, reason).
+    """
+    cache_config = CONFIG['calibration_cache']
+    if max_age_hours is None:
+        max_age_hours = cache_config['max_age_hours']
+    cache = load_calibration_cache(filename)
+    offsets, noise = {}, {}
+    oldest = 0.0
+    for vi in channels:
+        key = calibration_cache_key(vi)
+        entry = cache.get(key) if key is not None else None
+        if entry is None:
+            return None, None, f"no cached calibration for {key}"
+        try:
+            age = (datetime.now() - datetime.fromisoformat(entry['timestamp'])).total_seconds() / 3600.0
+            if age > max_age_hours:
+                return None, None, f"cached calibration for {key} is {age:.1f} h old"
+            offsets[vi.getChannel()] = float(entry['offset'])
+            noise[vi.getChannel()] = float(entry.get('noise_sd', 0.0))
+        except (KeyError, TypeError, ValueError) as e:
+            return None, None, f"invalid cache entry for {key}: {e}"
+        oldest = max(oldest, age)
+    return offsets, noise, oldest
+
+
+def probe_calibration_drift(channels, offsets, noise, duration_s=None):
+    """
+    Read the unloaded channels briefly and compare their mean with the cached offsets.
+    Returns (ok, {channel: deviation}); ok is False if any channel moved beyond tolerance.
+    """
+    cache_config = CONFIG['calibration_cache']
+    if duration_s is None:
+        duration_s = cache_config['probe_duration_s']
+    readings = {vi.getChannel(): [] for vi in channels}
+    end = time.time() + duration_s
+    while time.time() < end:
+        for vi in channels:
+            try:
+                readings[vi.getChannel()].append(vi.getVoltageRatio())
+            except Exception as e:
+                logger.warning("Drift probe: error reading channel %s: %s", vi.getChannel(), e,
+                               extra={'key': ('probe_read', vi.getChannel())})
+        time.sleep(CONFIG['sampling_interval'])
+
+    ok = True
+    deviations = {}
+    for channel, values in readings.items():
+        if not values:
+            return False, deviations
+        deviation = float(np.mean(values)) - offsets[channel]
+        tolerance = max(cache_config['probe_tolerance_sd'] * noise.get(channel, 0.0),
+                        cache_config['probe_min_tolerance'])
+        deviations[channel] = deviation
+        if abs(deviation) > tolerance:
+            ok = False
+    return ok, deviations
+
+
+# ============================================================
+# === Force Calibration ======================================
+# ============================================================
+
+STANDARD_GRAVITY = 9.80665  # m/s², for known weights entered in grams
+
+
+def fit_force_calibration(voltage_ratios, forces, degree=1):
+    """
+    Least-squares polynomial from calibrated voltage ratios (V/V) to force (N).
+    Returns (coefficients highest power first, RMS residual in N). The degree is
+    capped at one less than the number of distinct readings.
+    """
+    x = np.asarray(voltage_ratios, dtype=float)
+    y = np.asarray(forces, dtype=float)
+    distinct = len(np.unique(x))
+    if distinct < 2:
+        raise ValueError("At least two different readings are needed for a force calibration")
+    degree = min(max(1, int(degree)), distinct - 1)
+    coefficients = np.polyfit(x, y, degree)
+    residual = y - np.polyval(coefficients, x)
+    return coefficients, float(np.sqrt(np.mean(residual ** 2)))
+
+
+def force_from_ratio(coefficients, voltage_ratios):
+    """Force (N) for a whole array of calibrated voltage ratios in one vectorized pass"""
+    return np.polyval(np.asarray(coefficients, dtype=float), np.asarray(voltage_ratios, dtype=float))
+
+
+def format_force_coefficients(coefficients):
+    """Coefficients as a ';'-separated string (highest power first), as written in the data files"""
+    return ';'.join(f"{c:.10g}" for c in coefficients)
+
+
+def parse_force_coefficients(text):
+    return tuple(float(c) for c in str(text).split(';') if c.strip())
+
+
+def load_force_calibration(channels, filename=None):
+    """
+    Force polynomial per connected channel, looked up by serial/channel/gain.
+    Channels without a stored force calibration use DEFAULT_FORCE_COEFFICIENTS.
+    """
+    filename = filename or CONFIG['force_calibration']['file']
+    stored = {}
+    try:
+        with open(filename, 'r') as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Error reading force calibration: {e}")
+
+    coefficients = {}
+    for vi in channels:
+        entry = stored.get(calibration_cache_key(vi))
+        channel = vi.getChannel()
+        try:
+            coefficients[channel] = tuple(float(c) for c in entry['coefficients'])
+            print(f"✅ CH{channel} force calibration: degree {len(coefficients[channel]) - 1} "
+                  f"from {entry.get('timestamp', '?')}")
+        except (TypeError, KeyError, ValueError):
+            coefficients[channel] = DEFAULT_FORCE_COEFFICIENTS
+    return coefficients
+
+
+def save_force_calibration(vi, coefficients, points, rms_residual, filename=None):
+    """Store a channel's fitted force polynomial and the known-weight points it came from"""
+    filename = filename or CONFIG['force_calibration']['file']
+    stored = {}
+    try:
+        with open(filename, 'r') as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Error reading force calibration, it will be rewritten: {e}")
+
+    key = calibration_cache_key(vi)
+    if key is None:
+        return False
+    stored[key] = {
+        'coefficients': [float(c) for c in coefficients],
+        'rms_residual_N': rms_residual,
+        'points': [[float(v), float(n)] for v, n in points],
+        'timestamp': datetime.now().isoformat(timespec='seconds')
+    }
+    success, error = safe_file_write(filename, lambda f: json.dump(stored, f, indent=2))
+    if success:
+        print(f"💾 Saved force calibration for {key} to {filename}")
+    else:
+        print(f"⚠️ Error saving force calibration: {error}")
+    return success
+
+
+# ============================================================
+# === Phidget Connection =====================================
+# ============================================================
+
+def connect_channels(serial=None, channel_numbers=None):
+    """
+    Open channels on the PhidgetBridge with comprehensive error handling.
+    serial selects one bridge when several are attached (None = first found);
+    channel_numbers defaults to 0..num_channels-1.
+    Returns a list of active VoltageRatioInput objects.
+    """
+    active = []
+    if channel_numbers is None:
+        channel_numbers = list(range(CONFIG['num_channels']))
+    bridge_gain = CONFIG['bridge_gain']
+
+    print(f"🔌 Connecting to PhidgetBridge {serial or '(any serial)'} channels {channel_numbers}...")
+    print(f"   Setting bridge gain to: {bridge_gain}x")
+
+    for ch_num in channel_numbers:
+        try:
+            vi = VoltageRatioInput()
+            if serial:
+                vi.setDeviceSerialNumber(int(serial))
+            vi.setChannel(ch_num)
+
+            # Attempt to open with timeout
+            try:
+                vi.openWaitForAttachment(1000)
+            except PhidgetException as e:
+                print(f"⚠️ Channel {ch_num} not found: {e}")
+                continue
+
+            # Set bridge gain from config
+            try:
+                from Phidget22.BridgeGain import BridgeGain
+                gain_map = {
+                    1: BridgeGain.BRIDGE_GAIN_1,
+                    2: BridgeGain.BRIDGE_GAIN_2,
+                    4: BridgeGain.BRIDGE_GAIN_4,
+                    8: BridgeGain.BRIDGE_GAIN_8,
+                    16: BridgeGain.BRIDGE_GAIN_16,
+                    32: BridgeGain.BRIDGE_GAIN_32,
+                    64: BridgeGain.BRIDGE_GAIN_64,
+                    128: BridgeGain.BRIDGE_GAIN_128
+                }
+
+                if bridge_gain in gain_map:
+                    vi.setBridgeGain(gain_map[bridge_gain])
+                    print(f"✅ Channel {ch_num} attached (gain: {bridge_gain}x)")
+                else:
+                    print(f"⚠️ Invalid gain {bridge_gain}, using default for channel {ch_num}")
+                    print(f"✅ Channel {ch_num} attached (gain: default)")
+            except Exception as e:
+                print(f"⚠️ Could not set gain for channel {ch_num}: {e}")
+                print(f"✅ Channel {ch_num} attached (gain: default)")
+
+            active.append(vi)
+
+        except PhidgetException as e:
+            print(f"⚠️ Channel {ch_num} error: {e}")
+        except Exception as e:
+            print(f"⚠️ Unexpected error connecting channel {ch_num}: {e}")
+
+    if not active:
+        print("❌ No channels connected")
+        print("   TIP: Check USB connection and ensure Phidget22 drivers are installed")
+    else:
+        print(f"✅ Total: {len(active)} channel(s) connected successfully\n")
+
+    return active
+
+
+# ============================================================
+# === Simulated Sensor =======================================
+# ============================================================
+
+class SimulatedVoltageRatioInput:
+    """
+    Stand-in for a Phidget VoltageRatioInput used by the benchmark and soak
+    scripts. Produces a constant bridge offset plus Gaussian noise, with a
+    smooth syringe press (raised-cosine pulse) every press_period_s seconds.
+
+    values_at() evaluates the same signal for an array of times, so long
+    sessions can be generated without waiting for them in real time.
+    """
+
+    def __init__(self, channel, offset=None, noise_sd=2e-6, press_amplitude=5e-5, press_period_s=4.0,
+                 press_duration_s=1.5, read_delay_s=0.0, seed=None):
+        self.channel = channel
+        self.offset = 1e-4 * (channel + 1) if offset is None else offset
+        self.noise_sd = noise_sd
+        self.press_amplitude = press_amplitude
+        self.press_period_s = press_period_s
+        self.press_duration_s = press_duration_s
+        self.read_delay_s = read_delay_s
+        self.rng = np.random.default_rng(seed)
+        self.t0 = time.perf_counter()
+        self.reads = 0
+
+    def values_at(self, times):
+        """Simulated voltage ratios at the given times (seconds since the sensor was created)"""
+        times = np.asarray(times, dtype=float)
+        phase = np.mod(times, self.press_period_s) / self.press_duration_s
+        press = np.where(phase < 1.0, 0.5 - 0.5 * np.cos(2 * np.pi * np.minimum(phase, 1.0)), 0.0)
+        noise = self.rng.normal(0.0, self.noise_sd, times.shape)
+        return self.offset + self.press_amplitude * press + noise
+
+    def getChannel(self):
+        return self.channel
+
+    def getDeviceSerialNumber(self):
+        return 0
+
+    def getVoltageRatio(self):
+        if self.read_delay_s:
+            time.sleep(self.read_delay_s)
+        self.reads += 1
+        return float(self.values_at(time.perf_counter() - self.t0))
+
+    def getBridgeGain(self):
+        from Phidget22.BridgeGain import BridgeGain
+        return BridgeGain.BRIDGE_GAIN_128
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# === Streaming Filters ======================================
+# ============================================================
+
+def biquad_lowpass(cutoff_hz, fs, q=0.7071):
+    """RBJ cookbook low-pass biquad as a normalized [b0, b1, b2, 1, a1, a2] section"""
+    w0 = 2 * np.pi * cutoff_hz / fs
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    a0 = 1 + alpha
+    b = np.array([(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]) / a0
+    a = np.array([1.0, -2 * cos_w0 / a0, (1 - alpha) / a0])
+    return np.concatenate((b, a))
+
+
+def biquad_notch(center_hz, fs, q=30.0):
+    """RBJ cookbook notch biquad as a normalized [b0, b1, b2, 1, a1, a2] section"""
+    w0 = 2 * np.pi * center_hz / fs
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    a0 = 1 + alpha
+    b = np.array([1.0, -2 * cos_w0, 1.0]) / a0
+    a = np.array([1.0, -2 * cos_w0 / a0, (1 - alpha) / a0])
+    return np.concatenate((b, a))
+
+
+class StreamingFilter:
+    """
+    Cascade of biquad sections (transposed direct form II) with independent
+    state per channel.
+
+    Single samples go through process(); buffered samples go through
+    process_block(), which uses scipy's sosfilt when available. Both paths share
+    the same per-channel state, so they can be mixed freely. A channel's state
+    is initialized to the steady state of its first sample, so a trial never
+    starts with a filter transient.
+    """
+
+    def __init__(self, filter_config, fs):
+        self.fs = fs
+        self.description = []
+        sections = []
+
+        if filter_config.get('enabled', False):
+            nyquist = fs / 2.0
+
+            lowpass_hz = filter_config.get('lowpass_hz', 0)
+            if 0 < lowpass_hz < nyquist:
+                sections.append(biquad_lowpass(lowpass_hz, fs, filter_config.get('lowpass_q', 0.7071)))
+                self.description.append(f"lowpass {lowpass_hz:g} Hz")
+            elif lowpass_hz:
+                print(f"⚠️ Low-pass cutoff {lowpass_hz} Hz is not below Nyquist ({nyquist:g} Hz) - stage skipped")
+
+            notch_hz = filter_config.get('notch_hz', 0)
+            if notch_hz:
+                # Mains above Nyquist aliases down; notch the frequency it actually lands on
+                aliased = abs(notch_hz - fs * round(notch_hz / fs))
+                if 0 < aliased < nyquist:
+                    sections.append(biquad_notch(aliased, fs, filter_config.get('notch_q', 30.0)))
+                    self.description.append(f"notch {aliased:g} Hz" +
+                                            (f" (aliased {notch_hz:g} Hz)" if aliased != notch_hz else ""))
+                else:
+                    print(f"⚠️ notch_hz {notch_hz:g} Hz aliases to {aliased:g} Hz (DC or Nyquist) at {fs:g} Hz "
+                          f"sampling, where a notch would remove the signal itself - notch stage skipped; "
+                          f"set notch_hz to 0 or change the sampling frequency")
+
+        self.sos = np.array(sections).reshape(-1, 6)
+        self._coefficients = [tuple(section) for section in self.sos]
+        self._state = {}
+
+    @property
+    def active(self):
+        return len(self._coefficients) > 0
+
+    def describe(self):
+        return "; ".join(self.description) if self.description else "none"
+
+    def clear(self, channel=None):
+        """Forget filter state for one channel (or all); the next sample re-primes it"""
+        if channel is None:
+            self._state.clear()
+        else:
+            self._state.pop(channel, None)
+
+    def _prime(self, channel, x0):
+        state = []
+        for b0, b1, b2, _, a1, a2 in self._coefficients:
+            y0 = x0 * (b0 + b1 + b2) / (1 + a1 + a2)
+            state.append([y0 - b0 * x0, b2 * x0 - a2 * y0])
+            x0 = y0
+        self._state[channel] = state
+        return state
+
+    def process(self, channel, x):
+        """Filter one sample for a channel"""
+        if not self._coefficients:
+            return x
+        state = self._state.get(channel)
+        if state is None:
+            state = self._prime(channel, x)
+
+        for (b0, b1, b2, _, a1, a2), z in zip(self._coefficients, state):
+            y = b0 * x + z[0]
+            z[0] = b1 * x - a1 * y + z[1]
+            z[1] = b2 * x - a2 * y
+            x = y
+        return x
+
+    def process_block(self, channel, values):
+        """Filter a buffer of samples for a channel and return a NumPy array"""
+        values = np.asarray(values, dtype=float)
+        if not self._coefficients or values.size == 0:
+            return values.copy()
+
+        if channel not in self._state:
+            self._prime(channel, float(values[0]))
+
+        if USE_SCIPY:
+            zi = np.array(self._state[channel])
+            out, zf = sosfilt(self.sos, values, zi=zi)
+            self._state[channel] = zf.tolist()
+            return out
+
+        out = np.empty_like(values)
+        for i, x in enumerate(values.tolist()):
+            out[i] = self.process(channel, x)
+        return out
+
+
+# ============================================================
+# === Stream Health Monitor ==================================
+# ============================================================
+
+class StreamHealthMonitor:
+    """
+    O(1)-per-sample health checks for one trial's sample stream.
+
+    Detects:
+    - saturation: raw readings near the bridge full scale (±1/gain V/V)
+    - stuck values: identical raw readings for longer than stuck_s
+    - gaps: time between samples longer than gap_factor × sampling interval
+    - error bursts: error_burst read errors within error_window_s
+
+    sample() and error() return the names of any problems detected on this
+    call. The caller decides how to report them.
+    """
+
+    COUNTERS = ['samples', 'saturated', 'stuck_runs', 'gaps', 'max_gap_s', 'errors', 'error_bursts']
+
+    def __init__(self, health_config, sampling_interval):
+        self.saturation_fraction = health_config['saturation_fraction']
+        self.stuck_s = health_config['stuck_s']
+        self.gap_s = health_config['gap_factor'] * sampling_interval
+        self.error_window_s = health_config['error_window_s']
+        self.recent_errors = deque(maxlen=max(1, int(health_config['error_burst'])))
+
+        self.counts = {name: 0 for name in self.COUNTERS}
+        self.last_time = None
+        self.last_raw = None
+        self.run_start = None
+        self.run_flagged = False
+
+    def sample(self, raw, gain, timestamp):
+        """Check one good reading; returns a list of newly detected problems"""
+        problems = []
+        self.counts['samples'] += 1
+
+        if abs(raw) >= self.saturation_fraction / max(gain, 1):
+            self.counts['saturated'] += 1
+            problems.append('saturation')
+
+        if raw == self.last_raw:
+            if not self.run_flagged and timestamp - self.run_start >= self.stuck_s:
+                self.run_flagged = True
+                self.counts['stuck_runs'] += 1
+                problems.append('stuck')
+        else:
+            self.last_raw = raw
+            self.run_start = timestamp
+            self.run_flagged = False
+
+        if self.last_time is not None:
+            gap = timestamp - self.last_time
+            if gap > self.gap_s:
+                self.counts['gaps'] += 1
+                self.counts['max_gap_s'] = max(self.counts['max_gap_s'], gap)
+                problems.append('gap')
+        self.last_time = timestamp
+
+        return problems
+
+    def error(self, timestamp):
+        """Record a failed read; returns ['error_burst'] when errors cluster"""
+        self.counts['errors'] += 1
+        self.recent_errors.append(timestamp)
+        if (len(self.recent_errors) == self.recent_errors.maxlen and
+                timestamp - self.recent_errors[0] <= self.error_window_s):
+            self.counts['error_bursts'] += 1
+            self.recent_errors.clear()
+            return ['error_burst']
+        return []
+
+    def resume(self):
+        """Forget timing state after a pause so the pause is not reported as a gap"""
+        self.last_time = None
+        self.run_start = None
+        self.last_raw = None
+        self.run_flagged = False
+
+    def counters(self):
+        return dict(self.counts)
+
+
+HEALTH_MESSAGES = {
+    'saturation': "Sensor reading near full scale (saturated) on CH{channel}",
+    'stuck': "Sensor value frozen on CH{channel}",
+    'gap': "Sampling gap detected on CH{channel}",
+    'error_burst': "Repeated read errors on CH{channel}"
+}
+
+
+# ============================================================
+# === Onset / Offset Detection ===============================
+# ============================================================
+
+class ActivityDetector:
+    """
+    Detects trial onset and offset on one channel's calibrated stream.
+
+    Uses a threshold with hysteresis. The signal becomes active when |x| rises
+    above on_threshold. It becomes idle again when |x| drops below
+    off_threshold. Both thresholds scale with the channel's calibration
+    noise SD, and min_threshold sets a floor.
+    """
+
+    def __init__(self, noise_sd, on_sd=6.0, off_sd=3.0, min_threshold=5e-6):
+        self.on_threshold = max(on_sd * noise_sd, min_threshold)
+        self.off_threshold = self.on_threshold * (off_sd / on_sd if on_sd else 0.5)
+
+        self.active = False
+        self.onset_time = None
+        self.offset_time = None
+        self.idle_since = None
+
+    def update(self, timestamp, reading):
+        """Feed one sample; returns True while the trial is active"""
+        level = abs(reading)
+        if self.active:
+            if level < self.off_threshold:
+                self.active = False
+                self.offset_time = timestamp
+                self.idle_since = timestamp
+        elif level > self.on_threshold:
+            self.active = True
+            if self.onset_time is None:
+                self.onset_time = timestamp
+            self.offset_time = None
+            self.idle_since = None
+        return self.active
+
+    def idle_duration(self, timestamp):
+        """Seconds spent below threshold since the last offset (0 before onset or while active)"""
+        if self.idle_since is None:
+            return 0.0
+        return timestamp - self.idle_since
+
+    def window(self, end_time):
+        """(onset, offset) of the active window; offset falls back to end_time while still active"""
+        if self.onset_time is None:
+            return None, None
+        return self.onset_time, self.offset_time if self.offset_time is not None else end_time
+
+
+# ============================================================
+# === Drift Tracking =========================================
+# ============================================================
+
+class DriftTracker:
+    """
+    Per-channel model of bridge offset drift over a session.
+
+    Starts from the calibration offsets. Each accepted between-trial re-zero adds a
+    (session time, offset) point. offset() extrapolates a straight-line fit through
+    the last model_points points to the requested time. Every accepted update bumps
+    version, so the data file can record which offsets a trial was corrected with.
+    """
+
+    def __init__(self, calibration, model_points=5):
+        self.t0 = time.time()
+        self.base = dict(calibration)
+        self.model_points = max(2, model_points)
+        self.points = {ch: deque([(0.0, offset)], maxlen=self.model_points) for ch, offset in calibration.items()}
+        self.version = 0
+
+    def session_time(self, now=None):
+        return (now if now is not None else time.time()) - self.t0
+
+    def add(self, channel, offset, now=None):
+        self.points.setdefault(channel, deque(maxlen=self.model_points)).append((self.session_time(now), offset))
+        self.version += 1
+
+    def offset(self, channel, now=None):
+        """Drift-corrected offset for a channel at now (calibration offset until re-zeroed)"""
+        points = self.points.get(channel)
+        if not points:
+            return self.base.get(channel, 0.0)
+        if len(points) < 2:
+            return points[-1][1]
+        times, offsets = zip(*points)
+        slope, intercept = np.polyfit(times, offsets, 1)
+        return float(intercept + slope * self.session_time(now))
+
+    def drift_rate(self, channel):
+        """Fitted drift in V/V per hour (0 until there are two points)"""
+        points = self.points.get(channel)
+        if not points or len(points) < 2:
+            return 0.0
+        times, offsets = zip(*points)
+        return float(np.polyfit(times, offsets, 1)[0] * 3600.0)
+
+
+# ============================================================
+# === Pre-Trigger Buffer =====================================
+# ============================================================
+
+class PreTriggerBuffer:
+    """
+    Fixed-size ring buffer per channel of (wall-clock time, raw reading, gain).
+
+    The background sampler writes into it between trials. When a trial starts,
+    take() hands back the samples from a start time onward in chronological
+    order and empties the channel, so a sample is never committed to two trials.
+    Memory stays at capacity samples per channel however long the gap between trials.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self.lock = threading.Lock()
+        self._rings = {}
+
+    def _ring(self, channel):
+        ring = self._rings.get(channel)
+        if ring is None:
+            ring = self._rings[channel] = [np.zeros(self.capacity), np.zeros(self.capacity),
+                                           np.zeros(self.capacity, dtype=int), 0]
+        return ring
+
+    def append(self, channel, timestamp, raw, gain):
+        with self.lock:
+            ring = self._ring(channel)
+            i = ring[3] % self.capacity
+            ring[0][i], ring[1][i], ring[2][i] = timestamp, raw, gain
+            ring[3] += 1
+
+    def __len__(self):
+        with self.lock:
+            return sum(min(ring[3], self.capacity) for ring in self._rings.values())
+
+    def take(self, channel, since):
+        """(times, raw, gains) arrays for samples at or after since, oldest first; empties the channel"""
+        with self.lock:
+            ring = self._rings.pop(channel, None)
+        if ring is None:
+            return np.zeros(0), np.zeros(0), np.zeros(0, dtype=int)
+        times, raw, gains, count = ring
+        if count > self.capacity:
+            order = np.roll(np.arange(self.capacity), -(count % self.capacity))
+            times, raw, gains = times[order], raw[order], gains[order]
+        else:
+            times, raw, gains = times[:count], raw[:count], gains[:count]
+        keep = times >= since
+        return times[keep], raw[keep], gains[keep]
+
+
+# ============================================================
+# === Trial Feature Extraction ===============================
+# ============================================================
+
+SUMMARY_FIELDS = ['Trial', 'Viscosity', 'Channel', 'Samples', 'Duration_s', 'Peak_Force_N', 'Time_To_Peak_s',
+                  'Plateau_Mean_N', 'Plateau_SD_N', 'Plateau_Duration_s', 'Impulse_Ns', 'Onset_s', 'Offset_s',
+                  'Time_To_Peak_From_Onset_s']
+
+
+class TrialFeatureExtractor:
+    """
+    Per-trial force features updated in O(1) per sample while data is collected.
+
+    Tracks peak force and time-to-peak, impulse (trapezoidal integral of force)
+    and plateau statistics. The plateau is the set of samples at or above
+    plateau_fraction of the running peak; its mean and SD use Welford's update
+    and restart whenever a new peak lifts the band above the lowest plateau sample.
+    """
+
+    def __init__(self, plateau_fraction=0.8, force_coefficients=None):
+        self.plateau_fraction = plateau_fraction
+        # Force polynomial in V/V, highest power first (see fit_force_calibration)
+        self.force_coefficients = [float(c) for c in (force_coefficients if force_coefficients is not None
+                                                      else DEFAULT_FORCE_COEFFICIENTS)]
+
+        self.samples = 0
+        self.first_time = None
+        self.last_time = None
+        self.last_force = None
+
+        self.peak_force = 0.0
+        self.time_to_peak = 0.0
+        self.impulse = 0.0
+
+        self._reset_plateau()
+
+    def _reset_plateau(self):
+        self.plateau_n = 0
+        self.plateau_mean = 0.0
+        self.plateau_m2 = 0.0
+        self.plateau_min = float('inf')
+        self.plateau_start = None
+        self.plateau_end = None
+
+    def update(self, timestamp, reading):
+        """Add one calibrated reading (V/V) taken at a trial-relative timestamp (s)"""
+        force = 0.0
+        for coefficient in self.force_coefficients:
+            force = force * reading + coefficient
+        self.samples += 1
+
+        if self.last_time is None:
+            self.first_time = timestamp
+        else:
+            dt = timestamp - self.last_time
+            if dt > 0:
+                self.impulse += 0.5 * (force + self.last_force) * dt
+        self.last_time = timestamp
+        self.last_force = force
+
+        if force > self.peak_force:
+            self.peak_force = force
+            self.time_to_peak = timestamp
+
+        band = self.plateau_fraction * self.peak_force
+        if self.peak_force > 0 and force >= band:
+            if self.plateau_min < band:
+                self._reset_plateau()
+            self.plateau_n += 1
+            delta = force - self.plateau_mean
+            self.plateau_mean += delta / self.plateau_n
+            self.plateau_m2 += delta * (force - self.plateau_mean)
+            self.plateau_min = min(self.plateau_min, force)
+            if self.plateau_start is None:
+                self.plateau_start = timestamp
+            self.plateau_end = timestamp
+
+    def finish(self):
+        """Return the trial summary as a dict keyed like SUMMARY_FIELDS"""
+        plateau_sd = (self.plateau_m2 / (self.plateau_n - 1)) ** 0.5 if self.plateau_n > 1 else 0.0
+        duration = (self.last_time - self.first_time) if self.samples else 0.0
+        plateau_duration = (self.plateau_end - self.plateau_start) if self.plateau_n else 0.0
+
+        return {
+            'Samples': self.samples,
+            'Duration_s': duration,
+            'Peak_Force_N': self.peak_force,
+            'Time_To_Peak_s': self.time_to_peak,
+            'Plateau_Mean_N': self.plateau_mean,
+            'Plateau_SD_N': plateau_sd,
+            'Plateau_Duration_s': plateau_duration,
+            'Impulse_Ns': self.impulse
+        }
+
+
+def format_trial_summary(summary):
+    """One-line human readable version of a trial summary"""
+    return (f"Trial {summary['Trial']} ({summary['Viscosity']}): "
+            f"Peak {summary['Peak_Force_N']:.2f} N @ {summary['Time_To_Peak_s']:.2f} s | "
+            f"Plateau {summary['Plateau_Mean_N']:.2f} ± {summary['Plateau_SD_N']:.2f} N "
+            f"({summary['Plateau_Duration_s']:.2f} s) | "
+            f"Impulse {summary['Impulse_Ns']:.2f} N·s")
+
+
+# ============================================================
+# === UI Event Bus ===========================================
+# ============================================================
+
+class UIEventBus:
+    """
+    Single thread-safe path for GUI updates coming from worker threads.
+
+    Workers post events. configure(widget, **options) updates a widget, and
+    call(fn, *args) runs a callback. The Tk thread drains the queue every
+    tick_ms. configure events for the same widget are merged, so only the
+    latest options are applied, once per tick, where the last update was
+    posted. call events always run, in the order they were posted.
+    """
+
+    def __init__(self, root, tick_ms=None):
+        self.root = root
+        self.tick_ms = tick_ms if tick_ms is not None else CONFIG['ui']['tick_ms']
+        self._events = queue.SimpleQueue()
+        self._after_id = None
+        self.posted = 0
+        self.applied = 0
+
+    def configure(self, widget, **options):
+        """Queue a widget.configure(**options); safe from any thread"""
+        self.posted += 1
+        self._events.put(('configure', widget, options))
+
+    def call(self, fn, *args):
+        """Queue fn(*args) to run on the Tk thread; safe from any thread"""
+        self.posted += 1
+        self._events.put(('call', fn, args))
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.tick_ms, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _tick(self):
+        self.drain()
+        self._after_id = self.root.after(self.tick_ms, self._tick)
+
+    def drain(self):
+        """Apply everything queued so far (Tk thread only)"""
+        pending = {}
+        sequence = 0
+        while True:
+            try:
+                kind, target, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'configure':
+                key = ('configure', id(target))
+                previous = pending.pop(key, None)
+                if previous is not None:
+                    payload = dict(previous[2], **payload)
+            else:
+                key = ('call', sequence)
+                sequence += 1
+            pending[key] = (kind, target, payload)
+
+        for kind, target, payload in pending.values():
+            try:
+                if kind == 'configure':
+                    target.configure(**payload)
+                else:
+                    target(*payload)
+                self.applied += 1
+            except Exception as e:
+                print(f"⚠️ Error applying GUI update: {e}")
+
+
+# ============================================================
+# === Session Orchestrator ===================================
+# ============================================================
+
+class SessionOrchestrator:
+    """
+    Runs the trial flow of a PhidgetViscosityGUI as asyncio coroutines on a
+    dedicated event-loop thread.
+
+    Each trial is one task: countdown → acquisition → save → re-zero → condition change.
+    Blocking work (tone playback, sensor polling) runs in executor threads.
+    Steps that must run on the Tk thread go through run_on_tk(), which returns
+    a thread-safe future. Cancelling the task stops whichever stage is running
+    and still saves any samples already recorded. shutdown() waits for
+    in-flight saves and the loop thread before returning.
+
+    A start is claimed under a lock (claim_start) from the moment it is
+    requested until its task exists, so two quick start requests from any
+    threads cannot both go through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.trial_task = None
+        self.start_pending = False
+        self._start_lock = threading.Lock()
+        self.save_tasks = set()
+        self.thread = threading.Thread(target=PROFILER.wrap('orchestrator', self._run), name="session-orchestrator",
+                                       daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    @property
+    def trial_running(self):
+        return self.trial_task is not None and not self.trial_task.done()
+
+    @property
+    def busy(self):
+        """True while a trial is running or a start has been claimed but its task does not exist yet"""
+        return self.start_pending or self.trial_running
+
+    def claim_start(self):
+        """Reserve the next trial start (any thread); False if a trial is running or already starting"""
+        with self._start_lock:
+            if self.busy:
+                return False
+            self.start_pending = True
+            return True
+
+    def submit(self, coro):
+        """Schedule a coroutine from any thread; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_on_tk(self, fn, *args):
+        """Run fn(*args) on the Tk thread and return an awaitable for its result (loop thread only)"""
+        future = concurrent.futures.Future()
+
+        def runner():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+
+        self.app.ui_bus.call(runner)
+        return asyncio.wrap_future(future, loop=self.loop)
+
+    def start_trial(self, claimed=False):
+        """Begin a trial (any thread); None if one is already running or starting"""
+        if not claimed and not self.claim_start():
+            return None
+        try:
+            return self.submit(self._start_trial_task())
+        except Exception:
+            self.start_pending = False
+            raise
+
+    async def _start_trial_task(self):
+        try:
+            if not self.trial_running:
+                self.trial_task = self.loop.create_task(self._trial())
+        finally:
+            with self._start_lock:
+                self.start_pending = False
+
+    async def _trial(self):
+        app = self.app
+        try:
+            start_time = await self._countdown()
+            block = await self._acquire(start_time)
+            self._save(block)
+
+            # Re-zero the idle bridges during the pause before the condition change / next trial
+            gap_start = self.loop.time()
+            await self.loop.run_in_executor(None, PROFILER.wrap('rezero', app.rezero_channels))
+            await asyncio.sleep(max(0.0, 0.5 - (self.loop.time() - gap_start)))
+            await self.run_on_tk(app.next_trial)
+        except asyncio.CancelledError:
+            print("⏹️ Trial cancelled")
+            raise
+        except Exception as e:
+            print(f"⚠️ Error in trial sequence: {e}")
+
+    async def _countdown(self):
+        """Countdown stage; returns the wall-clock time the trial clock starts from"""
+        print("\n" + "=" * 50)
+        print("🎬 TRIAL STARTING - COUNTDOWN SEQUENCE")
+        print("=" * 50)
+
+        pretrigger_config = CONFIG['pretrigger']
+        if pretrigger_config['enabled'] and not pretrigger_config['countdown']:
+            # The lead-in comes from the pre-trigger buffer, so recording can start right away
+            print("📊 DATA COLLECTION STARTING NOW (pre-trigger, no countdown)")
+            return time.time()
+
+        deadline = self.loop.time() + CONFIG['countdown_duration']
+        try:
+            if CONFIG['audio']['enabled'] and AUDIO_METHOD != 'none':
+                end_time = await self.loop.run_in_executor(None, PROFILER.wrap('countdown', self.app.play_countdown_beeps))
+            else:
+                self.app.ui_bus.configure(self.app.lbl_status, text="Status: Get ready... Recording will start!")
+                await asyncio.sleep(max(0.0, deadline - self.loop.time()))
+                end_time = time.time()
+        except asyncio.CancelledError:
+            if AUDIO_METHOD == 'pygame':
+                pygame.mixer.stop()
+            raise
+
+        print("=" * 50)
+        print("📊 DATA COLLECTION STARTING NOW")
+        print("=" * 50 + "\n")
+        return end_time
+
+    async def _acquire(self, start_time):
+        """Acquisition stage; returns the finished TrialBlock"""
+        self.app.begin_recording(start_time)
+        future = self.loop.run_in_executor(None, PROFILER.wrap('acquisition', self.app.collect_data))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Stop the sampling loop and keep what was recorded before re-raising
+            self.app.trial_active = False
+            block = await future
+            self._save(block)
+            raise
+
+    def _save(self, block):
+        """Save stage: hand the block to the background saver and track its completion"""
+        task = self.loop.create_task(self._await_save(block))
+        self.save_tasks.add(task)
+        task.add_done_callback(self.save_tasks.discard)
+
+    async def _await_save(self, block):
+        done = concurrent.futures.Future()
+        self.app.save_queue.put((block, done))
+        print(f"📋 Queued auto-save for trial {block.trial}")
+        try:
+            return await asyncio.wrap_future(done, loop=self.loop)
+        except Exception as e:
+            print(f"⚠️ Saving trial {block.trial} failed: {e}")
+            return False
+
+    async def _shutdown(self, timeout):
+        if self.trial_running:
+            self.trial_task.cancel()
+            await asyncio.gather(self.trial_task, return_exceptions=True)
+        if self.save_tasks:
+            await asyncio.wait(self.save_tasks, timeout=timeout)
+
+    def shutdown(self, timeout=3.0):
+        """Cancel the running trial, wait for pending saves and stop the loop thread"""
+        if not self.thread.is_alive():
+            return
+        try:
+            self.submit(self._shutdown(timeout)).result(timeout + 1.0)
+        except Exception as e:
+            print(f"⚠️ Orchestrator shutdown incomplete: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=timeout)
+
+
 # ============================================================
-# === Phidget Connection =====================================
+# === Control Server =========================================
 # ============================================================
 
-def connect_channels():
+class ControlRequestHandler(BaseHTTPRequestHandler):
     """
-    Open channels on the PhidgetBridge with comprehensive error handling.
-    Returns a list of active VoltageRatioInput objects.
+    GET  /status                    session state
+    POST /start, /stop              start or stop a trial
+    POST /pause, /resume            pause or resume the running trial
+    POST /viscosity/<label>         select the condition for the next trial
+    POST /recalibrate               open the calibration screen (returns at once)
+    Responses are JSON objects with "ok" plus the state after the command.
     """
-    active = []
-    num_channels = CONFIG['num_channels']
-    bridge_gain = CONFIG['bridge_gain']
 
-    print(f"🔌 Connecting to PhidgetBridge channels (0-{num_channels - 1})...")
-    print(f"   Setting bridge gain to: {bridge_gain}x")
+    server_version = "SyringeControl/1"
 
-    for ch_num in range(num_channels):
-        try:
-            vi = VoltageRatioInput()
-            vi.setChannel(ch_num)
+    def do_GET(self):
+        self._dispatch('GET')
 
-            # Attempt to open with timeout
-            try:
-                vi.openWaitForAttachment(1000)
-            except PhidgetException as e:
-                print(f"⚠️ Channel {ch_num} not found: {e}")
-                continue
+    def do_POST(self):
+        self._dispatch('POST')
 
-            # Set bridge gain from config
-            try:
-                from Phidget22.BridgeGain import BridgeGain
-                gain_map = {
-                    1: BridgeGain.BRIDGE_GAIN_1,
-                    2: BridgeGain.BRIDGE_GAIN_2,
-                    4: BridgeGain.BRIDGE_GAIN_4,
-                    8: BridgeGain.BRIDGE_GAIN_8,
-                    16: BridgeGain.BRIDGE_GAIN_16,
-                    32: BridgeGain.BRIDGE_GAIN_32,
-                    64: BridgeGain.BRIDGE_GAIN_64,
-                    128: BridgeGain.BRIDGE_GAIN_128
-                }
+    def _dispatch(self, method):
+        received_ns = time.perf_counter_ns()
+        parts = [unquote(part) for part in urlsplit(self.path).path.split('/') if part]
+        try:
+            status, body = self.server.control.handle(method, parts, received_ns)
+        except concurrent.futures.TimeoutError:
+            status, body = 503, {'ok': False, 'error': "GUI thread busy (calibration screen or dialog open?)"}
+        except Exception as e:
+            status, body = 500, {'ok': False, 'error': str(e)}
 
-                if bridge_gain in gain_map:
-                    vi.setBridgeGain(gain_map[bridge_gain])
-                    print(f"✅ Channel {ch_num} attached (gain: {bridge_gain}x)")
-                else:
-                    print(f"⚠️ Invalid gain {bridge_gain}, using default for channel {ch_num}")
-                    print(f"✅ Channel {ch_num} attached (gain: default)")
-            except Exception as e:
-                print(f"⚠️ Could not set gain for channel {ch_num}: {e}")
-                print(f"✅ Channel {ch_num} attached (gain: default)")
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
 
-            active.append(vi)
+    def log_message(self, format, *args):
+        logger.debug("Control %s - %s", self.address_string(), format % args)
 
-        except PhidgetException as e:
-            print(f"⚠️ Channel {ch_num} error: {e}")
-        except Exception as e:
-            print(f"⚠️ Unexpected error connecting channel {ch_num}: {e}")
 
-    if not active:
-        print("❌ No channels connected")
-        print("   TIP: Check USB connection and ensure Phidget22 drivers are installed")
-    else:
-        print(f"✅ Total: {len(active)} channel(s) connected successfully\n")
+class ControlServer:
+    """
+    Localhost HTTP/JSON API that drives a PhidgetViscosityGUI like its buttons do.
+
+    Requests are served on their own threads, and commands run on the Tk thread
+    through the UI event bus, exactly as if a button had been clicked. /start is
+    the exception: it claims the start in the orchestrator and submits the trial
+    to its loop straight from the request thread, so the UI tick adds no latency.
+    Its receive time is handed to the acquisition loop, which records
+    command-to-first-sample latency as the 'command_to_first_sample' histogram.
+    """
 
-    return active
+    def __init__(self, app, host='127.0.0.1', port=8766, timeout_s=5.0):
+        self.app = app
+        self.timeout_s = timeout_s
+        self.httpd = ThreadingHTTPServer((host, int(port)), ControlRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.control = self
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.httpd.server_address[:2]
+
+    def start(self):
+        self.thread = threading.Thread(target=PROFILER.wrap('control', self.httpd.serve_forever),
+                                       name="control-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def call_on_tk(self, fn, *args):
+        """Run fn(*args) on the Tk thread and wait for its result (request threads)"""
+        future = concurrent.futures.Future()
+
+        def runner():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+
+        self.app.ui_bus.call(runner)
+        try:
+            return future.result(self.timeout_s)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def handle(self, method, parts, received_ns):
+        """(HTTP status, JSON body) for a request path split into parts"""
+        commands = {
+            ('GET', 'status'): self._status,
+            ('POST', 'start'): self._start,
+            ('POST', 'stop'): self._stop,
+            ('POST', 'pause'): self._pause,
+            ('POST', 'resume'): self._resume,
+            ('POST', 'viscosity'): self._select_viscosity,
+            ('POST', 'recalibrate'): self._recalibrate
+        }
+        command = commands.get((method, parts[0] if parts else ''))
+        if command is None:
+            return 404, {'ok': False, 'error': f"unknown command {method} /{'/'.join(parts)}"}
+        # Not rate limited, so every command reaches the session log
+        logger.info("Control: %s /%s", method, '/'.join(parts), extra={'rate_limit': False})
+        if command == self._start:
+            status, body = command(parts[1:], received_ns)
+        else:
+            status, body = self.call_on_tk(command, parts[1:], received_ns)
+        body.setdefault('ok', 200 <= status < 300)
+        return status, body
+
+    # The command handlers below run on the Tk thread, except _start
+
+    def state(self):
+        app = self.app
+        latency = app.telemetry.histograms.get('command_to_first_sample')
+        return {
+            'participant_id': app.participant_id,
+            'rig': RIG,
+            'trial': app.trial_index,
+            'viscosity': app.current_viscosity,
+            'channel': app.current_channel,
+            'recording': app.trial_active,
+            'paused': app.trial_paused,
+            'trial_running': app.orchestrator.busy,
+            'schedule_position': f"{min(app.schedule.cursor + 1, len(app.schedule))}/{len(app.schedule)}",
+            'experiment_complete': app.experiment_complete,
+            'trial_counts': dict(app.viscosity_trial_counts),
+            'last_command_latency_ms': app.last_command_latency_ms,
+            'command_latency_p50_ms': latency.percentile(50) / 1e6 if latency is not None else None
+        }
+
+    def _status(self, args, received_ns):
+        return 200, self.state()
+
+    def _start(self, args, received_ns):
+        """Request thread: only the request that wins claim_start() starts a trial"""
+        app = self.app
+        if app.trial_active or not app.orchestrator.claim_start():
+            return 409, {'error': "a trial is already running", **self.call_on_tk(self.state)}
+        try:
+            app.command_start_ns = received_ns
+            # The display reset is queued before the trial's own UI updates, so it cannot overwrite them
+            app.ui_bus.call(app.prepare_trial_display)
+            app.orchestrator.start_trial(claimed=True)
+        except Exception:
+            app.command_start_ns = None
+            app.orchestrator.start_pending = False
+            raise
+        return 202, self.call_on_tk(self.state)
+
+    def _stop(self, args, received_ns):
+        if not self.app.trial_active:
+            return 409, {'error': "no trial is recording", **self.state()}
+        self.app.stop_trial()
+        return 200, self.state()
+
+    def _pause(self, args, received_ns):
+        if not self.app.trial_active or self.app.trial_paused:
+            return 409, {'error': "no running trial to pause", **self.state()}
+        self.app.toggle_pause()
+        return 200, self.state()
+
+    def _resume(self, args, received_ns):
+        if not self.app.trial_active or not self.app.trial_paused:
+            return 409, {'error': "no paused trial to resume", **self.state()}
+        self.app.toggle_pause()
+        return 200, self.state()
+
+    def _select_viscosity(self, args, received_ns):
+        if not args or args[0] not in self.app.viscosity_to_channel:
+            return 400, {'error': f"viscosity must be one of {list(self.app.viscosity_to_channel)}"}
+        if self.app.trial_active or self.app.orchestrator.busy:
+            return 409, {'error': "stop the current trial before changing viscosity", **self.state()}
+        self.app.select_viscosity(args[0])
+        return 200, self.state()
+
+    def _recalibrate(self, args, received_ns):
+        if self.app.trial_active or self.app.orchestrator.busy:
+            return 409, {'error': "stop the current trial before recalibrating", **self.state()}
+        # The calibration screen runs its own event loop until the operator closes it,
+        # so it is opened on the next Tk tick and the request returns straight away
+        self.app.after(0, self.app.recalibrate)
+        return 202, {'message': "calibration screen opened", **self.state()}
 
 
 # ============================================================
@@ -442,7 +2506,7 @@ def connect_channels():
 class ParticipantDialog(CTk):
     def __init__(self):
         super().__init__()
-        self.title("Viscosity Measurement System")
+        self.title(f"Viscosity Measurement System{rig_label()}")
         self.geometry("600x400")
         self.participant_id = None
 
@@ -540,17 +2604,20 @@ class ParticipantDialog(CTk):
 # ============================================================
 
 class CalibrationScreen(CTk):
-    def __init__(self, channels, participant_id):
+    def __init__(self, channels, participant_id, use_cache=True):
         super().__init__()
         print(f"🔧 Initializing CalibrationScreen...")
-        self.title("Sensor Calibration")
+        self.title(f"Sensor Calibration{rig_label()}")
         self.geometry("800x600")
         self.channels = channels
         self.participant_id = participant_id
         self.calibration = None
+        self.noise = {}
         self.calibrating = False
         self.is_destroyed = False
         self.simulation_mode = len(channels) == 0
+        self.ui_bus = UIEventBus(self)
+        self.ui_bus.start()
 
         self.resizable(False, False)
 
@@ -657,8 +2724,68 @@ class CalibrationScreen(CTk):
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        # Recalibration is asked for explicitly, so it never reuses the cached offsets
+        if use_cache and not self.simulation_mode and CONFIG['calibration_cache']['enabled']:
+            self.after(200, self.check_cached_calibration)
+
         print(f"✅ CalibrationScreen GUI fully built and ready")
 
+    def check_cached_calibration(self):
+        """Look for recent cached offsets for these exact channels and confirm them with a drift probe"""
+        if self.calibrating or self.is_destroyed:
+            return
+        self.calibrating = True
+        self.btn_calibrate.configure(state="disabled")
+        self.btn_skip.configure(state="disabled")
+        self.status_label.configure(text="🔎 Checking cached calibration...")
+        self.progress_label.configure(text="Please keep the sensors unloaded")
+        threading.Thread(target=PROFILER.wrap('calibration', self._check_cache_worker), name="calibration",
+                         daemon=True).start()
+
+    def _check_cache_worker(self):
+        try:
+            offsets, noise, info = lookup_cached_calibration(self.channels)
+            if offsets is None:
+                self.ui_bus.call(self._cache_unavailable, info)
+                return
+            ok, deviations = probe_calibration_drift(self.channels, offsets, noise)
+        except Exception as e:
+            self.ui_bus.call(self._cache_unavailable, f"cache check failed: {e}")
+            return
+
+        if self.is_destroyed:
+            return
+        if ok:
+            self.ui_bus.call(self._apply_cached_calibration, offsets, noise, info)
+        else:
+            moved = ", ".join(f"CH{ch} {dev:+.2e}" for ch, dev in deviations.items())
+            self.ui_bus.call(self._cache_unavailable, f"offsets have drifted ({moved})")
+
+    def _cache_unavailable(self, reason):
+        print(f"ℹ️ Calibration needed: {reason}")
+        if self.is_destroyed:
+            return
+        self.calibrating = False
+        self.btn_calibrate.configure(state="normal")
+        self.btn_skip.configure(state="normal")
+        self.status_label.configure(text="Ready to calibrate")
+        self.progress_label.configure(text=f"Calibration needed: {reason}")
+
+    def _apply_cached_calibration(self, offsets, noise, age_hours):
+        if self.is_destroyed:
+            return
+        self.calibration = offsets
+        self.noise = noise
+        save_calibration(offsets, participant_id=self.participant_id, noise=noise)
+
+        print(f"✅ Using cached calibration ({age_hours:.1f} h old, drift probe OK):")
+        for ch, offset in offsets.items():
+            print(f"   CH{ch}: {offset:+.8f} (noise SD {noise[ch]:.2e})")
+
+        self.status_label.configure(text="✅ Using cached calibration")
+        self.progress_label.configure(text=f"Offsets {age_hours:.1f} h old, drift check passed")
+        self.after(1500, self.finish)
+
     def start_calibration(self):
         if self.calibrating:
             return
@@ -670,7 +2797,8 @@ class CalibrationScreen(CTk):
         self.status_label.configure(text="🔄 Calibrating sensors...")
         self.progress_label.configure(text="Please wait, do not move sensors")
 
-        threading.Thread(target=self.run_calibration, daemon=True).start()
+        threading.Thread(target=PROFILER.wrap('calibration', self.run_calibration), name="calibration",
+                         daemon=True).start()
 
     def run_calibration(self):
         duration = CONFIG['calibration_duration']
@@ -683,66 +2811,75 @@ class CalibrationScreen(CTk):
             for vi in self.channels:
                 readings[vi.getChannel()] = []
         except Exception as e:
-            print(f"⚠️ Error initializing readings: {e}")
-            self.after(0, lambda: self.show_calibration_error("Failed to initialize channels"))
+            logger.error("Error initializing calibration readings: %s", e)
+            self.ui_bus.call(self.show_calibration_error, "Failed to initialize channels")
             return
 
         start = time.time()
+        last_loop_ns = None
 
         while time.time() - start < duration:
             if self.is_destroyed:
                 return
 
+            loop_ns = time.perf_counter_ns()
+            if last_loop_ns is not None:
+                TELEMETRY.record('calibration_loop_period', loop_ns - last_loop_ns)
+            last_loop_ns = loop_ns
+
             elapsed = time.time() - start
             remaining = duration - elapsed
-            try:
-                self.after(0, lambda r=remaining: self.update_progress(r))
-            except:
-                return
+            self.ui_bus.configure(self.progress_label, text=f"Time remaining: {remaining:.1f}s")
 
             for vi in self.channels:
                 ch = vi.getChannel()
                 try:
+                    read_start = time.perf_counter_ns()
                     val = vi.getVoltageRatio()
+                    TELEMETRY.record('calibration_read_latency', time.perf_counter_ns() - read_start)
                     readings[ch].append(val)
                 except PhidgetException as e:
-                    print(f"⚠️ Error reading channel {ch}: {e}")
+                    logger.warning("Calibration: error reading channel %s: %s", ch, e, extra={'key': ('cal_read', ch)})
                 except Exception as e:
-                    print(f"⚠️ Unexpected error reading channel {ch}: {e}")
+                    logger.warning("Calibration: unexpected error reading channel %s: %s", ch, e,
+                                   extra={'key': ('cal_read_unexpected', ch)})
 
             time.sleep(CONFIG['sampling_interval'])
 
         if self.is_destroyed:
             return
 
-        # Calculate offsets
+        # Calculate offsets and noise (SD about the offset) per channel
         offsets = {}
+        noise = {}
         for ch, vals in readings.items():
             if vals:
                 offsets[ch] = sum(vals) / len(vals)
+                noise[ch] = float(np.std(vals))
             else:
                 offsets[ch] = 0.0
-                print(f"⚠️ Warning: No readings for channel {ch}")
+                noise[ch] = 0.0
+                logger.warning("Calibration: no readings for channel %s", ch)
 
         if not offsets:
-            self.after(0, lambda: self.show_calibration_error("No calibration data collected"))
+            self.ui_bus.call(self.show_calibration_error, "No calibration data collected")
             return
 
         # Save calibration
-        save_calibration(offsets, participant_id=self.participant_id)
+        save_calibration(offsets, participant_id=self.participant_id, noise=noise)
+        if CONFIG['calibration_cache']['enabled']:
+            update_calibration_cache(self.channels, offsets, noise, self.participant_id)
 
         self.calibration = offsets
+        self.noise = noise
 
         print("\n✅ Calibration complete:")
         for ch, offset in offsets.items():
-            print(f"   CH{ch}: {offset:+.8f}")
+            print(f"   CH{ch}: {offset:+.8f} (noise SD {noise[ch]:.2e})")
 
-        try:
-            self.after(0, lambda: self.status_label.configure(text="✅ Calibration Complete!"))
-            self.after(0, lambda: self.progress_label.configure(text="Sensors have been zeroed successfully"))
-            self.after(1000, self.enable_continue)
-        except:
-            pass
+        self.ui_bus.configure(self.status_label, text="✅ Calibration Complete!")
+        self.ui_bus.configure(self.progress_label, text="Sensors have been zeroed successfully")
+        self.ui_bus.call(self.after, 1000, self.enable_continue)
 
     def show_calibration_error(self, message):
         """Show calibration error and allow retry"""
@@ -757,14 +2894,6 @@ class CalibrationScreen(CTk):
             except:
                 pass
 
-    def update_progress(self, remaining):
-        """Helper method to update progress label safely"""
-        if not self.is_destroyed:
-            try:
-                self.progress_label.configure(text=f"Time remaining: {remaining:.1f}s")
-            except:
-                pass
-
     def enable_continue(self):
         if not self.is_destroyed:
             try:
@@ -777,7 +2906,7 @@ class CalibrationScreen(CTk):
                 pass
 
     def skip_calibration(self):
-        self.calibration = load_calibration()
+        self.calibration, self.noise = load_calibration(include_noise=True)
         if self.calibration:
             self.status_label.configure(text="✅ Loaded previous calibration")
             self.progress_label.configure(text="Using saved calibration values")
@@ -827,20 +2956,22 @@ class CalibrationScreen(CTk):
 # ============================================================
 
 class PhidgetViscosityGUI(CTk):
-    def __init__(self, participant_id, calibration, channels):
+    def __init__(self, participant_id, calibration, channels, calibration_noise=None, interactive=True):
         super().__init__()
-        self.title(f"PhidgetBridge — Syringe Study V3.2 (Participant: {participant_id})")
+        self.title(f"PhidgetBridge — Syringe Study V3.2 (Participant: {participant_id}){rig_label()}")
         self.geometry("1400x900")
 
         self.participant_id = participant_id
         self.update_id = None
+        # False for unattended runs (benchmark/soak): popups are skipped and their default answer is taken
+        self.interactive = interactive
 
         self.channels = channels
         self.simulation_mode = len(self.channels) == 0
 
         if self.simulation_mode:
             print("⚠️ Program running in SIMULATION mode")
-            self.available_channels = list(range(CONFIG['num_channels']))
+            self.available_channels = rig_channel_numbers()
             self.channel_objects = {}
         else:
             self.channel_objects = {vi.getChannel(): vi for vi in self.channels}
@@ -848,24 +2979,35 @@ class PhidgetViscosityGUI(CTk):
             print(f"✅ Main GUI using {len(self.channels)} connected channel(s)")
 
         self.calibration = calibration
+        self.calibration_noise = calibration_noise or {}
+        self.drift = DriftTracker(self.calibration, CONFIG['rezero']['model_points'])
+        self.force_coefficients = load_force_calibration(self.channels)
+        for ch in self.available_channels:
+            self.force_coefficients.setdefault(ch, DEFAULT_FORCE_COEFFICIENTS)
+        self.force_calibration_window = None
+        self.trial_offset = 0.0
+        self.trial_offset_version = 0
         self.trial_active = False
         self.data = {ch: [] for ch in self.available_channels}
         self.current_trial_data = []
 
         viscosity_labels = CONFIG['viscosity_labels']
-        self.viscosity_to_channel = {label: i for i, label in enumerate(viscosity_labels)}
-        self.channel_to_viscosity = {i: label for i, label in enumerate(viscosity_labels)}
+        # Labels map onto the rig's bridge channels in order (channel i for label i without rigs)
+        self.viscosity_to_channel = dict(zip(viscosity_labels, rig_channel_numbers()))
+        self.channel_to_viscosity = {ch: label for label, ch in self.viscosity_to_channel.items()}
 
         self.viscosity_trial_counts = {label: 0 for label in viscosity_labels}
         self.all_viscosities = get_counterbalanced_order(self.participant_id, viscosity_labels)
         print(f"✅ Counterbalanced order for participant {self.participant_id}: {self.all_viscosities}")
 
-        self.current_viscosity_index = 0
-        self.current_viscosity = self.all_viscosities[0]
+        self.trials_per_viscosity = CONFIG['trials_per_viscosity']
+        self.schedule = create_trial_schedule(self.participant_id, self.all_viscosities, self.trials_per_viscosity)
+        print(f"✅ {self.schedule.design.capitalize()} schedule of {len(self.schedule)} trials")
+
+        self.current_viscosity = self.schedule.current
         self.current_channel = self.viscosity_to_channel[self.current_viscosity]
 
         self.trial_index = 1
-        self.trials_per_viscosity = CONFIG['trials_per_viscosity']
         self.experiment_complete = False
 
         self.trial_start_time = None
@@ -874,29 +3016,144 @@ class PhidgetViscosityGUI(CTk):
         self.trial_paused = False
         self.pause_start_time = None
         self.total_pause_duration = 0
+        # (trial time the pause started, seconds paused) per pause of the current trial
+        self.trial_pauses = []
+
+        self.signal_filter = StreamingFilter(CONFIG['filter'], CONFIG['sampling_frequency'])
+        print(f"✅ Signal filter: {self.signal_filter.describe()}")
+
+        # Between trials the channels keep being sampled into a ring buffer so the lead-in to Start is kept
+        self.pretrigger = None
+        self.pretrigger_thread = None
+        self.pretrigger_stop = threading.Event()
+        self.trial_pretrigger_samples = 0
+
+        # Set by syringe_replay.py: the next trial is read from a recording instead of the sensor
+        self.replay = None
+
+        # Optional live feed of every sample for other lab tools
+        self.stream = None
+        stream_config = CONFIG['stream']
+        if stream_config['enabled']:
+            try:
+                self.stream = StreamPublisher(stream_config['host'], stream_config['port'], stream_config['batch_ms'],
+                                              stream_config['max_samples_per_frame'], stream_config['queue_size'],
+                                              source=RIG or '')
+                self.stream.start(wrap=lambda fn: PROFILER.wrap('stream', fn))
+                print(f"✅ Live stream: UDP {stream_config['host']}:{stream_config['port']} "
+                      f"(every {stream_config['batch_ms']} ms)")
+            except OSError as e:
+                print(f"⚠️ Could not open live stream socket: {e}")
+                self.stream = None
+
+        # Countdown tone is synthesized once here instead of on every trial
+        self.tone_latency = 0.0
+        build_tone_cache()
+
+        self.telemetry = TELEMETRY
+        self.metrics_file = os.path.join(OUTPUT_DIR, f"viscosity_metrics_{session_tag(self.participant_id)}.json")
+        self.diagnostics_window = None
+
+        # Worker threads reach the GUI only through this bus
+        self.ui_bus = UIEventBus(self)
+        self.ui_bus.start()
 
         # Background auto-save setup
         self.save_queue = queue.Queue()
         self.background_save_thread = None
-        self.main_data_file = os.path.join(OUTPUT_DIR, f"viscosity_data_{self.participant_id}.csv")
+        self.main_data_file = os.path.join(OUTPUT_DIR, f"viscosity_data_{session_tag(self.participant_id)}.csv")
         self.file_initialized = False
-        self.save_lock = threading.Lock()
+        self.summary_file = os.path.join(OUTPUT_DIR, f"viscosity_summary_{session_tag(self.participant_id)}.csv")
+        self.summary_file_initialized = False
+        self.trial_summaries = {}
+        self.trial_windows = {}
+        self.trial_metadata = {}
+        self.feature_extractor = None
+        self.activity_detector = None
+        self.auto_stop_requested = False
+        self.health_monitor = None
+        self.health_warning_times = {}
+        self.save_lock = threading.RLock()  # Re-entered by _initialize_data_file
         self.start_background_saver()
 
+        # Trial flow (countdown, acquisition, save, condition change) runs here
+        self.orchestrator = SessionOrchestrator(self)
+        self.start_pretrigger_sampler()
+
         self.build_gui()
 
+        # Optional localhost control API; commands reach the GUI through ui_bus like button clicks
+        self.command_start_ns = None
+        self.last_command_latency_ms = None
+        self.control = None
+        control_config = CONFIG['control']
+        if control_config['enabled']:
+            try:
+                self.control = ControlServer(self, control_config['host'], rig_control_port(),
+                                             control_config['timeout_s'])
+                self.control.start()
+                print(f"✅ Control API: http://{control_config['host']}:{self.control.address[1]}/status")
+            except OSError as e:
+                print(f"⚠️ Could not start control API on port {rig_control_port()}: {e}")
+                self.control = None
+
         if self.simulation_mode:
-            self.title(f"SYRINGE STUDY [SIMULATION MODE] (Participant: {participant_id})")
+            self.title(f"SYRINGE STUDY [SIMULATION MODE] (Participant: {participant_id}){rig_label()}")
 
         self.update_plot()
 
     def start_background_saver(self):
         """Start the background save thread"""
-        self.background_save_thread = threading.Thread(target=self._background_save_worker, daemon=True)
+        self.background_save_thread = threading.Thread(target=PROFILER.wrap('saver', self._background_save_worker),
+                                                       name="background-saver", daemon=True)
         self.background_save_thread.start()
         print("✅ Background auto-save thread started")
         print(f"📁 Main data file: {self.main_data_file}")
 
+    def start_pretrigger_sampler(self):
+        """Start continuous between-trial sampling when the pre-trigger buffer is enabled"""
+        pretrigger_config = CONFIG['pretrigger']
+        if not pretrigger_config['enabled']:
+            return
+        if self.simulation_mode:
+            print("ℹ️ Pre-trigger buffer needs connected channels - disabled in simulation mode")
+            return
+        capacity = int(np.ceil(pretrigger_config['seconds'] * CONFIG['sampling_frequency'])) + 1
+        self.pretrigger = PreTriggerBuffer(capacity)
+        self.pretrigger_thread = threading.Thread(target=PROFILER.wrap('pretrigger', self._pretrigger_worker),
+                                                  name="pretrigger-sampler", daemon=True)
+        self.pretrigger_thread.start()
+        print(f"✅ Pre-trigger buffer: last {pretrigger_config['seconds']}s of every channel "
+              f"({capacity} samples each)")
+
+    def _pretrigger_worker(self):
+        """
+        Sample every channel into the ring buffer on the trial sampling schedule while no
+        trial is recording. During a trial collect_data owns the sensors and this loop idles.
+        """
+        interval = CONFIG['sampling_interval']
+        next_tick = time.perf_counter()
+        while not self.pretrigger_stop.is_set():
+            if self.trial_active:
+                self.pretrigger_stop.wait(interval)
+                next_tick = time.perf_counter()
+                continue
+
+            now = time.time()
+            for ch, vi in self.channel_objects.items():
+                try:
+                    self.pretrigger.append(ch, now, vi.getVoltageRatio(), bridge_gain_value(vi, CONFIG['bridge_gain']))
+                except Exception as e:
+                    logger.warning("Pre-trigger: error reading channel %s: %s", ch, e,
+                                   extra={'key': ('pretrigger_read', ch)})
+
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self.pretrigger_stop.wait(delay)
+            elif delay < -interval:
+                next_tick = time.perf_counter()
+
     def _background_save_worker(self):
         """Background thread that handles automatic saving after each trial"""
         while True:
@@ -907,27 +3164,71 @@ class PhidgetViscosityGUI(CTk):
                 if save_request == "STOP":
                     break
 
-                trial_num = save_request
+                block, done = save_request
+                trial_num = block.trial
 
                 print(f"💾 Auto-saving trial {trial_num} data in background...")
 
-                # Perform the save
-                success = self._append_trial_to_file(trial_num)
+                # The orchestrator awaits done, so it is resolved whatever happens during the save
+                success = False
+                error = None
+                try:
+                    save_start = time.perf_counter_ns()
+                    success = self._append_trial_to_file(block)
+                    self.telemetry.record('save_latency', time.perf_counter_ns() - save_start)
+                    self.telemetry.gauge('save_queue_depth', self.save_queue.qsize())
+
+                    if not self._append_summary_to_file(block.summary):
+                        print(f"⚠️ Could not write summary for trial {trial_num}")
+
+                    if success:
+                        print(f"✅ Trial {trial_num} auto-saved to {os.path.basename(self.main_data_file)}")
+                        # Update status on main thread
+                        self.ui_bus.call(self._update_save_status, f"Trial {trial_num} auto-saved")
+                    else:
+                        print(f"⚠️ Auto-save failed for trial {trial_num}")
+                        self.ui_bus.call(self._update_save_status, f"Auto-save failed for trial {trial_num}", True)
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    if done is not None and not done.done():
+                        if error is not None:
+                            done.set_exception(error)
+                        else:
+                            done.set_result(success)
 
-                if success:
-                    print(f"✅ Trial {trial_num} auto-saved to {os.path.basename(self.main_data_file)}")
-                    # Update status on main thread
-                    self.after(0, lambda t=trial_num: self._update_save_status(f"Trial {t} auto-saved"))
-                else:
-                    print(f"⚠️ Auto-save failed for trial {trial_num}")
-                    self.after(0, lambda t=trial_num: self._update_save_status(f"Auto-save failed for trial {t}",
-                                                                               error=True))
+                self.write_metrics()
 
             except Exception as e:
                 print(f"⚠️ Error in background save worker: {e}")
                 import traceback
                 traceback.print_exc()
 
+    def write_metrics(self):
+        """
+        Write the telemetry snapshot to the metrics JSON next to the session data file.
+        Called from the saver thread and from on_close, so writes are serialized by save_lock.
+        """
+        metrics = {
+            'participant_id': self.participant_id,
+            'data_file': os.path.basename(self.main_data_file),
+            'written_at': datetime.now().isoformat(timespec='seconds'),
+            'sampling_frequency': CONFIG['sampling_frequency'],
+            'simulation_mode': self.simulation_mode,
+            'ui_events_posted': self.ui_bus.posted,
+            'ui_events_applied': self.ui_bus.applied
+        }
+        if self.stream is not None:
+            metrics['stream'] = self.stream.counters()
+        metrics.update(self.telemetry.snapshot())
+
+        with self.save_lock:
+            success, error = safe_file_write(self.metrics_file, lambda f: json.dump(metrics, f, indent=2))
+        if not success:
+            print(f"⚠️ Could not write metrics file: {error}")
+        return success
+
     def _update_save_status(self, message, error=False):
         """Update status label from background thread"""
         try:
@@ -952,17 +3253,10 @@ class PhidgetViscosityGUI(CTk):
                 def write_header(f):
                     writer = csv.writer(f)
                     # Write metadata header
-                    writer.writerow(['# Participant ID:', self.participant_id])
-                    writer.writerow(['# Counterbalancing Order:', ', '.join(self.all_viscosities)])
-                    writer.writerow(['# Bridge Gain:', CONFIG['bridge_gain']])
-                    writer.writerow(['# Sampling Frequency (Hz):', CONFIG['sampling_frequency']])
-                    writer.writerow(['# Force Calibration Factor:', 1841.0, 'N/(V/V)'])
+                    writer.writerows(self._session_header_rows())
                     writer.writerow([])
                     # Write data headers
-                    writer.writerow(
-                        ['Trial', 'Viscosity', 'Channel', 'Gain', 'Timestamp', 'Raw_Reading', 'Calibrated_Reading',
-                         'Force_N']
-                    )
+                    writer.writerow(DATA_COLUMNS)
 
                 success, error = safe_file_write(self.main_data_file, write_header, max_attempts=3)
 
@@ -978,8 +3272,8 @@ class PhidgetViscosityGUI(CTk):
                 print(f"⚠️ Exception initializing data file: {e}")
                 return False
 
-    def _append_trial_to_file(self, trial_num):
-        """Append trial data to the main data file"""
+    def _append_trial_to_file(self, block):
+        """Append one finished trial (a TrialBlock) to the main data file"""
         with self.save_lock:
             # Initialize file if needed
             if not self.file_initialized:
@@ -990,24 +3284,9 @@ class PhidgetViscosityGUI(CTk):
                 # Append mode - add trial data
                 with open(self.main_data_file, 'a', newline='') as f:
                     writer = csv.writer(f)
-
-                    # Write data for this trial only
-                    for channel, data_list in self.data.items():
-                        for entry in data_list:
-                            # Only write entries for the specified trial
-                            if entry['trial'] == trial_num:
-                                force_N = entry['calibrated'] * 1841.0
-
-                                writer.writerow([
-                                    entry['trial'],
-                                    entry['viscosity'],
-                                    entry.get('channel', channel),
-                                    entry.get('gain', CONFIG['bridge_gain']),
-                                    entry['timestamp'],
-                                    entry['raw'],
-                                    entry['calibrated'],
-                                    force_N
-                                ])
+                    writer.writerows(self._trial_metadata_rows(block.trial, block.metadata))
+                    writer.writerows(self._data_rows(block.samples, {block.trial: block.window},
+                                                     {block.trial: block.metadata}))
 
                 return True
 
@@ -1015,6 +3294,95 @@ class PhidgetViscosityGUI(CTk):
                 print(f"⚠️ Exception appending trial to file: {e}")
                 return False
 
+    def _session_header_rows(self):
+        """'#' rows at the top of the data and backup files"""
+        rows = [
+            ['# Participant ID:', self.participant_id],
+            *([['# Rig:', RIG, f"serial={CONFIG['rigs'][RIG].get('serial')}",
+                f"channels={';'.join(map(str, rig_channel_numbers()))}"]] if RIG is not None else []),
+            ['# Counterbalancing Order:', ', '.join(self.all_viscosities)],
+            ['# Counterbalancing Mode:', CONFIG['counterbalancing']['mode']],
+            *self.schedule.header_rows(),
+            ['# Bridge Gain:', CONFIG['bridge_gain']],
+            ['# Sampling Frequency (Hz):', CONFIG['sampling_frequency']]
+        ]
+        for ch in sorted(self.force_coefficients):
+            rows.append([f'# Force Calibration CH{ch}:', format_force_coefficients(self.force_coefficients[ch]),
+                         'N = polynomial in V/V, highest power first'])
+        rows.append(['# Filter:', self.signal_filter.describe()])
+        return rows
+
+    def _data_rows(self, samples, windows, metadata):
+        """
+        CSV rows for stored samples, grouped by trial. Each trial's force column is
+        computed from its recorded force polynomial in one vectorized pass.
+        """
+        rows = []
+        for trial, group in itertools.groupby(samples, key=lambda sample: sample.trial):
+            kept = [sample for sample in group if self._keep_sample(sample, windows.get(trial))]
+            if not kept:
+                continue
+            trial_force = metadata.get(trial, {}).get('Force')
+            if trial_force:
+                coefficients = parse_force_coefficients(trial_force['coefficients'])
+            else:
+                coefficients = self.force_coefficients.get(kept[0].channel, DEFAULT_FORCE_COEFFICIENTS)
+            calibrated = np.fromiter((sample.calibrated for sample in kept), dtype=float, count=len(kept))
+            forces = force_from_ratio(coefficients, calibrated).tolist()
+            rows.extend(self._data_row(sample, force) for sample, force in zip(kept, forces))
+        return rows
+
+    @staticmethod
+    def _data_row(sample, force):
+        """CSV row for one stored sample and its force (N), in DATA_COLUMNS order"""
+        return [
+            sample.trial,
+            sample.viscosity,
+            sample.channel,
+            sample.gain,
+            sample.timestamp,
+            sample.raw,
+            sample.calibrated,
+            force,
+            sample.filtered,
+            int(sample.active)
+        ]
+
+    @staticmethod
+    def _trial_metadata_rows(trial_num, metadata):
+        """'#' comment rows describing one trial, written ahead of its data"""
+        return [[f'# Trial {trial_num} {name}:'] + [f'{k}={v}' for k, v in values.items()]
+                for name, values in metadata.items()]
+
+    @staticmethod
+    def _keep_sample(sample, window):
+        """False for idle samples outside a trial's trimmed active window"""
+        if window is None:
+            return True
+        return window[0] <= sample.timestamp <= window[1]
+
+    def _append_summary_to_file(self, summary):
+        """Append one per-trial feature summary row to the participant summary file"""
+        with self.save_lock:
+            try:
+                if not self.summary_file_initialized:
+                    def write_header(f):
+                        csv.writer(f).writerow(SUMMARY_FIELDS)
+
+                    success, error = safe_file_write(self.summary_file, write_header, max_attempts=3)
+                    if not success:
+                        print(f"⚠️ Failed to initialize summary file: {error}")
+                        return False
+                    self.summary_file_initialized = True
+
+                with open(self.summary_file, 'a', newline='') as f:
+                    csv.DictWriter(f, fieldnames=SUMMARY_FIELDS).writerow(summary)
+                return True
+
+            except Exception as e:
+                print(f"⚠️ Exception appending trial summary: {e}")
+                return False
+
     def build_gui(self):
         """Build the complete GUI interface"""
         main_container = CTkFrame(self)
@@ -1055,6 +3423,7 @@ class PhidgetViscosityGUI(CTk):
         self.max_value_seen = CONFIG['plot']['initial_scale']
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
+        self._instrument_canvas()
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill="both", expand=True)
 
@@ -1068,6 +3437,17 @@ class PhidgetViscosityGUI(CTk):
                                    font=("Arial", 12))
         self.lbl_status.pack(pady=5)
 
+        self.lbl_summary = CTkLabel(control_frame,
+                                    text="Last trial: —",
+                                    font=("Arial", 12))
+        self.lbl_summary.pack(pady=(0, 5))
+
+        self.lbl_health = CTkLabel(control_frame,
+                                   text="",
+                                   text_color="orange",
+                                   font=("Arial", 12))
+        self.lbl_health.pack(pady=(0, 5))
+
         button_container = CTkFrame(control_frame)
         button_container.pack(pady=10, fill="x")
 
@@ -1110,6 +3490,22 @@ class PhidgetViscosityGUI(CTk):
                                   font=("Arial", 12))
         self.btn_save.pack(side="left", padx=5)
 
+        self.btn_force_cal = CTkButton(right_button_frame,
+                                       text="Force Cal",
+                                       command=self.show_force_calibration,
+                                       width=120,
+                                       height=40,
+                                       font=("Arial", 12))
+        self.btn_force_cal.pack(side="left", padx=5)
+
+        self.btn_diagnostics = CTkButton(right_button_frame,
+                                         text="Diagnostics",
+                                         command=self.show_diagnostics,
+                                         width=120,
+                                         height=40,
+                                         font=("Arial", 12))
+        self.btn_diagnostics.pack(side="left", padx=5)
+
         viscosity_frame = CTkFrame(control_frame)
         viscosity_frame.pack(pady=5, anchor="e", padx=10)
 
@@ -1125,6 +3521,184 @@ class PhidgetViscosityGUI(CTk):
                             font=("Arial", 12, "bold"))
             btn.pack(side="left", padx=2)
 
+    def _instrument_canvas(self):
+        """Time every real canvas render (draw_idle defers to draw, so time draw itself)"""
+        original_draw = self.canvas.draw
+
+        def timed_draw(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return original_draw(*args, **kwargs)
+            finally:
+                self.telemetry.record('frame_render', time.perf_counter_ns() - start)
+
+        self.canvas.draw = timed_draw
+
+    def show_diagnostics(self):
+        """Open (or raise) the live timing diagnostics panel"""
+        if self.diagnostics_window is not None:
+            try:
+                self.diagnostics_window.lift()
+                return
+            except Exception:
+                self.diagnostics_window = None
+
+        window = Toplevel(self)
+        window.title("Acquisition Diagnostics")
+        window.geometry("900x420")
+        text = tk.Label(window, justify="left", anchor="nw", font=("Courier", 10))
+        text.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def close():
+            self.diagnostics_window = None
+            window.destroy()
+
+        def refresh():
+            if self.diagnostics_window is not window:
+                return
+            lines = self.telemetry.report_lines() or ["No measurements yet"]
+            lines.append(f"{'ui_events':<26} posted={self.ui_bus.posted} applied={self.ui_bus.applied}")
+            text.configure(text="\n".join(lines))
+            window.after(1000, refresh)
+
+        window.protocol("WM_DELETE_WINDOW", close)
+        self.diagnostics_window = window
+        refresh()
+
+    def show_force_calibration(self):
+        """
+        Multi-point force calibration: record the channel's mean reading under known
+        weights, then fit and store a force polynomial for it (see fit_force_calibration).
+        """
+        if self.trial_active:
+            messagebox.showwarning("Trial Active", "Please stop the current trial before force calibration")
+            return
+        if not self.channel_objects:
+            messagebox.showinfo("Force Calibration", "Force calibration needs connected sensors")
+            return
+        if self.force_calibration_window is not None:
+            try:
+                self.force_calibration_window.lift()
+                return
+            except Exception:
+                self.force_calibration_window = None
+
+        force_config = CONFIG['force_calibration']
+        state = {'channel': self.current_channel, 'points': {ch: [] for ch in self.channel_objects}}
+
+        window = Toplevel(self)
+        window.title("Force Calibration")
+        window.geometry("620x520")
+        frame = CTkFrame(window)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        lbl_channel = CTkLabel(frame, text="", font=("Arial", 14, "bold"))
+        lbl_channel.pack(pady=5)
+        channel_frame = CTkFrame(frame)
+        channel_frame.pack(pady=5)
+
+        entry_frame = CTkFrame(frame)
+        entry_frame.pack(pady=5)
+        CTkLabel(entry_frame, text="Known weight (g):", font=("Arial", 12)).pack(side="left", padx=5)
+        entry_weight = CTkEntry(entry_frame, width=100)
+        entry_weight.pack(side="left", padx=5)
+        CTkLabel(entry_frame, text="Degree:", font=("Arial", 12)).pack(side="left", padx=5)
+        entry_degree = CTkEntry(entry_frame, width=50)
+        entry_degree.insert(0, str(force_config['degree']))
+        entry_degree.pack(side="left", padx=5)
+
+        lbl_points = CTkLabel(frame, text="", justify="left", font=("Courier", 11))
+        lbl_points.pack(pady=5, fill="x")
+        lbl_result = CTkLabel(frame, text="", font=("Arial", 12))
+        lbl_result.pack(pady=5)
+
+        def refresh():
+            ch = state['channel']
+            coefficients = self.force_coefficients.get(ch, DEFAULT_FORCE_COEFFICIENTS)
+            lbl_channel.configure(text=f"Channel {ch} — current: {format_force_coefficients(coefficients)}")
+            lines = [f"{ratio:+.8f} V/V  →  {force:8.3f} N" for ratio, force in state['points'][ch]]
+            lbl_points.configure(text="\n".join(lines) or "No points recorded yet (start with no weight)")
+
+        def select(ch):
+            state['channel'] = ch
+            lbl_result.configure(text="")
+            refresh()
+
+        for ch in sorted(self.channel_objects):
+            CTkButton(channel_frame, text=f"CH{ch}", width=70, command=lambda c=ch: select(c)).pack(side="left",
+                                                                                                 padx=2)
+
+        def add_point(ch, ratio, force):
+            state['points'][ch].append((ratio, force))
+            btn_record.configure(state="normal")
+            lbl_result.configure(text=f"Recorded {force:.3f} N on CH{ch}")
+            refresh()
+
+        def read_point(ch, force):
+            vi = self.channel_objects[ch]
+            values = []
+            end = time.time() + force_config['point_duration_s']
+            while time.time() < end:
+                try:
+                    values.append(vi.getVoltageRatio())
+                except Exception as e:
+                    logger.warning("Force calibration: error reading channel %s: %s", ch, e,
+                                   extra={'key': ('force_cal_read', ch)})
+                time.sleep(CONFIG['sampling_interval'])
+            if values:
+                self.ui_bus.call(add_point, ch, float(np.mean(values)) - self.drift.offset(ch), force)
+            else:
+                self.ui_bus.configure(lbl_result, text=f"No readings from CH{ch}")
+                self.ui_bus.configure(btn_record, state="normal")
+
+        def record():
+            try:
+                grams = float(entry_weight.get())
+            except ValueError:
+                lbl_result.configure(text="Enter the known weight in grams")
+                return
+            btn_record.configure(state="disabled")
+            lbl_result.configure(text="Reading... keep the weight still")
+            threading.Thread(target=read_point, args=(state['channel'], grams / 1000.0 * STANDARD_GRAVITY),
+                             name="force-calibration", daemon=True).start()
+
+        def fit():
+            ch = state['channel']
+            points = state['points'][ch]
+            try:
+                degree = int(entry_degree.get())
+                ratios, forces = zip(*points) if points else ((), ())
+                coefficients, rms = fit_force_calibration(ratios, forces, degree)
+            except ValueError as e:
+                lbl_result.configure(text=f"Cannot fit: {e}")
+                return
+            self.force_coefficients[ch] = tuple(float(c) for c in coefficients)
+            save_force_calibration(self.channel_objects[ch], coefficients, points, rms)
+            lbl_result.configure(text=f"CH{ch}: {format_force_coefficients(coefficients)} "
+                                      f"(RMS residual {rms:.4f} N)")
+            print(f"✅ Force calibration CH{ch}: {format_force_coefficients(coefficients)} (RMS {rms:.4f} N)")
+            refresh()
+
+        def clear():
+            state['points'][state['channel']] = []
+            lbl_result.configure(text="")
+            refresh()
+
+        button_frame = CTkFrame(frame)
+        button_frame.pack(pady=10)
+        btn_record = CTkButton(button_frame, text="Record Point", command=record, width=120)
+        btn_record.pack(side="left", padx=5)
+        CTkButton(button_frame, text="Fit & Save", command=fit, width=120).pack(side="left", padx=5)
+        CTkButton(button_frame, text="Clear Points", command=clear, width=120).pack(side="left", padx=5)
+
+        def close():
+            self.force_calibration_window = None
+            window.destroy()
+
+        window.protocol("WM_DELETE_WINDOW", close)
+        self.force_calibration_window = window
+        refresh()
+
     def select_viscosity(self, viscosity):
         """Select which viscosity to test with validation"""
         if self.trial_active:
@@ -1132,18 +3706,24 @@ class PhidgetViscosityGUI(CTk):
             return
 
         try:
+            # A manual pick overrides the next trial only; it does not use up a scheduled slot (see next_trial)
             self.current_viscosity = viscosity
             self.current_channel = self.viscosity_to_channel[viscosity]
-            self.current_viscosity_index = self.all_viscosities.index(viscosity)
 
             current_count = self.viscosity_trial_counts[self.current_viscosity]
             self.lbl_viscosity.configure(
                 text=f"Viscosity: {self.current_viscosity} (CH{self.current_channel}) - {current_count}/{self.trials_per_viscosity}"
             )
 
-            self.lbl_status.configure(
-                text=f"Status: Viscosity {viscosity} selected (Channel {self.current_channel}) - {current_count}/{self.trials_per_viscosity} complete"
-            )
+            status = (f"Status: Viscosity {viscosity} selected (Channel {self.current_channel}) - "
+                      f"{current_count}/{self.trials_per_viscosity} complete")
+            if not self.schedule.finished and viscosity != self.schedule.current:
+                if self.schedule.remaining(viscosity):
+                    status += f" - extra trial, schedule resumes with {self.schedule.current}"
+                else:
+                    status += " - no scheduled trials left for it, extra trial"
+                    print(f"⚠️ Viscosity {viscosity} has no scheduled trials left; the next trial is an extra one")
+            self.lbl_status.configure(text=status)
             print(f"✅ Manually selected Viscosity {viscosity} → Channel {self.current_channel}")
         except Exception as e:
             print(f"⚠️ Error selecting viscosity: {e}")
@@ -1157,68 +3737,77 @@ class PhidgetViscosityGUI(CTk):
                        f"Prepare for next viscosity: {new_condition} (CH{channel}).\n\n"
                        "Click OK when you are ready to continue.")
             print(message)
-            messagebox.showinfo("Condition Change", message)
+            if self.interactive:
+                messagebox.showinfo("Condition Change", message)
         except Exception as e:
             print(f"⚠️ Could not show condition-change popup: {e}")
 
     def play_beep(self, frequency, duration_ms):
-        """Play a beep sound with error handling"""
+        """
+        Play a beep sound with error handling.
+        Returns the wall-clock time at which playback actually ended.
+        """
+        duration_sec = duration_ms / 1000.0
+        start = time.time()
         try:
             if AUDIO_METHOD == 'winsound':
-                import winsound
                 frequency = max(37, min(32767, frequency))
                 winsound.Beep(int(frequency), int(duration_ms))
-                return True
             elif AUDIO_METHOD == 'pygame':
-                import pygame
-                import numpy as np
-                sample_rate = 22050
-                duration_sec = duration_ms / 1000.0
-                samples = int(sample_rate * duration_sec)
-
-                wave = np.sin(2 * np.pi * frequency * np.linspace(0, duration_sec, samples))
-                wave = (wave * 32767).astype(np.int16)
-
-                stereo_wave = np.column_stack((wave, wave))
-                sound = pygame.sndarray.make_sound(stereo_wave)
-                sound.play()
+                sound = get_tone(frequency, duration_ms)
+                start = time.time()
+                channel = sound.play()
                 time.sleep(duration_sec)
-                return True
+                # Wait out whatever is still queued in the mixer so the end time is real
+                while channel is not None and channel.get_busy():
+                    time.sleep(0.001)
             else:
-                time.sleep(duration_ms / 1000.0)
+                time.sleep(duration_sec)
                 print('\a')
-                return False
         except Exception as e:
-            print(f"⚠️ Beep failed: {e}")
-            time.sleep(duration_ms / 1000.0)
-            return False
+            logger.warning("Beep failed: %s", e)
+            time.sleep(max(0.0, duration_sec - (time.time() - start)))
+
+        end = time.time()
+        self.tone_latency = (end - start) - duration_sec
+        return end
 
     def play_countdown_beeps(self):
-        """Play audio countdown"""
+        """
+        Play audio countdown.
+        Returns the wall-clock time at which the countdown actually finished.
+        """
         if not CONFIG['audio']['enabled']:
             time.sleep(CONFIG['countdown_duration'])
-            return
+            return time.time()
 
-        print("🔊 Starting countdown...")
+        logger.info("Starting countdown...")
 
         try:
             duration_ms = int(CONFIG['countdown_duration'] * 1000)
             frequency = CONFIG['audio']['frequency']
 
-            self.after(0, lambda: self.lbl_status.configure(text="Status: Get ready... Recording will start!"))
-            print(f"  Playing start tone ({CONFIG['countdown_duration']}s @ {frequency}Hz)...")
-            self.play_beep(frequency, duration_ms)
-            print("✅ Countdown complete!")
+            self.ui_bus.configure(self.lbl_status, text="Status: Get ready... Recording will start!")
+            logger.info("Playing start tone (%ss @ %sHz)...", CONFIG['countdown_duration'], frequency)
+            end_time = self.play_beep(frequency, duration_ms)
+            logger.info("Countdown complete (playback latency: %+.1f ms)", self.tone_latency * 1000)
+            return end_time
 
         except Exception as e:
-            print(f"⚠️ Countdown error: {e}")
+            logger.warning("Countdown error: %s", e)
             time.sleep(CONFIG['countdown_duration'])
+            return time.time()
 
     def start_trial(self):
         """Start a new trial with countdown"""
-        if self.trial_active:
+        if self.trial_active or not self.orchestrator.claim_start():
             return
 
+        self.prepare_trial_display()
+        self.orchestrator.start_trial(claimed=True)
+
+    def prepare_trial_display(self):
+        """Buttons, plot scale and status for a trial that is starting (Tk thread)"""
         self.btn_start.configure(state="disabled")
         self.btn_pause.configure(state="disabled")
 
@@ -1227,36 +3816,118 @@ class PhidgetViscosityGUI(CTk):
         self.max_value_seen = CONFIG['plot']['initial_scale']
         self.ax.set_ylim(self.y_min_limit, self.y_max_limit)
 
-        self.current_trial_data = []
+        self.lbl_health.configure(text="")
 
         self.lbl_status.configure(text=f"Status: Preparing... Get ready!")
 
-        threading.Thread(target=self._countdown_and_collect, daemon=True).start()
-
-    def _countdown_and_collect(self):
-        """Play countdown then start data collection"""
-        print("\n" + "=" * 50)
-        print("🎬 TRIAL STARTING - COUNTDOWN SEQUENCE")
-        print("=" * 50)
-
-        self.play_countdown_beeps()
-
-        print("=" * 50)
-        print("📊 DATA COLLECTION STARTING NOW")
-        print("=" * 50 + "\n")
-
-        self.trial_start_time = time.time()
+    def begin_recording(self, start_time):
+        """Reset per-trial state and switch to recording; start_time is the real end of the countdown"""
+        self.trial_start_time = start_time
         self.total_pause_duration = 0
         self.trial_paused = False
+        self.trial_pauses = []
+        self.current_trial_data = []
+        self.feature_extractor = TrialFeatureExtractor(CONFIG['features']['plateau_fraction'],
+                                                       self.force_coefficients.get(self.current_channel))
+        self.signal_filter.clear()
+        self.activity_detector = self._new_activity_detector(self.current_channel)
+        self.auto_stop_requested = False
+        self.health_monitor = StreamHealthMonitor(CONFIG['health'], CONFIG['sampling_interval'])
+        self.trial_offset = self.drift.offset(self.current_channel)
+        self.trial_offset_version = self.drift.version
+        if self.stream is not None:
+            self.stream.trial_start = start_time
 
         self.trial_active = True
 
-        self.after(0, lambda: self.btn_start.configure(text="Stop Trial", state="normal", command=self.stop_trial))
-        self.after(0, lambda: self.btn_pause.configure(state="normal"))
-        self.after(0, lambda: self.lbl_status.configure(
-            text=f"Status: Recording Viscosity {self.current_viscosity} (CH{self.current_channel})..."))
+        self.ui_bus.configure(self.btn_start, text="Stop Trial", state="normal", command=self.stop_trial)
+        self.ui_bus.configure(self.btn_pause, state="normal")
+        self.ui_bus.configure(self.lbl_status,
+                              text=f"Status: Recording Viscosity {self.current_viscosity} (CH{self.current_channel})...")
+
+    def rezero_channels(self):
+        """
+        Read the unloaded channels between trials and feed the drift model (executor thread).
+        A reading is rejected when it is noisier than max_sd_factor calibration SDs (sensor
+        touched) or jumps more than max_step from the predicted offset.
+        """
+        rezero_config = CONFIG['rezero']
+        if not rezero_config['enabled'] or self.simulation_mode:
+            return {}
+
+        readings = {ch: [] for ch in self.channel_objects}
+        end = time.time() + rezero_config['duration_s']
+        while time.time() < end:
+            for ch, vi in self.channel_objects.items():
+                try:
+                    readings[ch].append(vi.getVoltageRatio())
+                except Exception as e:
+                    logger.warning("Re-zero: error reading channel %s: %s", ch, e, extra={'key': ('rezero_read', ch)})
+            time.sleep(CONFIG['sampling_interval'])
 
-        self.collect_data()
+        accepted = {}
+        for ch, values in readings.items():
+            if len(values) < 2:
+                continue
+            mean, sd = float(np.mean(values)), float(np.std(values))
+            noise = self.calibration_noise.get(ch, 0.0)
+            predicted = self.drift.offset(ch)
+            if noise and sd > rezero_config['max_sd_factor'] * noise:
+                logger.info("Re-zero CH%s skipped: signal not at rest (SD %.2e)", ch, sd,
+                            extra={'key': ('rezero_skip', ch)})
+                continue
+            if abs(mean - predicted) > rezero_config['max_step']:
+                logger.info("Re-zero CH%s skipped: offset moved %+.2e, more than max_step", ch, mean - predicted,
+                            extra={'key': ('rezero_skip', ch)})
+                continue
+            self.drift.add(ch, mean)
+            accepted[ch] = mean
+            # Not rate limited, so every offset version reaches the session log
+            logger.info("Re-zero CH%s: offset %+.8f (drift %+.2e V/V per hour, version %d)",
+                        ch, mean, self.drift.drift_rate(ch), self.drift.version,
+                        extra={'rate_limit': False})
+        return accepted
+
+    def _new_activity_detector(self, channel):
+        """Onset/offset detector for a channel, or None when detection is disabled"""
+        onset_config = CONFIG['onset']
+        if not onset_config['enabled']:
+            return None
+        return ActivityDetector(self.calibration_noise.get(channel, 0.0),
+                                on_sd=onset_config['on_threshold_sd'],
+                                off_sd=onset_config['off_threshold_sd'],
+                                min_threshold=onset_config['min_threshold'])
+
+    def _report_health(self, problems, channel):
+        """Show health problems in the GUI, at most once per warning_interval_s per kind"""
+        now = time.time()
+        interval = CONFIG['health']['warning_interval_s']
+        for kind in problems:
+            if now - self.health_warning_times.get(kind, float('-inf')) < interval:
+                continue
+            self.health_warning_times[kind] = now
+            message = HEALTH_MESSAGES[kind].format(channel=channel)
+            logger.warning("Health: %s", message, extra={'key': ('health', kind, channel)})
+            self.ui_bus.configure(self.lbl_health, text=f"⚠️ {message}")
+
+    def _relative_time(self):
+        """Seconds since the trial started, excluding time spent paused"""
+        if self.trial_start_time:
+            return time.time() - self.trial_start_time - self.total_pause_duration
+        return 0
+
+    def _end_pause(self):
+        """
+        Close the current pause and record where it sits in trial time. The saved timestamps
+        leave pauses out, so the Pauses metadata row is the only trace of them in the data file.
+        """
+        if self.pause_start_time:
+            pause_duration = time.time() - self.pause_start_time
+            position = self.pause_start_time - self.trial_start_time - self.total_pause_duration
+            self.trial_pauses.append((position, pause_duration))
+            self.total_pause_duration += pause_duration
+            print(f"   Paused for {pause_duration:.2f}s (Total pause time: {self.total_pause_duration:.2f}s)")
+        self.pause_start_time = None
 
     def toggle_pause(self):
         """Toggle pause state during trial"""
@@ -1267,13 +3938,10 @@ class PhidgetViscosityGUI(CTk):
             if self.trial_paused:
                 print("▶️ Continuing data collection...")
 
-                if self.pause_start_time:
-                    pause_duration = time.time() - self.pause_start_time
-                    self.total_pause_duration += pause_duration
-                    print(f"   Paused for {pause_duration:.2f}s (Total pause time: {self.total_pause_duration:.2f}s)")
-
+                self._end_pause()
                 self.trial_paused = False
-                self.pause_start_time = None
+                if self.health_monitor is not None:
+                    self.health_monitor.resume()
 
                 self.btn_pause.configure(text="Pause")
                 self.lbl_status.configure(
@@ -1292,31 +3960,62 @@ class PhidgetViscosityGUI(CTk):
             print(f"⚠️ Error toggling pause: {e}")
 
     def collect_data(self):
-        """Collect data from sensors with error handling"""
-        import random
+        """
+        Collect data from sensors with error handling.
+
+        Samples go into a buffer private to this thread. When the trial ends the
+        buffer is frozen into a TrialBlock and returned (see _finish_trial), so
+        acquisition never shares a container with the saver or the GUI.
+
+        Samples are taken on a fixed schedule of sampling_interval ticks rather
+        than sleeping after each read, so the rate does not drift with read latency.
+        """
+        if self.replay is not None:
+            return self._replay_trial(self.replay)
+
+        trial_num = self.trial_index
+        viscosity = self.current_viscosity
+        channel = self.current_channel
+        offset = self.trial_offset
+        trial_buffer = self._commit_pretrigger(trial_num, viscosity, channel, offset)
+        interval = CONFIG['sampling_interval']
+        next_tick = time.perf_counter()
+        telemetry = self.telemetry
+        last_loop_ns = None
+        # Set when the trial was started through the control API; cleared at the first live sample
+        command_ns, self.command_start_ns = self.command_start_ns, None
 
         while self.trial_active:
             if self.trial_paused:
                 time.sleep(0.1)
+                next_tick = time.perf_counter()
+                last_loop_ns = None
                 continue
 
+            loop_ns = time.perf_counter_ns()
+            if last_loop_ns is not None:
+                telemetry.record('loop_period', loop_ns - last_loop_ns)
+            last_loop_ns = loop_ns
+
             try:
                 if self.simulation_mode:
                     base_values = {0: 0.5, 1: 0.3, 2: 0.7}
-                    base = base_values.get(self.current_channel, 0.5)
+                    base = base_values.get(channel, 0.5)
                     raw_reading = base + random.uniform(-0.05, 0.05)
                     gain = CONFIG['bridge_gain']
                 else:
-                    vi = self.channel_objects.get(self.current_channel)
+                    vi = self.channel_objects.get(channel)
                     if vi is None:
-                        print(f"⚠️ Channel {self.current_channel} not available")
+                        logger.warning("Channel %s not available", channel, extra={'key': ('unavailable', channel)})
                         time.sleep(CONFIG['sampling_interval'])
                         continue
 
                     try:
                         raw_reading = vi.getVoltageRatio()
+                        telemetry.record('read_latency', time.perf_counter_ns() - loop_ns)
                     except PhidgetException as e:
-                        print(f"⚠️ Error reading channel {self.current_channel}: {e}")
+                        logger.warning("Error reading channel %s: %s", channel, e, extra={'key': ('read', channel)})
+                        self._report_health(self.health_monitor.error(self._relative_time()), channel)
                         time.sleep(CONFIG['sampling_interval'])
                         continue
 
@@ -1338,33 +4037,185 @@ class PhidgetViscosityGUI(CTk):
                     except:
                         gain = CONFIG['bridge_gain']
 
-                offset = self.calibration.get(self.current_channel, 0.0)
-                calibrated_reading = raw_reading - offset
-
-                current_time = time.time()
-                if self.trial_start_time:
-                    relative_timestamp = current_time - self.trial_start_time - self.total_pause_duration
-                else:
-                    relative_timestamp = 0
-
-                self.current_trial_data.append(calibrated_reading)
-                self.data[self.current_channel].append({
-                    'timestamp': relative_timestamp,
-                    'trial': self.trial_index,
-                    'viscosity': self.current_viscosity,
-                    'channel': self.current_channel,
-                    'gain': gain,
-                    'raw': raw_reading,
-                    'calibrated': calibrated_reading
-                })
+                sample = self._process_reading(self._relative_time(), trial_num, viscosity, channel, gain,
+                                               raw_reading, offset)
+                trial_buffer.append(sample)
+                if command_ns is not None:
+                    latency_ns = time.perf_counter_ns() - command_ns
+                    telemetry.record('command_to_first_sample', latency_ns)
+                    self.last_command_latency_ms = latency_ns / 1e6
+                    logger.info("Control: first sample %.1f ms after the start command", latency_ns / 1e6,
+                                extra={'rate_limit': False})
+                    command_ns = None
 
             except Exception as e:
-                print(f"⚠️ Unexpected error in data collection: {e}")
-
-            time.sleep(CONFIG['sampling_interval'])
+                logger.warning("Unexpected error in data collection: %s", e, extra={'key': ('collect', channel)})
+                self._report_health(self.health_monitor.error(self._relative_time()), channel)
+
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                # Fell more than a tick behind (e.g. a stalled read); resynchronize instead of bursting
+                next_tick = time.perf_counter()
+
+        return self._finish_trial(trial_num, viscosity, channel, trial_buffer)
+
+    def _process_reading(self, timestamp, trial_num, viscosity, channel, gain, raw_reading, offset):
+        """
+        Per-sample pipeline shared by live acquisition and replay (acquisition thread):
+        offset correction, health checks, filter, plot trace, features, onset/auto-stop and live stream.
+        """
+        calibrated_reading = raw_reading - offset
+
+        problems = self.health_monitor.sample(raw_reading, gain, timestamp)
+        if problems:
+            self._report_health(problems, channel)
+
+        filtered_reading = self.signal_filter.process(channel, calibrated_reading)
+
+        self.current_trial_data.append(filtered_reading)
+        self.feature_extractor.update(timestamp, filtered_reading)
+
+        active = True
+        if self.activity_detector is not None:
+            active = self.activity_detector.update(timestamp, filtered_reading)
+            auto_stop_s = CONFIG['onset']['auto_stop_s']
+            if (auto_stop_s and not self.auto_stop_requested and
+                    self.activity_detector.idle_duration(timestamp) >= auto_stop_s):
+                self.auto_stop_requested = True
+                logger.info("Auto-stopping trial after %ss below threshold", auto_stop_s)
+                self.ui_bus.call(self.stop_trial)
+
+        sample = Sample(timestamp, trial_num, viscosity, channel, gain, raw_reading,
+                        calibrated_reading, filtered_reading, active)
+        if self.stream is not None:
+            self.stream.publish(sample)
+        return sample
+
+    def _replay_trial(self, replay):
+        """
+        Acquisition from a recording instead of the sensor (see ReplayTrial). Samples keep their
+        recorded timestamps and go through _process_reading like live ones. They are paced at
+        replay.speed times the original rate (0 = as fast as possible). The trial stops itself
+        when the recording runs out.
+        """
+        timestamps, raw, gains = replay.timestamps.tolist(), replay.raw.tolist(), replay.gains.tolist()
+        trial_buffer = []
+        started = time.perf_counter()
+        first = timestamps[0] if timestamps else 0.0
+
+        for timestamp, raw_reading, gain in zip(timestamps, raw, gains):
+            if not self.trial_active:
+                break
+            if replay.speed > 0:
+                delay = started + (timestamp - first) / replay.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            trial_buffer.append(self._process_reading(timestamp, replay.trial, replay.viscosity, replay.channel,
+                                                      gain, raw_reading, replay.offset))
+
+        self.telemetry.record('replay_trial', (time.perf_counter() - started) * 1e9)
+        if self.trial_active and not self.auto_stop_requested:
+            self.auto_stop_requested = True
+            self.ui_bus.call(self.stop_trial)
+        return self._finish_trial(replay.trial, replay.viscosity, replay.channel, trial_buffer)
+
+    def _commit_pretrigger(self, trial_num, viscosity, channel, offset):
+        """
+        Turn the buffered lead-in before Start into the first samples of the trial (acquisition thread).
+        The block goes through the same filter, feature and onset steps as live samples, with
+        timestamps relative to the trial start (negative before it).
+        """
+        self.trial_pretrigger_samples = 0
+        if self.pretrigger is None:
+            return []
+
+        since = self.trial_start_time - CONFIG['pretrigger']['seconds']
+        times, raw, gains = self.pretrigger.take(channel, since)
+        if times.size == 0:
+            return []
+
+        calibrated = raw - offset
+        filtered = self.signal_filter.process_block(channel, calibrated)
+        relative = times - self.trial_start_time
+
+        samples = []
+        for timestamp, gain, raw_reading, calibrated_reading, filtered_reading in zip(
+                relative.tolist(), gains.tolist(), raw.tolist(), calibrated.tolist(), filtered.tolist()):
+            self.feature_extractor.update(timestamp, filtered_reading)
+            active = True
+            if self.activity_detector is not None:
+                active = self.activity_detector.update(timestamp, filtered_reading)
+            samples.append(Sample(timestamp, trial_num, viscosity, channel, gain, raw_reading,
+                                  calibrated_reading, filtered_reading, active))
+            if self.stream is not None:
+                self.stream.publish(samples[-1])
+
+        self.current_trial_data.extend(filtered.tolist())
+        self.trial_pretrigger_samples = len(samples)
+        return samples
+
+    def _finish_trial(self, trial_num, viscosity, channel, trial_buffer):
+        """
+        Freeze a finished trial into an immutable TrialBlock (acquisition thread).
+        The block is archived in self.data on the Tk thread and returned for saving.
+        """
+        summary = {'Trial': trial_num, 'Viscosity': viscosity, 'Channel': channel}
+        summary.update(self.feature_extractor.finish())
+
+        onset, offset = (None, None)
+        if self.activity_detector is not None:
+            onset, offset = self.activity_detector.window(self.feature_extractor.last_time)
+        summary['Onset_s'] = onset
+        summary['Offset_s'] = offset
+        summary['Time_To_Peak_From_Onset_s'] = (summary['Time_To_Peak_s'] - onset) if onset is not None else None
+
+        window = None
+        if onset is not None and CONFIG['onset']['trim_idle']:
+            margin = CONFIG['onset']['trim_margin_s']
+            window = (onset - margin, offset + margin)
+
+        metadata = {
+            'Health': self.health_monitor.counters(),
+            'Offset': {
+                'version': self.trial_offset_version,
+                'offset': f"{self.trial_offset:.10g}",
+                'calibration_offset': f"{self.drift.base.get(channel, 0.0):.10g}",
+                'drift_per_hour': f"{self.drift.drift_rate(channel):.4g}"
+            },
+            'Force': {'coefficients': format_force_coefficients(self.force_coefficients.get(channel,
+                                                                                           DEFAULT_FORCE_COEFFICIENTS))}
+        }
+        if self.pretrigger is not None:
+            metadata['PreTrigger'] = {'seconds': CONFIG['pretrigger']['seconds'],
+                                      'samples': self.trial_pretrigger_samples}
+        pauses = tuple(self.trial_pauses)
+        metadata['Pauses'] = {
+            'count': len(pauses),
+            'at_s': ';'.join(f"{position:.4f}" for position, _ in pauses),
+            'durations_s': ';'.join(f"{duration:.3f}" for _, duration in pauses)
+        }
+
+        block = TrialBlock(trial_num, viscosity, channel, tuple(trial_buffer), summary, metadata, window)
+        self.ui_bus.call(self._archive_trial, block)
+        return block
+
+    def _archive_trial(self, block):
+        """Keep a finished trial in the session data used for backups (Tk thread only)"""
+        self.data.setdefault(block.channel, []).extend(block.samples)
+        self.trial_summaries[block.trial] = block.summary
+        self.trial_metadata[block.trial] = block.metadata
+        if block.window is not None:
+            self.trial_windows[block.trial] = block.window
+
+        self.lbl_summary.configure(text=f"Last trial: {format_trial_summary(block.summary)}")
+        print(f"📈 {format_trial_summary(block.summary)}")
 
     def update_plot(self):
         """Update plot with error handling"""
+        tick_start = time.perf_counter_ns()
         try:
             if self.current_line is not None and self.current_trial_data:
                 y = self.current_trial_data
@@ -1386,6 +4237,9 @@ class PhidgetViscosityGUI(CTk):
         except Exception as e:
             print(f"⚠️ Error updating plot: {e}")
 
+        self.telemetry.record('plot_update', time.perf_counter_ns() - tick_start)
+        self.telemetry.gauge('save_queue_depth', self.save_queue.qsize())
+
         self.update_id = self.after(300, self.update_plot)
 
     def stop_trial(self):
@@ -1394,6 +4248,9 @@ class PhidgetViscosityGUI(CTk):
             return
 
         try:
+            # A trial stopped while paused still records that pause (before acquisition reads trial_pauses)
+            if self.trial_paused:
+                self._end_pause()
             self.trial_active = False
             self.trial_paused = False
 
@@ -1411,12 +4268,6 @@ class PhidgetViscosityGUI(CTk):
             self.lbl_status.configure(
                 text=f"Status: Trial stopped. Viscosity {self.current_viscosity}: {current_count}/{self.trials_per_viscosity} complete"
             )
-
-            # *** NEW: Queue background save after trial completion ***
-            self.save_queue.put(self.trial_index)
-            print(f"📋 Queued auto-save for trial {self.trial_index}")
-
-            self.after(500, self.next_trial)
         except Exception as e:
             print(f"⚠️ Error stopping trial: {e}")
 
@@ -1424,25 +4275,30 @@ class PhidgetViscosityGUI(CTk):
         """Advance to next trial with error handling"""
         try:
             moved_to_new_viscosity = False
-            if self.viscosity_trial_counts[self.current_viscosity] >= self.trials_per_viscosity:
-                prev_viscosity = self.current_viscosity
-                self.current_viscosity_index += 1
+            was_finished = self.schedule.finished
+            self.trial_index += 1
+            self.lbl_trial.configure(text=f"Trial: {self.trial_index}")
 
-                if self.current_viscosity_index >= len(self.all_viscosities):
+            # Only a trial of the scheduled condition uses up its slot; a manually picked one was an extra trial
+            if self.current_viscosity == self.schedule.current:
+                self.schedule.advance()
+
+            if self.schedule.finished:
+                # Past the end of the schedule extra trials stay on the current (or manually selected) viscosity
+                if not was_finished:
                     self.experiment_complete = True
                     self.show_experiment_complete_dialog()
                     return
-
-                self.current_viscosity = self.all_viscosities[self.current_viscosity_index]
+            elif self.schedule.current != self.current_viscosity:
+                prev_viscosity = self.current_viscosity
+                self.current_viscosity = self.schedule.current
                 self.current_channel = self.viscosity_to_channel[self.current_viscosity]
                 moved_to_new_viscosity = True
 
-                print(f"\n✅ Viscosity {prev_viscosity} COMPLETE!")
+                if self.viscosity_trial_counts[prev_viscosity] >= self.schedule.totals.get(prev_viscosity, 0):
+                    print(f"\n✅ Viscosity {prev_viscosity} COMPLETE!")
                 print(f"🔄 Switching to Viscosity {self.current_viscosity} (Channel {self.current_channel})\n")
 
-            self.trial_index += 1
-            self.lbl_trial.configure(text=f"Trial: {self.trial_index}")
-
             if moved_to_new_viscosity:
                 self.notify_condition_change(self.current_viscosity)
 
@@ -1480,16 +4336,22 @@ class PhidgetViscosityGUI(CTk):
             print("\n" + "=" * 60)
             print("🎉 DATA COLLECTION COMPLETE!")
             print("=" * 60)
-            print(f"Total trials completed: {self.trial_index}")
+            total_trials = sum(self.viscosity_trial_counts.values())
+            print(f"Total trials completed: {total_trials}")
             for viscosity in self.all_viscosities:
                 count = self.viscosity_trial_counts[viscosity]
                 print(f"  {viscosity}: {count} trials")
             print("=" * 60 + "\n")
 
+            if not self.interactive:
+                print("✅ Continuing experiment (non-interactive)...")
+                self.experiment_complete = False
+                return
+
             result = messagebox.askyesno(
                 "Experiment Complete",
                 f"🎉 All trials completed!\n\n"
-                f"Total trials: {self.trial_index}\n"
+                f"Total trials: {total_trials}\n"
                 f"{''.join([f'{v}: {self.viscosity_trial_counts[v]} trials' + chr(10) for v in self.all_viscosities])}\n"
                 f"Would you like to continue with more trials?\n\n"
                 f"Select 'Yes' to continue or 'No' to end the experiment.",
@@ -1520,9 +4382,9 @@ class PhidgetViscosityGUI(CTk):
             print(f"⚠️ Error showing completion dialog: {e}")
 
     def save_all_data(self):
-        """Save all data to a timestamped backup file with comprehensive error handling"""
+        """Save all data to a timestamped backup file with comprehensive error handling; returns True on success"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = os.path.join(OUTPUT_DIR, f"viscosity_data_{self.participant_id}_{timestamp}_backup.csv")
+        filename = os.path.join(OUTPUT_DIR, f"viscosity_data_{session_tag(self.participant_id)}_{timestamp}_backup.csv")
 
         max_attempts = 3
 
@@ -1532,41 +4394,29 @@ class PhidgetViscosityGUI(CTk):
                     writer = csv.writer(f)
 
                     # Write metadata header
-                    writer.writerow(['# Participant ID:', self.participant_id])
-                    writer.writerow(['# Counterbalancing Order:', ', '.join(self.all_viscosities)])
-                    writer.writerow(['# Bridge Gain:', CONFIG['bridge_gain']])
-                    writer.writerow(['# Sampling Frequency (Hz):', CONFIG['sampling_frequency']])
-                    writer.writerow(['# Force Calibration Factor:', 1841.0, 'N/(V/V)'])
+                    writer.writerows(self._session_header_rows())
+                    for trial_num in sorted(self.trial_metadata):
+                        writer.writerows(self._trial_metadata_rows(trial_num, self.trial_metadata[trial_num]))
                     writer.writerow([])
 
                     # Write data headers
-                    writer.writerow(
-                        ['Trial', 'Viscosity', 'Channel', 'Gain', 'Timestamp', 'Raw_Reading', 'Calibrated_Reading',
-                         'Force_N'])
-
-                    for channel, data_list in self.data.items():
-                        for entry in data_list:
-                            force_N = entry['calibrated'] * 1841.0
-
-                            writer.writerow([
-                                entry['trial'],
-                                entry['viscosity'],
-                                entry.get('channel', channel),
-                                entry.get('gain', CONFIG['bridge_gain']),
-                                entry['timestamp'],
-                                entry['raw'],
-                                entry['calibrated'],
-                                force_N
-                            ])
+                    writer.writerow(DATA_COLUMNS)
+
+                    for data_list in self.data.values():
+                        writer.writerows(self._data_rows(data_list, self.trial_windows, self.trial_metadata))
 
                 success, error = safe_file_write(filename, write_data, max_attempts=1)
 
                 if success:
                     self.data_saved = True
-                    messagebox.showinfo("Backup Created", f"Backup saved to:\n{os.path.basename(filename)}")
+                    if self.interactive:
+                        messagebox.showinfo("Backup Created", f"Backup saved to:\n{os.path.basename(filename)}")
                     self.lbl_status.configure(text=f"Status: Backup saved to {os.path.basename(filename)}")
                     print(f"💾 Backup saved to {filename}")
-                    return
+                    return True
+                elif not self.interactive:
+                    print(f"⚠️ Backup failed: {error}")
+                    return False
                 else:
                     # File locked or permission error
                     if attempt < max_attempts - 1:
@@ -1582,12 +4432,12 @@ class PhidgetViscosityGUI(CTk):
                         if not result:
                             # User cancelled
                             print("⚠️ User cancelled save operation")
-                            return
+                            return False
                         time.sleep(0.5)
                     else:
                         # Final attempt - try alternative filename
                         alt_filename = os.path.join(OUTPUT_DIR,
-                                                    f"viscosity_data_{self.participant_id}_{timestamp}_backup2.csv")
+                                                    f"viscosity_data_{session_tag(self.participant_id)}_{timestamp}_backup2.csv")
                         messagebox.showwarning(
                             "Save Failed",
                             f"Could not save to '{os.path.basename(filename)}'.\n\n"
@@ -1597,6 +4447,8 @@ class PhidgetViscosityGUI(CTk):
 
             except Exception as e:
                 print(f"⚠️ Unexpected error saving data (attempt {attempt + 1}): {e}")
+                if not self.interactive:
+                    return False
                 if attempt >= max_attempts - 1:
                     messagebox.showerror(
                         "Save Failed",
@@ -1604,7 +4456,7 @@ class PhidgetViscosityGUI(CTk):
                         f"Error: {e}\n\n"
                         f"Your main data file should still be intact:\n{os.path.basename(self.main_data_file)}"
                     )
-                    return
+                    return False
 
         # If we get here, all attempts failed
         messagebox.showerror(
@@ -1612,6 +4464,7 @@ class PhidgetViscosityGUI(CTk):
             f"Could not save backup after {max_attempts} attempts.\n\n"
             f"Your main data file should still be intact:\n{os.path.basename(self.main_data_file)}"
         )
+        return False
 
     def recalibrate(self):
         """Recalibrate sensors with error handling"""
@@ -1626,10 +4479,11 @@ class PhidgetViscosityGUI(CTk):
 
             self.withdraw()
 
-            cal_window = CalibrationScreen(self.channels, self.participant_id)
+            cal_window = CalibrationScreen(self.channels, self.participant_id, use_cache=False)
             cal_window.mainloop()
 
             new_calibration = cal_window.calibration
+            new_noise = cal_window.noise
 
             try:
                 cal_window.destroy()
@@ -1640,6 +4494,8 @@ class PhidgetViscosityGUI(CTk):
 
             if new_calibration is not None:
                 self.calibration = new_calibration
+                self.calibration_noise = new_noise
+                self.drift = DriftTracker(self.calibration, CONFIG['rezero']['model_points'])
                 self.lbl_status.configure(text="Status: Recalibration complete")
                 print("✅ Recalibration complete, new values loaded")
             else:
@@ -1661,6 +4517,31 @@ class PhidgetViscosityGUI(CTk):
     def on_close(self):
         """Clean up on close with comprehensive error handling"""
         self.trial_active = False
+        self.pretrigger_stop.set()
+
+        if self.control is not None:
+            try:
+                self.control.stop()
+                print("✅ Control API stopped")
+            except Exception as e:
+                print(f"⚠️ Error stopping control API: {e}")
+
+        # Cancel the running trial; its recorded samples are still handed to the saver
+        try:
+            self.orchestrator.shutdown()
+            print("✅ Session orchestrator stopped")
+        except Exception as e:
+            print(f"⚠️ Error stopping session orchestrator: {e}")
+
+        # Apply what the cancelled trial posted (its _archive_trial) before the bus stops,
+        # so the exit summary, backups and resampled copy include it
+        self.ui_bus.drain()
+        self.ui_bus.stop()
+
+        try:
+            self.write_metrics()
+        except Exception as e:
+            print(f"⚠️ Error writing metrics: {e}")
 
         # Stop background save thread
         try:
@@ -1687,6 +4568,24 @@ class PhidgetViscosityGUI(CTk):
         else:
             print("ℹ️ No data to save")
 
+        if has_data and CONFIG['resample']['enabled']:
+            try:
+                output, totals = resample_file(self.main_data_file, CONFIG['sampling_frequency'],
+                                               CONFIG['resample']['gap_factor'])
+                print(f"📈 Uniform-grid copy: {os.path.basename(output)} ({totals['grid_points']} points, "
+                      f"{totals['masked']} in gaps)")
+            except Exception as e:
+                print(f"⚠️ Error writing resampled data: {e}")
+
+        if self.pretrigger_thread is not None:
+            self.pretrigger_thread.join(timeout=1.0)
+
+        if self.stream is not None:
+            self.stream.close()
+            counters = self.stream.counters()
+            print(f"✅ Live stream closed: {counters['sent']} samples in {counters['frames']} frames, "
+                  f"{counters['dropped']} dropped")
+
         # Close Phidget channels
         for vi in self.channels:
             try:
@@ -1705,7 +4604,42 @@ class PhidgetViscosityGUI(CTk):
 # ============================================================
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="PhidgetBridge syringe viscosity study")
+    parser.add_argument('--profile', nargs='?', const=CONFIG['profiling']['mode'], choices=SessionProfiler.MODES,
+                        help="Profile the session threads (default mode from the config; auto is sampling on "
+                             "Python 3.12+); profiles are written to the output directory at exit")
+    parser.add_argument('--rig', help="Drive the named rig from the config's 'rigs' section; "
+                                      "'all' starts one process per configured rig")
+    args = parser.parse_args()
+
+    if args.rig == 'all':
+        if not CONFIG['rigs']:
+            parser.error("no rigs configured in viscosity_config.json")
+        try:
+            for name in CONFIG['rigs']:
+                check_rig_channels(name)
+        except ValueError as e:
+            parser.error(str(e))
+        sys.exit(1 if launch_rigs(CONFIG['rigs'], ['--profile', args.profile] if args.profile else []) else 0)
+
+    rig_config = {}
+    try:
+        if args.rig:
+            rig_config = select_rig(args.rig)
+        check_rig_channels(args.rig)
+    except ValueError as e:
+        parser.error(str(e))
+    # After select_rig: each rig process rotates its own log, a shared RotatingFileHandler is not process safe
+    setup_logging()
+    if not args.rig and CONFIG['rigs']:
+        print(f"ℹ️ Rigs configured ({', '.join(CONFIG['rigs'])}) - use --rig NAME or --rig all to select them")
+
+    PROFILER.configure(CONFIG['profiling'], mode=args.profile)
+
     channels = []
+    participant_id = None
     try:
         print("Step 1: Showing participant dialog...")
         dialog = ParticipantDialog()
@@ -1719,7 +4653,7 @@ if __name__ == "__main__":
         print(f"✅ Participant ID: {participant_id}")
 
         print("Step 2: Connecting to Phidget channels...")
-        channels = connect_channels()
+        channels = connect_channels(rig_config.get('serial'), rig_channel_numbers())
         if not channels:
             print("⚠️ No Phidget channels detected.")
             root = tk.Tk()
@@ -1747,9 +4681,10 @@ if __name__ == "__main__":
 
         print("Step 3: Showing calibration screen...")
         cal_screen = CalibrationScreen(channels, participant_id)
-        cal_screen.mainloop()
+        PROFILER.run('tk-calibration', cal_screen.mainloop)
 
         calibration = cal_screen.calibration
+        calibration_noise = cal_screen.noise
 
         try:
             if cal_screen.winfo_exists():
@@ -1772,10 +4707,10 @@ if __name__ == "__main__":
         print(f"✅ Calibration complete: {calibration}")
 
         print("Step 4: Starting main application...")
-        app = PhidgetViscosityGUI(participant_id, calibration, channels)
+        app = PhidgetViscosityGUI(participant_id, calibration, channels, calibration_noise)
         app.protocol("WM_DELETE_WINDOW", app.on_close)
         print("✅ Application started successfully")
-        app.mainloop()
+        PROFILER.run('tk-main', app.mainloop)
 
     except KeyboardInterrupt:
         print("\n⚠️ Program interrupted by user")
@@ -1800,6 +4735,11 @@ if __name__ == "__main__":
 
     finally:
         print("Cleaning up...")
+        try:
+            PROFILER.dump(OUTPUT_DIR,
+                          f"profile_{session_tag(participant_id)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        except Exception as e:
+            print(f"⚠️ Error writing profiles: {e}")
         try:
             if 'channels' in locals():
                 for vi in channels:
@@ -0,0 +1,388 @@
+# Syringe Study benchmark suite
+# Runs the real PhidgetViscosityGUI (window withdrawn, popups off) against simulated sensors and measures:
+#   - acquisition: achieved sample rate and tick jitter of collect_data at each target rate
+#   - storage: per-trial _append_trial_to_file time and full-session save_all_data time
+#   - plotting: update_plot frame time (including the canvas render) for growing traces
+#   - memory: RSS growth over a simulated session (default 2 hours of recorded trials)
+# Results are written as JSON so runs can be compared between commits.
+#
+# Usage:
+#   python syringe_benchmark.py
+#   python syringe_benchmark.py --rates 100 1000 5000 --duration 5 --session-hours 2 --output bench.json
+#
+# Tk still needs a display; on a headless machine run it under Xvfb (xvfb-run python syringe_benchmark.py).
+# psutil is optional and only used for RSS; without it /proc or resource.getrusage is used.
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import concurrent.futures
+from datetime import datetime
+
+import numpy as np
+
+import Syringe2025V3_7 as syringe
+from Syringe2025V3_7 import CONFIG, SimulatedVoltageRatioInput, Sample, TrialBlock
+
+try:
+    import psutil
+
+    _PROCESS = psutil.Process()
+except ImportError:
+    _PROCESS = None
+
+
+# ============================================================
+# === Helpers ================================================
+# ============================================================
+
+def rss_bytes():
+    """Current resident set size in bytes, or None if it cannot be read"""
+    if _PROCESS is not None:
+        return _PROCESS.memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def rss_source():
+    if _PROCESS is not None:
+        return 'psutil'
+    if os.path.exists('/proc/self/statm'):
+        return 'proc'
+    return 'getrusage_peak'
+
+
+def git_revision():
+    """Commit hash of the checkout the benchmark runs from, if it is a git repository"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def duration_stats(seconds):
+    """Millisecond summary of a list of durations in seconds"""
+    if not seconds:
+        return {'count': 0}
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        'count': int(ms.size),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'max_ms': float(ms.max())
+    }
+
+
+def pump(app, seconds):
+    """Keep the Tk event loop (and so the UI event bus) running for a while"""
+    deadline = time.perf_counter() + seconds
+    while True:
+        app.update()
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        time.sleep(min(0.005, remaining))
+
+
+def set_sampling_rate(app, rate):
+    CONFIG['sampling_frequency'] = rate
+    CONFIG['sampling_interval'] = 1.0 / rate
+    app.signal_filter = syringe.StreamingFilter(CONFIG['filter'], rate)
+
+
+def synthetic_block(app, sensor, trial, viscosity, start_s, duration_s, rate):
+    """
+    A TrialBlock for duration_s of sensor signal, built without waiting in real time.
+    Filtering, feature extraction and onset detection go through the same classes as collect_data.
+    """
+    channel = sensor.getChannel()
+    n = max(1, int(duration_s * rate))
+    times = np.arange(n) / rate
+    raw = sensor.values_at(start_s + times)
+    calibrated = raw - app.calibration.get(channel, 0.0)
+    app.signal_filter.clear(channel)
+    filtered = app.signal_filter.process_block(channel, calibrated)
+
+    extractor = syringe.TrialFeatureExtractor(CONFIG['features']['plateau_fraction'])
+    detector = app._new_activity_detector(channel)
+    gain = CONFIG['bridge_gain']
+    samples = []
+    for t, r, c, f in zip(times.tolist(), raw.tolist(), calibrated.tolist(), filtered.tolist()):
+        extractor.update(t, f)
+        active = detector.update(t, f) if detector is not None else True
+        samples.append(Sample(t, trial, viscosity, channel, gain, r, c, f, active))
+
+    summary = {'Trial': trial, 'Viscosity': viscosity, 'Channel': channel}
+    summary.update(extractor.finish())
+    onset, offset = detector.window(extractor.last_time) if detector is not None else (None, None)
+    summary['Onset_s'] = onset
+    summary['Offset_s'] = offset
+    summary['Time_To_Peak_From_Onset_s'] = (summary['Time_To_Peak_s'] - onset) if onset is not None else None
+    return TrialBlock(trial, viscosity, channel, tuple(samples), summary, {'Health': {}}, None)
+
+
+# ============================================================
+# === Benchmarks =============================================
+# ============================================================
+
+def bench_acquisition(app, rate, duration_s):
+    """Run collect_data for duration_s at the target rate; returns (stats, block)"""
+    set_sampling_rate(app, rate)
+    app.current_trial_data = []
+    app.begin_recording(time.time())
+
+    result = []
+    worker = threading.Thread(target=lambda: result.append(app.collect_data()), name=f"bench-acquire-{rate}")
+    worker.start()
+    pump(app, duration_s)
+    app.trial_active = False
+    worker.join()
+    pump(app, 0.1)  # Let _archive_trial run
+
+    block = result[0]
+    timestamps = np.array([sample.timestamp for sample in block.samples])
+    interval = 1.0 / rate
+    stats = {'target_hz': rate, 'duration_s': duration_s, 'samples': len(block.samples)}
+    if timestamps.size > 2:
+        dt = np.diff(timestamps)
+        error_us = np.abs(dt - interval) * 1e6
+        stats.update({
+            'achieved_hz': float((timestamps.size - 1) / (timestamps[-1] - timestamps[0])),
+            'jitter_sd_us': float(dt.std() * 1e6),
+            'jitter_p50_us': float(np.percentile(error_us, 50)),
+            'jitter_p99_us': float(np.percentile(error_us, 99)),
+            'jitter_max_us': float(error_us.max()),
+            'late_fraction': float(np.mean(dt > 1.5 * interval))
+        })
+    app.current_trial_data = []
+    return stats, block
+
+
+def bench_trial_save(app, block, repeats):
+    """Time _append_trial_to_file for one trial block, repeated"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        if not app._append_trial_to_file(block):
+            raise RuntimeError(f"_append_trial_to_file failed for {len(block.samples)} samples")
+        timings.append(time.perf_counter() - start)
+    stats = {'samples_per_trial': len(block.samples)}
+    stats.update(duration_stats(timings))
+    return stats
+
+
+def bench_plot(app, rate, trace_seconds, repeats):
+    """Time update_plot plus the canvas render it triggers for traces of increasing length"""
+    results = []
+    sensor = SimulatedVoltageRatioInput(0, seed=1)
+    for seconds in trace_seconds:
+        n = int(seconds * rate)
+        trace = (sensor.values_at(np.arange(n) / rate) - sensor.offset).tolist()
+        timings = []
+        for i in range(repeats):
+            # A new maximum each frame forces the axis rescale path as well
+            app.current_trial_data = trace + [trace[-1] * (1.0 + i * 1e-3) + 1e-9]
+            if app.update_id:
+                app.after_cancel(app.update_id)
+            start = time.perf_counter()
+            app.update_plot()
+            app.update_idletasks()
+            timings.append(time.perf_counter() - start)
+        stats = {'rate_hz': rate, 'trace_seconds': seconds, 'points': len(trace) + 1}
+        stats.update(duration_stats(timings))
+        results.append(stats)
+    app.current_trial_data = []
+    return results
+
+
+def bench_session(app, sensors, hours, rate, trial_s, checkpoints=20):
+    """
+    Push hours of simulated trials through the archive/auto-save path and track RSS.
+    Trials go through save_queue exactly like SessionOrchestrator._save, without real-time waits.
+    """
+    set_sampling_rate(app, rate)
+    n_trials = max(1, int(round(hours * 3600.0 / trial_s)))
+    labels = app.all_viscosities
+    per_viscosity = max(1, n_trials // len(labels))
+    rss_start = rss_bytes()
+    trajectory = [{'trial': 0, 'recorded_s': 0.0, 'rss_bytes': rss_start}]
+    pending = []
+    started = time.perf_counter()
+
+    for trial in range(1, n_trials + 1):
+        viscosity = labels[min((trial - 1) // per_viscosity, len(labels) - 1)]
+        channel = app.viscosity_to_channel[viscosity]
+        sensor = sensors[channel % len(sensors)]
+        block = synthetic_block(app, sensor, trial, viscosity, (trial - 1) * trial_s, trial_s, rate)
+        app._archive_trial(block)
+        done = concurrent.futures.Future()
+        app.save_queue.put((block, done))
+        pending.append(done)
+
+        if trial % max(1, n_trials // checkpoints) == 0 or trial == n_trials:
+            app.update()
+            trajectory.append({'trial': trial, 'recorded_s': trial * trial_s, 'rss_bytes': rss_bytes(),
+                               'save_queue_depth': app.save_queue.qsize()})
+
+    for done in pending:
+        while not done.done():
+            pump(app, 0.01)
+    saved = sum(1 for done in pending if done.result())
+    pump(app, 0.1)
+
+    rss_end = rss_bytes()
+    total_samples = sum(len(samples) for samples in app.data.values())
+    stats = {
+        'hours': hours,
+        'rate_hz': rate,
+        'trial_s': trial_s,
+        'trials': n_trials,
+        'trials_saved': saved,
+        'samples': total_samples,
+        'wall_s': time.perf_counter() - started,
+        'rss_start_bytes': rss_start,
+        'rss_end_bytes': rss_end,
+        'rss_growth_bytes': (rss_end - rss_start) if rss_start is not None and rss_end is not None else None,
+        'rss_trajectory': trajectory,
+        'data_file_bytes': os.path.getsize(app.main_data_file) if os.path.exists(app.main_data_file) else 0
+    }
+    if stats['rss_growth_bytes'] is not None and total_samples:
+        stats['rss_bytes_per_sample'] = stats['rss_growth_bytes'] / total_samples
+    return stats
+
+
+def bench_save_all(app):
+    """Time one full-session save_all_data backup of everything archived so far"""
+    start = time.perf_counter()
+    success = app.save_all_data()
+    elapsed = time.perf_counter() - start
+    samples = sum(len(samples) for samples in app.data.values())
+    return {'success': bool(success), 'samples': samples, 'seconds': elapsed,
+            'samples_per_s': samples / elapsed if elapsed > 0 else None}
+
+
+# ============================================================
+# === Main ===================================================
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark acquisition, storage and plotting against simulated sensors")
+    parser.add_argument('--rates', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="Target sampling rates in Hz (default: 100 1000 5000)")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds of live acquisition per rate")
+    parser.add_argument('--save-repeats', type=int, default=20, help="Repetitions of each per-trial save")
+    parser.add_argument('--plot-repeats', type=int, default=20, help="Frames timed for each trace length")
+    parser.add_argument('--plot-seconds', type=float, nargs='+', default=[1, 10, 60],
+                        help="Trace lengths (seconds of data) for the plot benchmark")
+    parser.add_argument('--session-hours', type=float, default=2.0, help="Simulated session length (0 to skip)")
+    parser.add_argument('--session-rate', type=int, default=None,
+                        help="Sampling rate of the simulated session (default: configured rate)")
+    parser.add_argument('--trial-seconds', type=float, default=10.0, help="Length of each simulated trial")
+    parser.add_argument('--output', default=None, help="JSON results file (default: syringe_benchmark_<time>.json)")
+    parser.add_argument('--keep-files', action='store_true', help="Keep the data files written during the run")
+    args = parser.parse_args(argv)
+
+    configured_rate = CONFIG['sampling_frequency']
+    session_rate = args.session_rate or configured_rate
+    output = args.output or f"syringe_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    # Everything the GUI writes goes to a scratch directory
+    workdir = tempfile.mkdtemp(prefix="syringe_benchmark_")
+    syringe.OUTPUT_DIR = workdir
+    syringe.setup_logging()
+    CONFIG['audio']['enabled'] = False
+
+    sensors = [SimulatedVoltageRatioInput(ch, seed=ch) for ch in range(CONFIG['num_channels'])]
+    calibration = {sensor.channel: sensor.offset for sensor in sensors}
+    noise = {sensor.channel: sensor.noise_sd for sensor in sensors}
+
+    results = {
+        'benchmark': 'syringe',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'scipy_filtering': syringe.USE_SCIPY,
+        'rss_source': rss_source(),
+        'config': {'filter': CONFIG['filter'], 'onset': CONFIG['onset'], 'num_channels': CONFIG['num_channels']},
+        'rss_before_gui_bytes': rss_bytes()
+    }
+
+    print(f"🏁 Benchmark starting (scratch directory: {workdir})")
+    app = syringe.PhidgetViscosityGUI("BENCHMARK", calibration, sensors, noise, interactive=False)
+    app.withdraw()
+    pump(app, 0.5)
+    results['rss_after_gui_bytes'] = rss_bytes()
+
+    try:
+        results['acquisition'] = []
+        results['trial_save'] = []
+        for rate in args.rates:
+            print(f"⏱️ Acquisition at {rate} Hz for {args.duration}s...")
+            stats, block = bench_acquisition(app, rate, args.duration)
+            results['acquisition'].append(stats)
+            print(f"   achieved {stats.get('achieved_hz', 0):.1f} Hz, jitter p99 {stats.get('jitter_p99_us', 0):.0f} µs")
+
+            stats = bench_trial_save(app, block, args.save_repeats)
+            stats['rate_hz'] = rate
+            results['trial_save'].append(stats)
+            print(f"   trial save ({stats['samples_per_trial']} samples): p50 {stats['p50_ms']:.2f} ms")
+
+        print("🖼️ Plot frame times...")
+        results['plot'] = []
+        for rate in args.rates:
+            results['plot'].extend(bench_plot(app, rate, args.plot_seconds, args.plot_repeats))
+
+        # The live benchmarks above archived their trials; the session starts from an empty archive
+        app.data = {ch: [] for ch in app.available_channels}
+        app.trial_summaries.clear()
+        app.trial_metadata.clear()
+        app.trial_windows.clear()
+
+        if args.session_hours > 0:
+            print(f"🧪 Simulated {args.session_hours} h session at {session_rate} Hz...")
+            results['session'] = bench_session(app, sensors, args.session_hours, session_rate, args.trial_seconds)
+            growth = results['session']['rss_growth_bytes']
+            if growth is not None:
+                print(f"   RSS growth {growth / 1e6:.1f} MB for {results['session']['samples']} samples")
+
+            print("💾 Full-session save_all_data...")
+            results['save_all_data'] = bench_save_all(app)
+            print(f"   {results['save_all_data']['seconds']:.2f} s")
+
+        results['telemetry'] = app.telemetry.snapshot()
+    finally:
+        set_sampling_rate(app, configured_rate)
+        app.on_close()
+        syringe.shutdown_logging()
+        if not args.keep_files:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Benchmark results written to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Syringe Study data file reader and writer
+# Parses the viscosity_data_<participant>.csv files written by Syringe2025V3_7.py, and their _backup copies:
+#   - session header rows '# Name:,value,...' (participant, counterbalancing, schedule, gain, sampling
+#     frequency, force calibration per channel, filter)
+#   - per-trial metadata rows '# Trial N Name:,key=value,...'. The main file has them just ahead of each
+#     trial's samples; a backup has all of them before the column row.
+#   - the column row (Trial, Viscosity, Channel, Gain, Timestamp, ...), then one row per sample
+# Sample rows are kept as the original text and trials are written back in the order they appeared, including
+# trials that have metadata rows but no samples (a trial cancelled before its first sample), so a file read and
+# written back with write_data_file is identical byte for byte. trial_array() turns one column of one trial into a NumPy array. atomic_write()
+# replaces a file only once its new content has been written completely.
+#
+# Only the standard library and NumPy are used, so analysis scripts can import it without Tk or Phidget22.
+
+import os
+import re
+import csv
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+TRIAL_ROW = re.compile(r'^# Trial (\d+) (.+):$')
+
+# Default voltage ratio to force conversion, used for channels without a multi-point force calibration.
+# Force (N) = FORCE_CALIBRATION_FACTOR × V/V, as a polynomial (highest power first)
+FORCE_CALIBRATION_FACTOR = 1841.0  # N/(V/V)
+DEFAULT_FORCE_COEFFICIENTS = (FORCE_CALIBRATION_FACTOR, 0.0)
+
+# layout: 'interleaved' (main data file) or 'leading' (backup: all trial metadata ahead of the columns)
+# order: trial numbers in the order their first metadata or sample row appeared (None: trials, then metadata)
+DataFile = namedtuple('DataFile', ['path', 'header_rows', 'header', 'metadata', 'columns', 'trials', 'layout',
+                                   'order'], defaults=(None,))
+TrialRows = namedtuple('TrialRows', ['trial', 'viscosity', 'channel', 'rows'])
+
+
+# ============================================================
+# === Reading ================================================
+# ============================================================
+
+def parse_metadata_values(cells):
+    """['k=v', ...] → {k: v} with the values left as text"""
+    values = {}
+    for cell in cells:
+        key, sep, value = cell.partition('=')
+        if sep:
+            values[key] = value
+    return values
+
+
+def read_data_file(path):
+    """Read a data or backup file into a DataFile; raises ValueError if it has no column row"""
+    header_rows = []
+    metadata = {}
+    columns = None
+    trials = {}
+    order = []
+    layout = 'interleaved'
+
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or not any(row):
+                continue
+            first = row[0]
+            match = TRIAL_ROW.match(first)
+            if match:
+                trial = int(match.group(1))
+                if trial not in metadata and trial not in trials:
+                    order.append(trial)
+                metadata.setdefault(trial, {})[match.group(2)] = parse_metadata_values(row[1:])
+                if columns is None:
+                    layout = 'leading'
+                continue
+            if columns is None:
+                if first.startswith('#'):
+                    header_rows.append(row)
+                elif first == 'Trial':
+                    columns = row
+                continue
+
+            trial = int(first)
+            rows = trials.get(trial)
+            if rows is None:
+                if trial not in metadata:
+                    order.append(trial)
+                rows = trials[trial] = TrialRows(trial, row[1], int(row[2]), [])
+            rows.rows.append(row)
+
+    if columns is None:
+        raise ValueError(f"{path}: no data column row found")
+
+    header = {}
+    for row in header_rows:
+        header.setdefault(row[0].lstrip('#').strip().rstrip(':'), row[1:])
+    return DataFile(path, header_rows, header, metadata, columns, trials, layout, order)
+
+
+def header_value(datafile, name, default=None, cast=str):
+    """First value of a session header row such as 'Sampling Frequency (Hz)'"""
+    values = datafile.header.get(name)
+    if not values:
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        return default
+
+
+def parse_coefficients(text):
+    """'a;b;c' force polynomial (highest power first) → tuple of floats"""
+    return tuple(float(c) for c in str(text).split(';') if c.strip())
+
+
+def format_coefficients(coefficients):
+    """Force polynomial as written in the data files (same format as the main script)"""
+    return ';'.join(f"{c:.10g}" for c in coefficients)
+
+
+def header_force_coefficients(datafile):
+    """{channel: coefficient tuple} from the '# Force Calibration CHn:' header rows"""
+    coefficients = {}
+    for name, values in datafile.header.items():
+        if name.startswith('Force Calibration CH') and values:
+            coefficients[int(name[len('Force Calibration CH'):])] = parse_coefficients(values[0])
+    return coefficients
+
+
+def trial_force_coefficients(datafile, trial, default=None):
+    """
+    Force polynomial a trial was recorded with: its own metadata row, else the session header.
+    Files from before force calibration have a single '# Force Calibration Factor:' row.
+    """
+    rows = datafile.trials.get(trial)
+    force = datafile.metadata.get(trial, {}).get('Force', {}).get('coefficients')
+    if force:
+        return parse_coefficients(force)
+    if rows is not None and rows.channel in header_force_coefficients(datafile):
+        return header_force_coefficients(datafile)[rows.channel]
+    factor = header_value(datafile, 'Force Calibration Factor', None, float)
+    if factor is not None:
+        return (factor, 0.0)
+    return default
+
+
+def trial_array(datafile, trial, column, dtype=float):
+    """One column of one trial as a NumPy array"""
+    index = datafile.columns.index(column)
+    return np.array([row[index] for row in datafile.trials[trial].rows], dtype=dtype)
+
+
+def trial_offset(datafile, trial):
+    """
+    Offset a trial was recorded with. raw - calibrated gives it exactly for most samples (the
+    metadata row is rounded to 10 digits), so the most common value is used.
+    """
+    raw = trial_array(datafile, trial, 'Raw_Reading')
+    calibrated = trial_array(datafile, trial, 'Calibrated_Reading')
+    if raw.size:
+        values, counts = np.unique(raw - calibrated, return_counts=True)
+        return float(values[np.argmax(counts)])
+    offset = datafile.metadata.get(trial, {}).get('Offset', {}).get('offset')
+    return float(offset) if offset else 0.0
+
+
+# ============================================================
+# === Writing ================================================
+# ============================================================
+
+def write_data_file(f, datafile, header_rows=None, metadata=None, trials=None):
+    """
+    Write a DataFile to an open text file in its own layout. header_rows, metadata
+    and trials replace the file's own when given (trials: {trial: TrialRows}). Trials
+    keep the file's order; ones the file did not have are written after them.
+    """
+    header_rows = datafile.header_rows if header_rows is None else header_rows
+    metadata = datafile.metadata if metadata is None else metadata
+    trials = datafile.trials if trials is None else trials
+
+    def metadata_rows(trial):
+        return [[f'# Trial {trial} {name}:'] + [f'{k}={v}' for k, v in values.items()]
+                for name, values in metadata.get(trial, {}).items()]
+
+    order = list(datafile.order or [])
+    for trial in list(trials) + list(metadata):
+        if trial not in order:
+            order.append(trial)
+
+    writer = csv.writer(f)
+    writer.writerows(header_rows)
+    if datafile.layout == 'leading':
+        for trial in order:
+            writer.writerows(metadata_rows(trial))
+    writer.writerow([])
+    writer.writerow(datafile.columns)
+    for trial in order:
+        if datafile.layout == 'interleaved':
+            writer.writerows(metadata_rows(trial))
+        if trial in trials:
+            writer.writerows(trials[trial].rows)
+
+
+def atomic_write(path, write_function):
+    """Write through a temporary file in the same directory, then replace path with it"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            write_function(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,249 @@
+# Syringe Study session replay
+# Feeds a recorded viscosity_data_<participant>.csv (or a _backup copy) back through PhidgetViscosityGUI's real
+# trial cycle: orchestrator → acquisition (_process_reading: offset, health, filter, features, onset, stream)
+# → background saver → plot → next_trial. Each sample keeps its recorded raw reading, gain and timestamp.
+# Trials are paced at --speed times the original rate (1 = original timing, 10 = ten times faster,
+# 0 = as fast as possible).
+#
+# Afterwards the data file written by the replay is compared column by column with the recording:
+#   - identical: the cells are the same text
+#   - max_abs_diff: the largest numeric difference for the cells that are not
+# The recording is also read and written back with syringe_datafile to check that this round trip is
+# byte-for-byte identical. A JSON report adds throughput, replayed vs recorded trial durations and telemetry.
+#
+# Usage:
+#   python syringe_replay.py viscosity_data_P01.csv
+#   python syringe_replay.py viscosity_data_P01.csv --speed 0 --output replay.json
+#   python syringe_replay.py viscosity_data_P01.csv --speed 1 --show
+#
+# Like syringe_benchmark.py it needs a display for Tk (use xvfb-run on headless machines).
+
+import io
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+
+import Syringe2025V3_7 as syringe
+from Syringe2025V3_7 import CONFIG, ReplayTrial, DATA_COLUMNS
+from syringe_benchmark import pump, git_revision
+from syringe_soak import wait_until
+from syringe_datafile import (read_data_file, write_data_file, header_value, trial_force_coefficients,
+                              trial_array, trial_offset)
+
+
+# ============================================================
+# === Recording ==============================================
+# ============================================================
+
+def replay_trials(datafile, speed):
+    """
+    ReplayTrial for every trial in the recording, in file order. The offset comes from
+    trial_offset(), so the replayed Calibrated_Reading cells come out identical.
+    """
+    for trial, rows in datafile.trials.items():
+        yield ReplayTrial(trial, rows.viscosity, rows.channel,
+                          trial_array(datafile, trial, 'Timestamp'),
+                          trial_array(datafile, trial, 'Raw_Reading'),
+                          trial_array(datafile, trial, 'Gain', dtype=int),
+                          trial_offset(datafile, trial), speed)
+
+
+# ============================================================
+# === Comparison =============================================
+# ============================================================
+
+def compare(original, replayed):
+    """Per-column agreement between two DataFiles, over the trials both contain"""
+    results = {}
+    trials = [trial for trial in original.trials if trial in replayed.trials]
+    missing = [trial for trial in original.trials if trial not in replayed.trials]
+    for column in DATA_COLUMNS:
+        if column not in original.columns or column not in replayed.columns:
+            continue
+        a_index, b_index = original.columns.index(column), replayed.columns.index(column)
+        cells = identical = 0
+        max_diff = 0.0
+        for trial in trials:
+            a_rows, b_rows = original.trials[trial].rows, replayed.trials[trial].rows
+            for a_row, b_row in zip(a_rows, b_rows):
+                cells += 1
+                a, b = a_row[a_index], b_row[b_index]
+                if a == b:
+                    identical += 1
+                    continue
+                try:
+                    max_diff = max(max_diff, abs(float(a) - float(b)))
+                except ValueError:
+                    max_diff = float('inf')
+        results[column] = {'cells': cells, 'identical': identical, 'max_abs_diff': max_diff}
+
+    sample_counts = {trial: (len(original.trials[trial].rows), len(replayed.trials[trial].rows)) for trial in trials}
+    return {
+        'columns': results,
+        'trials_compared': len(trials),
+        'trials_missing': missing,
+        'sample_count_mismatches': {str(t): counts for t, counts in sample_counts.items() if counts[0] != counts[1]}
+    }
+
+
+def roundtrip_identical(path):
+    """True if reading the file and writing it back with syringe_datafile reproduces it byte for byte"""
+    buffer = io.StringIO(newline='')
+    write_data_file(buffer, read_data_file(path))
+    with open(path, newline='') as f:
+        return f.read() == buffer.getvalue()
+
+
+# ============================================================
+# === Replay =================================================
+# ============================================================
+
+def replay(app, datafile, args):
+    """Run every recorded trial through the GUI; returns per-trial timing"""
+    timings = []
+    for replay_trial in replay_trials(datafile, args.speed):
+        if replay_trial.timestamps.size == 0:
+            continue
+        force = trial_force_coefficients(datafile, replay_trial.trial)
+        if force:
+            app.force_coefficients[replay_trial.channel] = force
+
+        # Condition and trial number come from the recording, not from the replay session's schedule
+        app.trial_index = replay_trial.trial
+        app.current_viscosity = replay_trial.viscosity
+        app.current_channel = replay_trial.channel
+        app.viscosity_trial_counts.setdefault(replay_trial.viscosity, 0)
+        app.replay = replay_trial
+
+        # At full speed a short trial can start and finish between two Tk pumps, so wait on the trial task itself
+        previous_task = app.orchestrator.trial_task
+        started = time.perf_counter()
+        app.start_trial()
+        finished = lambda: app.orchestrator.trial_task is not previous_task and not app.orchestrator.trial_running
+        if not wait_until(app, finished, args.timeout + replay_duration(replay_trial)):
+            raise RuntimeError(f"Trial {replay_trial.trial} did not finish")
+        elapsed = time.perf_counter() - started
+
+        timings.append({'trial': replay_trial.trial, 'samples': int(replay_trial.timestamps.size),
+                        'recorded_s': float(replay_trial.timestamps[-1] - replay_trial.timestamps[0]),
+                        'replayed_s': elapsed})
+        print(f"▶️ Trial {replay_trial.trial} ({replay_trial.viscosity}): {replay_trial.timestamps.size} samples "
+              f"in {elapsed:.2f}s")
+
+    app.replay = None
+    # Let the background saver finish before the output file is compared
+    wait_until(app, lambda: not app.orchestrator.save_tasks and app.save_queue.empty(), args.timeout)
+    return timings
+
+
+def replay_duration(replay_trial):
+    if replay_trial.speed <= 0 or replay_trial.timestamps.size == 0:
+        return 0.0
+    return float(replay_trial.timestamps[-1] - replay_trial.timestamps[0]) / replay_trial.speed
+
+
+# ============================================================
+# === Main ===================================================
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session through the acquisition pipeline")
+    parser.add_argument('data_file', help="viscosity_data_<participant>.csv or a backup copy")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="Replay rate: 1 = original timing, N = N times faster, 0 = as fast as possible")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds before a stuck trial fails the run")
+    parser.add_argument('--show', action='store_true', help="Show the main window while replaying")
+    parser.add_argument('--output', default=None, help="JSON report (default: syringe_replay_<time>.json)")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directory for the replayed data files (default: a scratch directory, removed "
+                             "afterwards)")
+    args = parser.parse_args(argv)
+    output = args.output or f"syringe_replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    datafile = read_data_file(args.data_file)
+    participant_id = header_value(datafile, 'Participant ID', 'unknown')
+    rate = header_value(datafile, 'Sampling Frequency (Hz)', CONFIG['sampling_frequency'], float)
+    samples = sum(len(rows.rows) for rows in datafile.trials.values())
+    print(f"📂 {os.path.basename(args.data_file)}: participant {participant_id}, {len(datafile.trials)} trials, "
+          f"{samples} samples at {rate:g} Hz")
+
+    workdir = args.output_dir or tempfile.mkdtemp(prefix="syringe_replay_")
+    os.makedirs(workdir, exist_ok=True)
+    syringe.OUTPUT_DIR = workdir
+    syringe.setup_logging()
+    CONFIG['sampling_frequency'] = rate
+    CONFIG['sampling_interval'] = 1.0 / rate
+    CONFIG['audio']['enabled'] = False
+    CONFIG['countdown_duration'] = 0.0
+    CONFIG['control']['enabled'] = False
+
+    app = syringe.PhidgetViscosityGUI(f"{participant_id}_replay", {}, [], interactive=False)
+    if not args.show:
+        app.withdraw()
+    pump(app, 0.2)
+
+    error = None
+    timings = []
+    started = time.perf_counter()
+    try:
+        timings = replay(app, datafile, args)
+    except Exception as e:
+        error = str(e)
+        print(f"❌ Replay aborted: {e}")
+    elapsed = time.perf_counter() - started
+
+    comparison = None
+    try:
+        if os.path.exists(app.main_data_file):
+            comparison = compare(datafile, read_data_file(app.main_data_file))
+    finally:
+        app.on_close()
+        syringe.shutdown_logging()
+        if not args.output_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    replayed = sum(t['samples'] for t in timings)
+    # Time spent inside the acquisition stage only, without the countdown and the pause between trials
+    acquisition = app.telemetry.histograms.get('replay_trial')
+    acquisition_s = acquisition.total_ns / 1e9 if acquisition is not None else 0.0
+    report = {
+        'replay': 'syringe',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'source': os.path.abspath(args.data_file),
+        'error': error,
+        'speed': args.speed,
+        'sampling_frequency': rate,
+        'trials': len(timings),
+        'samples': replayed,
+        'elapsed_s': elapsed,
+        'samples_per_s': replayed / elapsed if elapsed > 0 else None,
+        'acquisition_s': acquisition_s,
+        'acquisition_samples_per_s': replayed / acquisition_s if acquisition_s > 0 else None,
+        'format_roundtrip_identical': roundtrip_identical(args.data_file),
+        'comparison': comparison,
+        'trial_timings': timings,
+        'telemetry': app.telemetry.snapshot()
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📄 Replay report written to {output}")
+    print(f"⏱️ {replayed} samples in {elapsed:.2f}s ({report['samples_per_s'] or 0:.0f} samples/s overall, "
+          f"{report['acquisition_samples_per_s'] or 0:.0f} samples/s through the acquisition stage)")
+    print(f"{'✅' if report['format_roundtrip_identical'] else '⚠️'} Data file read/write round trip "
+          f"{'identical' if report['format_roundtrip_identical'] else 'differs'}")
+    if comparison:
+        for column, result in comparison['columns'].items():
+            print(f"   {column:<20} {result['identical']}/{result['cells']} identical"
+                  + (f", max diff {result['max_abs_diff']:.3g}" if result['identical'] < result['cells'] else ""))
+    return 1 if error else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
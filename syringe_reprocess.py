@@ -0,0 +1,214 @@
+# Syringe Study bulk re-processing with corrected calibration
+# Recomputes Calibrated_Reading, Filtered_Reading and Force_N in recorded data files from their Raw_Reading
+# column, for when a zero offset or force polynomial turns out to have been wrong after the session:
+#   - --offset CH=VALUE replaces the offset of every trial on that channel: calibrated = raw - VALUE
+#     (--offsets-from reads them from a phidget_calibration_*.csv file instead)
+#   - --force CH=a;b;... replaces the force polynomial (V/V → N, highest power first) of that channel
+# Channels without a correction keep what they were recorded with. The columns are recomputed one trial at
+# a time with NumPy. The streaming filter is linear and starts from the steady state of each trial's first
+# sample, so Filtered_Reading shifts by exactly the change in Calibrated_Reading. Active and the trimmed idle
+# samples stay as detected during the session; use syringe_replay.py to run onset detection again.
+#
+# Files are processed in parallel (one process per file) and every corrected file is written to a temporary
+# file next to the target and then moved over it with os.replace, so a crash never leaves a half-written
+# file. The session header gets a '# Reprocessed CHn:' row per corrected channel (time, offset, force), the
+# '# Force Calibration CHn:' rows and the per-trial Offset/Force metadata are updated to the new values.
+# Summary files are not touched.
+#
+# Usage:
+#   python syringe_reprocess.py viscosity_data_*.csv --offset 0=1.25e-5 --offset 1=-3.1e-6
+#   python syringe_reprocess.py data/*.csv --force 0="12000;0.05" --output-dir corrected
+#   python syringe_reprocess.py data/*.csv --offsets-from phidget_calibration_P01.csv --dry-run
+#
+# Only the standard library, NumPy and syringe_datafile are used, so it runs without Tk or Phidget22.
+
+import os
+import csv
+import sys
+import glob
+import argparse
+import concurrent.futures
+from datetime import datetime
+
+import numpy as np
+
+from syringe_datafile import (DEFAULT_FORCE_COEFFICIENTS, TrialRows, read_data_file, write_data_file, atomic_write,
+                              trial_array, trial_offset, trial_force_coefficients, parse_coefficients,
+                              format_coefficients)
+
+
+# ============================================================
+# === Corrections ============================================
+# ============================================================
+
+def parse_channel_values(items, parse):
+    """['CH=value', ...] → {channel: parse(value)}; raises ValueError for malformed items"""
+    values = {}
+    for item in items or []:
+        channel, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"expected CHANNEL=VALUE, got '{item}'")
+        values[int(channel.strip().upper().removeprefix('CH'))] = parse(value)
+    return values
+
+
+def load_offsets(path):
+    """{channel: offset} from a calibration CSV written by save_calibration()"""
+    with open(path, newline='') as f:
+        return {int(row['Channel']): float(row['Offset (VoltageRatio)']) for row in csv.DictReader(f)}
+
+
+def reprocess_trial(datafile, trial, offset=None, force=None):
+    """
+    Corrected copy of one trial's sample rows. offset and force replace the recorded
+    ones when given. Returns (TrialRows, old offset, max |change in Force_N|).
+    """
+    rows = datafile.trials[trial]
+    columns = datafile.columns
+    raw = trial_array(datafile, trial, 'Raw_Reading')
+    old_calibrated = trial_array(datafile, trial, 'Calibrated_Reading')
+    old_offset = trial_offset(datafile, trial)
+
+    calibrated = raw - offset if offset is not None else old_calibrated
+    coefficients = force or trial_force_coefficients(datafile, trial, DEFAULT_FORCE_COEFFICIENTS)
+    forces = np.polyval(np.asarray(coefficients, dtype=float), calibrated)
+    old_forces = trial_array(datafile, trial, 'Force_N')
+
+    # Cells are written the way csv.writer writes the main script's floats
+    updates = [(columns.index('Force_N'), forces.tolist())]
+    if offset is not None:
+        updates.append((columns.index('Calibrated_Reading'), calibrated.tolist()))
+        # Files from before the streaming filter have no Filtered_Reading column
+        if 'Filtered_Reading' in columns:
+            filtered = trial_array(datafile, trial, 'Filtered_Reading') + (calibrated - old_calibrated)
+            updates.append((columns.index('Filtered_Reading'), filtered.tolist()))
+    new_rows = [list(row) for row in rows.rows]
+    for index, values in updates:
+        for row, value in zip(new_rows, values):
+            row[index] = str(value)
+
+    change = float(np.max(np.abs(forces - old_forces))) if forces.size else 0.0
+    return TrialRows(trial, rows.viscosity, rows.channel, new_rows), old_offset, change
+
+
+def reprocessed_header(header_rows, offsets, forces, stamp):
+    """Header rows with updated force calibration rows and a '# Reprocessed CHn:' row per channel"""
+    rows = []
+    for row in header_rows:
+        name = row[0]
+        if name.startswith('# Force Calibration CH') and name.endswith(':'):
+            channel = int(name[len('# Force Calibration CH'):-1])
+            if channel in forces:
+                row = [name, format_coefficients(forces[channel])] + row[2:]
+        rows.append(row)
+    for channel in sorted(set(offsets) | set(forces)):
+        row = [f'# Reprocessed CH{channel}:', stamp]
+        if channel in offsets:
+            row.append(f"offset={offsets[channel]:.10g}")
+        if channel in forces:
+            row.append(f"force={format_coefficients(forces[channel])}")
+        rows.append(row)
+    return rows
+
+
+# ============================================================
+# === Files ==================================================
+# ============================================================
+
+def reprocess_file(path, offsets, forces, output_dir=None, stamp=None, dry_run=False):
+    """Correct one data or backup file; returns a result dict (worker process)"""
+    result = {'file': path, 'trials': 0, 'samples': 0, 'max_force_change_n': 0.0, 'error': None}
+    try:
+        datafile = read_data_file(path)
+        stamp = stamp or datetime.now().isoformat(timespec='seconds')
+        trials = dict(datafile.trials)
+        metadata = {trial: {name: dict(values) for name, values in rows.items()}
+                    for trial, rows in datafile.metadata.items()}
+
+        for trial, rows in datafile.trials.items():
+            offset, force = offsets.get(rows.channel), forces.get(rows.channel)
+            if offset is None and force is None:
+                continue
+            trials[trial], old_offset, change = reprocess_trial(datafile, trial, offset, force)
+            result['trials'] += 1
+            result['samples'] += len(rows.rows)
+            result['max_force_change_n'] = max(result['max_force_change_n'], change)
+
+            trial_metadata = metadata.setdefault(trial, {})
+            if offset is not None:
+                trial_metadata.setdefault('Offset', {})['offset'] = f"{offset:.10g}"
+                trial_metadata['Offset']['recorded_offset'] = trial_metadata['Offset'].get(
+                    'recorded_offset', f"{old_offset:.10g}")
+            trial_metadata.setdefault('Force', {})['coefficients'] = format_coefficients(
+                force or trial_force_coefficients(datafile, trial, DEFAULT_FORCE_COEFFICIENTS))
+
+        if result['trials'] and not dry_run:
+            channels = {rows.channel for rows in datafile.trials.values()}
+            header_rows = reprocessed_header(datafile.header_rows,
+                                             {ch: v for ch, v in offsets.items() if ch in channels},
+                                             {ch: v for ch, v in forces.items() if ch in channels}, stamp)
+            target = os.path.join(output_dir, os.path.basename(path)) if output_dir else path
+            atomic_write(target, lambda f: write_data_file(f, datafile, header_rows, metadata, trials))
+            result['output'] = target
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+# ============================================================
+# === Main ===================================================
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute calibrated and force columns with corrected calibration")
+    parser.add_argument('files', nargs='+', help="Data or backup files (glob patterns are expanded)")
+    parser.add_argument('--offset', action='append', metavar='CH=VALUE',
+                        help="Zero offset (V/V) for a channel; repeat for more channels")
+    parser.add_argument('--offsets-from', default=None, metavar='CSV',
+                        help="Take the offsets from a calibration file (Channel, Offset (VoltageRatio))")
+    parser.add_argument('--force', action='append', metavar='CH=a;b;...',
+                        help="Force polynomial for a channel, highest power first; repeat for more channels")
+    parser.add_argument('--output-dir', default=None, help="Write corrected files here instead of in place")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+    args = parser.parse_args(argv)
+
+    try:
+        offsets = load_offsets(args.offsets_from) if args.offsets_from else {}
+        offsets.update(parse_channel_values(args.offset, float))
+        forces = parse_channel_values(args.force, parse_coefficients)
+    except (OSError, KeyError, ValueError) as e:
+        parser.error(str(e))
+    if not offsets and not forces:
+        parser.error("nothing to apply: give --offset, --offsets-from or --force")
+
+    paths = []
+    for pattern in args.files:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(path for path in matches if path not in paths)
+    if args.output_dir and not args.dry_run:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    stamp = datetime.now().isoformat(timespec='seconds')
+    print(f"🔧 Re-processing {len(paths)} file(s): offsets {offsets or '-'}, force {forces or '-'}")
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(reprocess_file, path, offsets, forces, args.output_dir, stamp, args.dry_run)
+                   for path in paths]
+        for future in futures:
+            result = future.result()
+            name = os.path.basename(result['file'])
+            if result['error']:
+                failed += 1
+                print(f"❌ {name}: {result['error']}")
+            elif not result['trials']:
+                print(f"➖ {name}: no trials on the corrected channels")
+            else:
+                action = "would change" if args.dry_run else "corrected"
+                print(f"✅ {name}: {action} {result['trials']} trials, {result['samples']} samples, "
+                      f"max Force_N change {result['max_force_change_n']:.4g} N")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
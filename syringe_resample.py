@@ -0,0 +1,203 @@
+# Syringe Study uniform-grid resampling
+# Recorded sample times are close to, but not exactly on, the sampling_interval ticks (read latency, scheduler
+# jitter, dropped reads), and the Timestamp column leaves paused time out, so a pause looks like one ordinary
+# sample interval. This stage puts every trial on an exact grid t = k / rate (k integer, so all trials and
+# participants share the same time points) with np.interp, one column at a time:
+#   - Raw_Reading, Calibrated_Reading, Force_N and Filtered_Reading are interpolated linearly
+#   - Active takes the value of the last recorded sample at or before each grid point
+#   - grid points inside a gap are masked (NaN, an empty cell in the CSV, Valid=0). A gap is any interval
+#     between two samples longer than gap_factor sampling intervals, or an interval that contains a pause
+#     listed in the trial's Pauses metadata row
+# Pre-trigger samples (negative timestamps) are resampled with the rest of the trial.
+#
+# The output keeps the session header and the per-trial metadata rows, adds a '# Resampled:' header row and a
+# '# Trial N Resample:' row per trial, and uses the columns in RESAMPLED_COLUMNS. With 'resample.enabled' in
+# the config, the main script writes viscosity_resampled_<participant>.csv next to the data file at exit.
+#
+# Usage:
+#   python syringe_resample.py viscosity_data_P01.csv
+#   python syringe_resample.py data/viscosity_data_*.csv --rate 100 --gap-factor 2 --output-dir resampled
+#
+# Only the standard library, NumPy and syringe_datafile are used, so it runs without Tk or Phidget22.
+
+import os
+import sys
+import glob
+import argparse
+
+import numpy as np
+
+from syringe_datafile import (DataFile, TrialRows, read_data_file, write_data_file, atomic_write, header_value,
+                              trial_array)
+
+INTERPOLATED_COLUMNS = ['Raw_Reading', 'Calibrated_Reading', 'Force_N', 'Filtered_Reading']
+RESAMPLED_COLUMNS = ['Trial', 'Viscosity', 'Channel', 'Time_s'] + INTERPOLATED_COLUMNS + ['Active', 'Valid']
+
+
+# ============================================================
+# === Resampling =============================================
+# ============================================================
+
+def uniform_grid(timestamps, rate):
+    """Grid points k / rate inside [first, last] sample time"""
+    if timestamps.size == 0:
+        return np.empty(0)
+    # Tolerance so a sample that lands on a tick up to float error still gets its grid point
+    first = int(np.ceil(timestamps[0] * rate - 1e-9))
+    last = int(np.floor(timestamps[-1] * rate + 1e-9))
+    return np.arange(first, last + 1) / rate
+
+
+def gap_mask(timestamps, grid, max_gap_s, pauses=()):
+    """
+    True for grid points that fall strictly inside a gap: an interval between two samples
+    longer than max_gap_s, or one that contains a pause position (trial time).
+    """
+    if timestamps.size < 2 or grid.size == 0:
+        return np.zeros(grid.size, dtype=bool)
+    gaps = np.diff(timestamps) > max_gap_s
+    pauses = np.asarray(pauses, dtype=float)
+    if pauses.size:
+        # The pause falls between the last sample before it and the first one after it
+        spans = np.searchsorted(timestamps, pauses, side='right') - 1
+        gaps[spans[(spans >= 0) & (spans < gaps.size)]] = True
+
+    interval = np.clip(np.searchsorted(timestamps, grid, side='right') - 1, 0, gaps.size - 1)
+    on_sample = (grid == timestamps[interval]) | (grid == timestamps[interval + 1])
+    return gaps[interval] & ~on_sample
+
+
+def resample_trial(timestamps, columns, rate, max_gap_s, pauses=(), active=None):
+    """
+    Resample one trial. columns maps names to arrays aligned with timestamps. Returns
+    (grid, {name: resampled array with NaN in gaps}, valid mask, active on the grid).
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    # np.interp needs strictly increasing times; keep the first of any duplicates
+    order = np.argsort(timestamps, kind='stable')
+    keep = np.concatenate(([True], np.diff(timestamps[order]) > 0)) if timestamps.size else order.astype(bool)
+    index = order[keep]
+    times = timestamps[index]
+
+    grid = uniform_grid(times, rate)
+    valid = ~gap_mask(times, grid, max_gap_s, pauses)
+    resampled = {}
+    for name, values in columns.items():
+        values = np.interp(grid, times, np.asarray(values, dtype=float)[index])
+        values[~valid] = np.nan
+        resampled[name] = values
+
+    grid_active = None
+    if active is not None and times.size:
+        previous = np.clip(np.searchsorted(times, grid, side='right') - 1, 0, times.size - 1)
+        grid_active = np.asarray(active)[index][previous]
+    return grid, resampled, valid, grid_active
+
+
+def trial_pauses(datafile, trial):
+    """Pause positions (trial time, seconds) from the trial's Pauses metadata row"""
+    at = datafile.metadata.get(trial, {}).get('Pauses', {}).get('at_s', '')
+    return [float(position) for position in at.split(';') if position.strip()]
+
+
+# ============================================================
+# === Files ==================================================
+# ============================================================
+
+def resampled_path(path, output_dir=None):
+    """viscosity_data_P01.csv → viscosity_resampled_P01.csv (other names get a _resampled suffix)"""
+    name = os.path.basename(path)
+    if name.startswith('viscosity_data_'):
+        name = 'viscosity_resampled_' + name[len('viscosity_data_'):]
+    else:
+        root, ext = os.path.splitext(name)
+        name = f"{root}_resampled{ext or '.csv'}"
+    return os.path.join(output_dir or os.path.dirname(os.path.abspath(path)), name)
+
+
+def _cell(value):
+    return '' if value != value else str(value)
+
+
+def resample_file(path, rate=None, gap_factor=2.0, output_dir=None):
+    """
+    Write the uniform-grid copy of a data or backup file. rate defaults to the file's
+    sampling frequency. Returns (output path, {'trials', 'grid_points', 'masked'}).
+    """
+    datafile = read_data_file(path)
+    rate = rate or header_value(datafile, 'Sampling Frequency (Hz)', None, float)
+    if not rate:
+        raise ValueError(f"{path}: no sampling frequency in the header, pass a rate")
+    max_gap_s = gap_factor / rate
+
+    trials = {}
+    metadata = {trial: dict(rows) for trial, rows in datafile.metadata.items()}
+    totals = {'trials': 0, 'grid_points': 0, 'masked': 0}
+    for trial, rows in datafile.trials.items():
+        columns = {name: trial_array(datafile, trial, name) for name in INTERPOLATED_COLUMNS
+                   if name in datafile.columns}
+        active = trial_array(datafile, trial, 'Active', dtype=int) if 'Active' in datafile.columns else None
+        pauses = trial_pauses(datafile, trial)
+        grid, resampled, valid, grid_active = resample_trial(trial_array(datafile, trial, 'Timestamp'), columns,
+                                                             rate, max_gap_s, pauses, active)
+
+        cells = [grid.tolist()]
+        cells += [[_cell(v) for v in resampled[name].tolist()] if name in resampled else [''] * grid.size
+                  for name in INTERPOLATED_COLUMNS]
+        cells.append(grid_active.tolist() if grid_active is not None else [''] * grid.size)
+        cells.append(valid.astype(int).tolist())
+        trials[trial] = TrialRows(trial, rows.viscosity, rows.channel,
+                                  [[trial, rows.viscosity, rows.channel, *values] for values in zip(*cells)])
+
+        masked = int(grid.size - np.count_nonzero(valid))
+        metadata.setdefault(trial, {})['Resample'] = {'samples': len(rows.rows), 'grid_points': grid.size,
+                                                      'masked': masked, 'pauses': len(pauses)}
+        totals['trials'] += 1
+        totals['grid_points'] += grid.size
+        totals['masked'] += masked
+
+    header_rows = datafile.header_rows + [['# Resampled:', f"rate={rate:g}", f"gap_s={max_gap_s:.6g}",
+                                           f"source={os.path.basename(path)}"]]
+    resampled_file = DataFile(None, header_rows, {}, metadata, RESAMPLED_COLUMNS, trials, 'interleaved')
+    output = resampled_path(path, output_dir)
+    atomic_write(output, lambda f: write_data_file(f, resampled_file))
+    return output, totals
+
+
+# ============================================================
+# === Main ===================================================
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resample recorded trials onto a uniform time grid")
+    parser.add_argument('files', nargs='+', help="Data or backup files (glob patterns are expanded)")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Grid rate in Hz (default: each file's sampling frequency)")
+    parser.add_argument('--gap-factor', type=float, default=2.0,
+                        help="Mask grid points in sample gaps longer than this many sampling intervals")
+    parser.add_argument('--output-dir', default=None, help="Directory for the resampled files (default: beside "
+                                                           "each data file)")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for pattern in args.files:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(path for path in matches if path not in paths)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    for path in paths:
+        try:
+            output, totals = resample_file(path, args.rate, args.gap_factor, args.output_dir)
+        except Exception as e:
+            failed += 1
+            print(f"❌ {os.path.basename(path)}: {e}")
+            continue
+        print(f"✅ {os.path.basename(output)}: {totals['trials']} trials, {totals['grid_points']} grid points, "
+              f"{totals['masked']} masked")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
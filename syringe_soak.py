@@ -0,0 +1,288 @@
+# Syringe Study long-session soak test
+# Drives thousands of simulated trials through PhidgetViscosityGUI's real start → stop → next_trial cycle
+# (session orchestrator, background saver, UI event bus) with the window withdrawn, and keeps going past
+# "experiment complete" the way an operator who chose "continue with more trials" would.
+#
+# Every --checkpoint trials it records:
+#   - traced Python memory (tracemalloc), minus an estimate of the trial archive the GUI keeps on purpose
+#   - thread count, save_queue backlog and UI event backlog
+#   - mean per-trial save latency and trial cycle time over the checkpoint window
+# After the warm-up, a least-squares trend is fitted to each series; the run fails (exit code 1) if any
+# metric grows faster than its threshold. The full series, the trends and the top tracemalloc growth sites
+# are written to a JSON report.
+#
+# Usage:
+#   python syringe_soak.py --trials 2000
+#   python syringe_soak.py --trials 500 --trial-seconds 0.2 --max-memory-growth-mb 1 --output soak.json
+#
+# Like syringe_benchmark.py it needs a display for Tk (use xvfb-run on headless machines).
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import Syringe2025V3_7 as syringe
+from Syringe2025V3_7 import CONFIG, SimulatedVoltageRatioInput
+from syringe_benchmark import pump, rss_bytes, git_revision
+
+
+# ============================================================
+# === Measurements ===========================================
+# ============================================================
+
+def _dict_bytes(mapping):
+    """Size of a dict of flat dicts (trial summaries / metadata), including keys and values"""
+    total = sys.getsizeof(mapping)
+    for key, value in mapping.items():
+        total += sys.getsizeof(key)
+        total += _dict_bytes(value) if isinstance(value, dict) else sys.getsizeof(value)
+    return total
+
+
+def archive_bytes(app):
+    """
+    Approximate size of what the GUI keeps for backups: the samples in app.data plus the
+    per-trial summaries and metadata. That archive grows with every trial by design, so it is
+    taken out of the leak check.
+    """
+    total = _dict_bytes(app.trial_summaries) + _dict_bytes(app.trial_metadata) + _dict_bytes(app.trial_windows)
+    for samples in app.data.values():
+        total += sys.getsizeof(samples)
+        if samples:
+            sample = samples[-1]
+            # The tuple itself plus its per-sample floats (timestamp, raw, calibrated, filtered)
+            per_sample = sys.getsizeof(sample) + 4 * sys.getsizeof(0.0)
+            total += per_sample * len(samples)
+    return total
+
+
+def trend(trials, values):
+    """Least-squares slope (per 1000 trials) and mean of a series"""
+    x = np.asarray(trials, dtype=float)
+    y = np.asarray(values, dtype=float)
+    if x.size < 3 or np.ptp(x) == 0:
+        return {'slope_per_1000': 0.0, 'mean': float(y.mean()) if y.size else 0.0}
+    slope = np.polyfit(x, y, 1)[0]
+    return {'slope_per_1000': float(slope * 1000.0), 'mean': float(y.mean())}
+
+
+def wait_until(app, condition, timeout):
+    """Pump Tk events until condition() is true; False on timeout"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        pump(app, 0.005)
+    return True
+
+
+def run_trial(app, trial_s, timeout):
+    """One full start → record → stop → next_trial cycle through the GUI's own handlers"""
+    if app.schedule.finished:
+        # Experiment complete and continued: the operator picks the conditions, here in turn
+        app.select_viscosity(app.all_viscosities[app.trial_index % len(app.all_viscosities)])
+
+    app.start_trial()
+    if not wait_until(app, lambda: app.trial_active, timeout):
+        raise RuntimeError("Trial did not start recording")
+    pump(app, trial_s)
+    app.stop_trial()
+    if not wait_until(app, lambda: not app.orchestrator.trial_running, timeout):
+        raise RuntimeError("Trial did not finish (countdown/acquisition/next_trial stuck)")
+
+
+# ============================================================
+# === Soak Run ===============================================
+# ============================================================
+
+def soak(app, args):
+    save_histogram = lambda: app.telemetry.histograms.get('save_latency')
+    series = []
+    baseline_snapshot = None
+    warmup = max(args.checkpoint, int(args.trials * args.warmup_fraction))
+    window_start = time.perf_counter()
+    last_save = (0, 0)
+
+    for trial in range(1, args.trials + 1):
+        run_trial(app, args.trial_seconds, args.timeout)
+
+        if trial % args.checkpoint and trial != args.trials:
+            continue
+
+        # Let outstanding saves land so the backlog reflects steady state, not the last trial
+        pump(app, 0.05)
+        histogram = save_histogram()
+        count, total_ns = (histogram.count, histogram.total_ns) if histogram is not None else (0, 0)
+        saves = count - last_save[0]
+        save_ms = (total_ns - last_save[1]) / saves / 1e6 if saves else 0.0
+        last_save = (count, total_ns)
+
+        now = time.perf_counter()
+        traced, peak = tracemalloc.get_traced_memory()
+        archive = archive_bytes(app)
+        point = {
+            'trial': trial,
+            'elapsed_s': now - args.started,
+            'traced_bytes': traced,
+            'traced_peak_bytes': peak,
+            'archive_bytes': archive,
+            'unexplained_bytes': traced - archive,
+            'rss_bytes': rss_bytes(),
+            'threads': threading.active_count(),
+            'save_queue_depth': app.save_queue.qsize(),
+            'ui_backlog': app.ui_bus.posted - app.ui_bus.applied,
+            'save_latency_ms': save_ms,
+            'cycle_s': (now - window_start) / args.checkpoint
+        }
+        window_start = now
+        series.append(point)
+        print(f"🔁 Trial {trial}: traced {traced / 1e6:.1f} MB (archive {archive / 1e6:.1f} MB), "
+              f"threads {point['threads']}, save queue {point['save_queue_depth']}, save {save_ms:.2f} ms")
+
+        if baseline_snapshot is None and trial >= warmup:
+            baseline_snapshot = tracemalloc.take_snapshot()
+
+    growth_sites = []
+    if baseline_snapshot is not None:
+        final_snapshot = tracemalloc.take_snapshot()
+        for stat in final_snapshot.compare_to(baseline_snapshot, 'lineno')[:args.top_sites]:
+            frame = stat.traceback[0]
+            growth_sites.append({'site': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                                 'size_diff_bytes': stat.size_diff, 'count_diff': stat.count_diff})
+    return series, warmup, growth_sites
+
+
+def evaluate(series, warmup, args):
+    """Fit trends after the warm-up and compare them with the thresholds; returns (trends, failures)"""
+    steady = [point for point in series if point['trial'] >= warmup] or series
+    trials = [point['trial'] for point in steady]
+    trends = {name: trend(trials, [point[name] for point in steady])
+              for name in ('unexplained_bytes', 'threads', 'save_queue_depth', 'ui_backlog', 'save_latency_ms',
+                           'cycle_s', 'traced_bytes')}
+
+    limits = {
+        'unexplained_bytes': ('absolute', args.max_memory_growth_mb * 1e6),
+        'threads': ('absolute', args.max_thread_growth),
+        'save_queue_depth': ('absolute', args.max_backlog_growth),
+        'ui_backlog': ('absolute', args.max_backlog_growth),
+        'save_latency_ms': ('relative', args.max_latency_growth_pct),
+        'cycle_s': ('relative', args.max_latency_growth_pct)
+    }
+    failures = []
+    for name, (kind, limit) in limits.items():
+        result = trends[name]
+        growth = result['slope_per_1000']
+        if kind == 'relative':
+            growth = 100.0 * growth / result['mean'] if result['mean'] else 0.0
+        result['growth_per_1000'] = growth
+        result['limit_per_1000'] = limit
+        result['unit'] = '%' if kind == 'relative' else ('bytes' if name.endswith('bytes') else 'count')
+        if growth > limit:
+            failures.append(f"{name} grows {growth:.3g} {result['unit']} per 1000 trials (limit {limit:g})")
+    return trends, failures
+
+
+# ============================================================
+# === Main ===================================================
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-session soak test of the trial cycle with trend checks")
+    parser.add_argument('--trials', type=int, default=2000, help="Trials to run")
+    parser.add_argument('--trial-seconds', type=float, default=0.5, help="Recording time per trial")
+    parser.add_argument('--countdown', type=float, default=0.05, help="Countdown before each trial (seconds)")
+    parser.add_argument('--rate', type=int, default=None, help="Sampling rate (default: configured rate)")
+    parser.add_argument('--checkpoint', type=int, default=50, help="Trials between measurements")
+    parser.add_argument('--warmup-fraction', type=float, default=0.1, help="Share of the run ignored for trends")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds before a stuck trial fails the run")
+    parser.add_argument('--max-memory-growth-mb', type=float, default=2.0,
+                        help="Allowed traced memory growth outside the trial archive, MB per 1000 trials")
+    parser.add_argument('--max-thread-growth', type=float, default=0.5, help="Allowed thread growth per 1000 trials")
+    parser.add_argument('--max-backlog-growth', type=float, default=1.0,
+                        help="Allowed save queue / UI event backlog growth per 1000 trials")
+    parser.add_argument('--max-latency-growth-pct', type=float, default=25.0,
+                        help="Allowed save latency and cycle time growth, percent of the mean per 1000 trials")
+    parser.add_argument('--top-sites', type=int, default=10, help="tracemalloc growth sites in the report")
+    parser.add_argument('--output', default=None, help="JSON report (default: syringe_soak_<time>.json)")
+    parser.add_argument('--keep-files', action='store_true', help="Keep the data files written during the run")
+    args = parser.parse_args(argv)
+    args.started = time.perf_counter()
+    output = args.output or f"syringe_soak_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    workdir = tempfile.mkdtemp(prefix="syringe_soak_")
+    syringe.OUTPUT_DIR = workdir
+    syringe.setup_logging()
+    CONFIG['audio']['enabled'] = False
+    CONFIG['countdown_duration'] = args.countdown
+    if args.rate:
+        CONFIG['sampling_frequency'] = args.rate
+        CONFIG['sampling_interval'] = 1.0 / args.rate
+
+    tracemalloc.start(1)
+
+    sensors = [SimulatedVoltageRatioInput(ch, seed=ch) for ch in range(CONFIG['num_channels'])]
+    calibration = {sensor.channel: sensor.offset for sensor in sensors}
+    noise = {sensor.channel: sensor.noise_sd for sensor in sensors}
+
+    print(f"🏁 Soak test: {args.trials} trials of {args.trial_seconds}s (scratch directory: {workdir})")
+    app = syringe.PhidgetViscosityGUI("SOAK", calibration, sensors, noise, interactive=False)
+    app.withdraw()
+    pump(app, 0.5)
+    threads_at_start = threading.active_count()
+
+    error = None
+    series, warmup, growth_sites = [], 0, []
+    try:
+        series, warmup, growth_sites = soak(app, args)
+    except Exception as e:
+        error = str(e)
+        print(f"❌ Soak run aborted: {e}")
+    finally:
+        app.on_close()
+        syringe.shutdown_logging()
+        tracemalloc.stop()
+        if not args.keep_files:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    trends, failures = evaluate(series, warmup, args) if series else ({}, [])
+    if error:
+        failures.insert(0, f"aborted: {error}")
+
+    report = {
+        'soak': 'syringe',
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'passed': not failures,
+        'failures': failures,
+        'settings': {name: value for name, value in vars(args).items() if name != 'started'},
+        'sampling_frequency': CONFIG['sampling_frequency'],
+        'threads_at_start': threads_at_start,
+        'warmup_trials': warmup,
+        'trends': trends,
+        'tracemalloc_growth_sites': growth_sites,
+        'series': series,
+        'telemetry': app.telemetry.snapshot()
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📄 Soak report written to {output}")
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        return 1
+    print("✅ No metric trended upward past its threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
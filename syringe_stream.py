@@ -0,0 +1,252 @@
+# Syringe Study live stream: wire format, publisher and reference subscriber
+# The acquisition loop hands every sample to StreamPublisher.publish(), which only appends to a bounded queue.
+# A sender thread packs the queued samples into binary frames every batch_ms and sends them as UDP datagrams
+# to a local port. UDP never waits for a slow or absent consumer. If the queue overflows, the oldest samples are
+# dropped and counted in the publisher's counters (and the session metrics file). Frames lost on the way show up
+# to consumers as gaps in the sequence numbers. Every rig process publishes to the same port, so each frame names
+# its source (the rig) and consumers keep one sequence per source.
+#
+# Wire format (little-endian), one frame per datagram:
+#   header, 48 bytes (HEADER)
+#     magic        4s   b'SYRS'
+#     version      u8   2
+#     flags        u8   reserved, 0
+#     count        u16  samples in this frame
+#     sequence     u64  frame number of this source, starts at 0 and increases by 1 for every frame sent
+#     sent_time    f64  sender wall-clock time (Unix seconds) when the frame was packed
+#     trial_start  f64  wall-clock time the clock of the latest trial started (0 before the first trial)
+#     source       16s  rig name, UTF-8, NUL-padded (all NUL for the single-bridge setup)
+#   count records, 32 bytes each (RECORD)
+#     timestamp    f64  seconds since the trial started, excluding pauses (negative for pre-trigger samples)
+#     trial        u32  trial number
+#     channel      u8   bridge channel
+#     flags        u8   bit 0: inside the active (onset-offset) window
+#     (padding)    2 bytes
+#     raw          f64  raw voltage ratio (V/V)
+#     calibrated   f64  offset-corrected voltage ratio (V/V)
+#
+# Reference subscriber (stand-in for EMG/video/dashboard tools):
+#   python syringe_stream.py
+#   python syringe_stream.py --port 8765 --samples --duration 30
+#
+# Only the standard library is used, so consumers can copy this file as it is.
+
+import sys
+import time
+import socket
+import struct
+import argparse
+import threading
+from collections import deque, namedtuple
+
+MAGIC = b'SYRS'
+VERSION = 2
+HEADER = struct.Struct('<4sBBHQdd16s')
+RECORD = struct.Struct('<dIBBxxdd')
+FLAG_ACTIVE = 0x01
+
+# Largest UDP payload is 65507 bytes
+MAX_RECORDS = (65507 - HEADER.size) // RECORD.size
+
+Frame = namedtuple('Frame', ['source', 'sequence', 'sent_time', 'trial_start', 'records'])
+StreamRecord = namedtuple('StreamRecord', ['timestamp', 'trial', 'channel', 'active', 'raw', 'calibrated'])
+
+
+# ============================================================
+# === Wire Format ============================================
+# ============================================================
+
+def encode_frame(sequence, samples, trial_start=0.0, sent_time=None, source=''):
+    """Pack samples (Sample tuples from the acquisition loop) into one frame"""
+    parts = [HEADER.pack(MAGIC, VERSION, 0, len(samples), sequence,
+                         time.time() if sent_time is None else sent_time, trial_start or 0.0,
+                         source.encode('utf-8')[:16])]
+    for sample in samples:
+        parts.append(RECORD.pack(sample.timestamp, sample.trial, sample.channel,
+                                 FLAG_ACTIVE if sample.active else 0, sample.raw, sample.calibrated))
+    return b''.join(parts)
+
+
+def decode_frame(data):
+    """Unpack one frame; raises ValueError for anything that is not a valid version-1 frame"""
+    if len(data) < HEADER.size:
+        raise ValueError(f"frame too short ({len(data)} bytes)")
+    magic, version, _, count, sequence, sent_time, trial_start, source = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a syringe stream v{VERSION} frame")
+    if len(data) != HEADER.size + count * RECORD.size:
+        raise ValueError(f"frame length {len(data)} does not match {count} records")
+    records = [StreamRecord(t, trial, channel, bool(flags & FLAG_ACTIVE), raw, calibrated)
+               for t, trial, channel, flags, raw, calibrated in RECORD.iter_unpack(data[HEADER.size:])]
+    return Frame(source.rstrip(b'\0').decode('utf-8', 'replace'), sequence, sent_time, trial_start, records)
+
+
+# ============================================================
+# === Publisher ==============================================
+# ============================================================
+
+class StreamPublisher:
+    """
+    Sends samples to a local UDP port in batched frames from its own thread.
+
+    publish() is safe to call from the sampling loop: it appends to a bounded
+    deque and returns. When the sender falls behind, the deque discards the
+    oldest samples; a datagram the socket cannot take immediately is dropped too
+    and leaves a sequence gap. Both losses are counted in counters().
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, batch_ms=20, max_samples_per_frame=256, queue_size=10000,
+                 source=''):
+        self.address = (host, int(port))
+        self.source = source or ''
+        self.batch_s = max(0.001, batch_ms / 1000.0)
+        self.max_samples = max(1, min(int(max_samples_per_frame), MAX_RECORDS))
+        self.pending = deque(maxlen=max(1, int(queue_size)))
+        self.trial_start = 0.0
+
+        self.sequence = 0
+        self.published = 0
+        self.sent_samples = 0
+        self.dropped_frames = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self, wrap=None):
+        target = wrap(self._run) if wrap is not None else self._run
+        self.thread = threading.Thread(target=target, name="stream-publisher", daemon=True)
+        self.thread.start()
+
+    def publish(self, sample):
+        self.pending.append(sample)
+        self.published += 1
+
+    def _run(self):
+        while not self._stop.wait(self.batch_s):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Send everything queued so far (sender thread)"""
+        pending = self.pending
+        while pending:
+            batch = []
+            try:
+                while len(batch) < self.max_samples:
+                    batch.append(pending.popleft())
+            except IndexError:
+                pass
+            frame = encode_frame(self.sequence, batch, self.trial_start, source=self.source)
+            self.sequence += 1
+            try:
+                self.sock.sendto(frame, self.address)
+                self.sent_samples += len(batch)
+            except OSError:
+                # Would block, or nobody is listening (ICMP port unreachable on some platforms)
+                self.dropped_frames += 1
+
+    def counters(self):
+        return {
+            'published': self.published,
+            'sent': self.sent_samples,
+            'queued': len(self.pending),
+            'dropped': self.published - self.sent_samples - len(self.pending),
+            'frames': self.sequence,
+            'dropped_frames': self.dropped_frames
+        }
+
+    def close(self, timeout=1.0):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+        self.sock.close()
+
+
+# ============================================================
+# === Reference Subscriber ===================================
+# ============================================================
+
+def subscribe(host='127.0.0.1', port=8765, duration=None, show_samples=False, out=sys.stdout):
+    """
+    Receive frames and report rate, sequence gaps and the latest value once a second.
+    Sequence gaps are tracked per source, so several rigs can share the port.
+    Returns the totals as a dict when duration runs out (or on Ctrl+C).
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    sock.settimeout(0.2)
+    print(f"👂 Listening for syringe stream frames on {host}:{port}", file=out)
+
+    totals = {'frames': 0, 'samples': 0, 'lost_frames': 0, 'invalid': 0, 'sources': 0}
+    expected = {}
+    window_samples = 0
+    last = None
+    started = report_at = time.time()
+    try:
+        while duration is None or time.time() - started < duration:
+            try:
+                data = sock.recv(65535)
+            except socket.timeout:
+                data = None
+
+            if data is not None:
+                try:
+                    frame = decode_frame(data)
+                except ValueError as e:
+                    totals['invalid'] += 1
+                    print(f"⚠️ {e}", file=out)
+                    continue
+                source = frame.source or '-'
+                if source not in expected:
+                    totals['sources'] += 1
+                elif frame.sequence > expected[source]:
+                    totals['lost_frames'] += frame.sequence - expected[source]
+                    print(f"⚠️ Sequence gap from {source}: {frame.sequence - expected[source]} frame(s) lost",
+                          file=out)
+                expected[source] = frame.sequence + 1
+                totals['frames'] += 1
+                totals['samples'] += len(frame.records)
+                window_samples += len(frame.records)
+                if frame.records:
+                    last = (source, frame.records[-1])
+                if show_samples:
+                    for r in frame.records:
+                        print(f"{source}\t{frame.sequence}\t{r.trial}\tCH{r.channel}\t{r.timestamp:.4f}\t{r.raw:+.8f}\t"
+                              f"{r.calibrated:+.8f}\t{int(r.active)}", file=out)
+
+            now = time.time()
+            if now - report_at >= 1.0 and not show_samples:
+                rate = window_samples / (now - report_at)
+                latest = (f"{last[0]} trial {last[1].trial} CH{last[1].channel} t={last[1].timestamp:.2f}s "
+                          f"{last[1].calibrated:+.3e} V/V" if last else "no samples yet")
+                print(f"📡 {rate:7.1f} samples/s | frames {totals['frames']} | lost {totals['lost_frames']} | "
+                      f"{latest}", file=out)
+                window_samples = 0
+                report_at = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reference subscriber for the syringe study live stream")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (the publisher's stream.host)")
+    parser.add_argument('--port', type=int, default=8765, help="UDP port (the publisher's stream.port)")
+    parser.add_argument('--duration', type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument('--samples', action='store_true',
+                        help="Print every sample (source, sequence, trial, channel, time, raw, calibrated, "
+                             "active)")
+    args = parser.parse_args(argv)
+
+    totals = subscribe(args.host, args.port, args.duration, args.samples)
+    print(f"✅ {totals['frames']} frames from {totals['sources']} source(s), {totals['samples']} samples, "
+          f"{totals['lost_frames']} frames lost, {totals['invalid']} invalid")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
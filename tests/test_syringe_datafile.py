@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syringe_datafile import read_data_file, write_data_file, atomic_write
+
+# Trial 2 was cancelled before its first sample: metadata rows but no sample rows
+INTERLEAVED_FILE = """\
+# Participant ID:,P01
+# Sampling Frequency (Hz):,100
+# Force Calibration CH0:,1841;0
+
+Trial,Viscosity,Channel,Gain,Timestamp,Raw_Reading,Calibrated_Reading,Force_N,Filtered_Reading,Active
+# Trial 1 Offset:,offset=0.0001
+# Trial 1 Force:,coefficients=1841;0
+1,A,0,128,0.01,0.00012,2e-05,0.03682,2e-05,1
+# Trial 2 Offset:,offset=0.0001
+# Trial 2 Pauses:,count=0,total_s=0.0,at_s=
+# Trial 3 Offset:,offset=0.0002
+3,B,0,128,0.01,0.00025,5e-05,0.09205,5e-05,0
+"""
+
+LEADING_FILE = """\
+# Participant ID:,P01
+# Trial 2 Offset:,offset=0.0001
+# Trial 1 Offset:,offset=0.0001
+# Trial 1 Force:,coefficients=1841;0
+
+Trial,Viscosity,Channel,Gain,Timestamp,Raw_Reading,Calibrated_Reading,Force_N
+1,A,0,128,0.01,0.00012,2e-05,0.03682
+3,B,0,128,0.01,0.00025,5e-05,0.09205
+"""
+
+
+@pytest.mark.parametrize('content, layout', [(INTERLEAVED_FILE, 'interleaved'), (LEADING_FILE, 'leading')],
+                         ids=['interleaved', 'leading'])
+def test_round_trip_keeps_trials_without_samples(tmp_path, content, layout):
+    path = tmp_path / "viscosity_data_P01.csv"
+    path.write_text(content)
+
+    datafile = read_data_file(str(path))
+    assert datafile.layout == layout
+    assert 2 in datafile.metadata and 2 not in datafile.trials
+    atomic_write(str(path), lambda f: write_data_file(f, datafile))
+
+    assert path.read_text() == content
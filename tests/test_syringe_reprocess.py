@@ -0,0 +1,123 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syringe_datafile import read_data_file, trial_array
+from syringe_reprocess import reprocess_file
+
+# Data file as written before filtering, per-trial metadata and force polynomials were added
+BASELINE_FILE = """\
+# Participant ID:,P01
+# Counterbalancing Order:,"A, B, C"
+# Bridge Gain:,128
+# Sampling Frequency (Hz):,100
+# Force Calibration Factor:,1841.0,N/(V/V)
+
+Trial,Viscosity,Channel,Gain,Timestamp,Raw_Reading,Calibrated_Reading,Force_N
+1,A,0,128,0.01,0.00012,2e-05,0.03682
+1,A,0,128,0.02,0.00013,3e-05,0.05523
+2,B,1,128,0.01,0.0002,1e-05,0.01841
+"""
+
+# Current format: force polynomial per channel, Filtered_Reading, per-trial metadata rows between the trials,
+# and trial 2 cancelled before its first sample
+CURRENT_FILE = """\
+# Participant ID:,P01
+# Sampling Frequency (Hz):,100
+# Force Calibration CH0:,1841,"N = polynomial in V/V, highest power first"
+# Force Calibration CH1:,1900;0.1,"N = polynomial in V/V, highest power first"
+# Filter:,lowpass 10 Hz
+
+Trial,Viscosity,Channel,Gain,Timestamp,Raw_Reading,Calibrated_Reading,Force_N,Filtered_Reading,Active
+# Trial 1 Offset:,version=0,offset=0.0001,calibration_offset=0.0001,drift_per_hour=0
+# Trial 1 Force:,coefficients=1841
+# Trial 1 Pauses:,count=1,at_s=0.0150,durations_s=2.000
+1,A,0,128,0.01,0.00012,2e-05,0.03682,2e-05,0
+1,A,0,128,0.02,0.00013,3e-05,0.05523,2.5e-05,1
+# Trial 2 Offset:,version=0,offset=0.0001,calibration_offset=0.0001,drift_per_hour=0
+# Trial 2 Pauses:,count=0,at_s=,durations_s=
+# Trial 3 Offset:,version=1,offset=0.00018,calibration_offset=0.00018,drift_per_hour=0
+# Trial 3 Force:,coefficients=1900;0.1
+3,B,1,128,0.01,0.0002,2e-05,0.138,2e-05,1
+"""
+
+
+@pytest.fixture
+def baseline_file(tmp_path):
+    path = tmp_path / "viscosity_data_P01.csv"
+    path.write_text(BASELINE_FILE)
+    return str(path)
+
+
+@pytest.fixture
+def current_file(tmp_path):
+    path = tmp_path / "viscosity_data_P01.csv"
+    path.write_text(CURRENT_FILE)
+    return str(path)
+
+
+def test_offset_correction_of_baseline_file(baseline_file):
+    result = reprocess_file(baseline_file, {0: 0.00011}, {})
+
+    assert result['error'] is None
+    assert result['trials'] == 1
+    datafile = read_data_file(baseline_file)
+    assert 'Filtered_Reading' not in datafile.columns
+    calibrated = trial_array(datafile, 1, 'Calibrated_Reading')
+    assert calibrated == pytest.approx([1e-05, 2e-05])
+    # The header's single force factor still applies
+    assert trial_array(datafile, 1, 'Force_N') == pytest.approx(1841.0 * calibrated)
+    assert datafile.metadata[1]['Offset'] == {'offset': '0.00011', 'recorded_offset': '0.0001'}
+    # Channel 1 was not corrected
+    assert datafile.trials[2].rows == [['2', 'B', '1', '128', '0.01', '0.0002', '1e-05', '0.01841']]
+
+
+def test_force_only_correction_of_baseline_file(baseline_file):
+    result = reprocess_file(baseline_file, {}, {1: (2000.0, 0.5)})
+
+    assert result['error'] is None
+    datafile = read_data_file(baseline_file)
+    assert trial_array(datafile, 2, 'Force_N') == pytest.approx([2000.0 * 1e-05 + 0.5])
+    assert trial_array(datafile, 2, 'Calibrated_Reading') == pytest.approx([1e-05])
+    assert datafile.header['Reprocessed CH1'][1] == 'force=2000;0.5'
+
+
+def test_offset_and_force_correction_of_current_file(current_file):
+    result = reprocess_file(current_file, {0: 0.00011}, {0: (2000.0, 0.5)}, stamp='2026-01-01T00:00:00')
+
+    assert result['error'] is None
+    assert result['trials'] == 1
+    datafile = read_data_file(current_file)
+    calibrated = trial_array(datafile, 1, 'Calibrated_Reading')
+    assert calibrated == pytest.approx([1e-05, 2e-05])
+    # The filter is linear, so the filtered trace moves by the same amount
+    assert trial_array(datafile, 1, 'Filtered_Reading') == pytest.approx([1e-05, 1.5e-05])
+    assert trial_array(datafile, 1, 'Force_N') == pytest.approx(2000.0 * calibrated + 0.5)
+
+    # Existing metadata is rewritten in place, other rows are kept
+    assert datafile.metadata[1]['Offset'] == {'version': '0', 'offset': '0.00011', 'calibration_offset': '0.0001',
+                                              'drift_per_hour': '0', 'recorded_offset': '0.0001'}
+    assert datafile.metadata[1]['Force'] == {'coefficients': '2000;0.5'}
+    assert datafile.metadata[1]['Pauses'] == {'count': '1', 'at_s': '0.0150', 'durations_s': '2.000'}
+
+    assert datafile.header['Force Calibration CH0'] == ['2000;0.5', 'N = polynomial in V/V, highest power first']
+    assert datafile.header['Force Calibration CH1'][0] == '1900;0.1'
+    assert datafile.header['Reprocessed CH0'] == ['2026-01-01T00:00:00', 'offset=0.00011', 'force=2000;0.5']
+
+
+def test_in_place_rewrite_keeps_untouched_trials_and_metadata(current_file):
+    reprocess_file(current_file, {0: 0.00011}, {})
+
+    text = open(current_file).read()
+    # Trial 2 has metadata but no samples; trial 3 is on an uncorrected channel
+    assert "# Trial 2 Offset:,version=0,offset=0.0001,calibration_offset=0.0001,drift_per_hour=0\n" in text
+    assert "# Trial 2 Pauses:,count=0,at_s=,durations_s=\n" in text
+    assert text.endswith("# Trial 3 Offset:,version=1,offset=0.00018,calibration_offset=0.00018,drift_per_hour=0\n"
+                         "# Trial 3 Force:,coefficients=1900;0.1\n"
+                         "3,B,1,128,0.01,0.0002,2e-05,0.138,2e-05,1\n")
+    datafile = read_data_file(current_file)
+    assert list(datafile.metadata) == [1, 2, 3]
+    assert list(datafile.trials) == [1, 3]